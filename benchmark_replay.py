@@ -0,0 +1,93 @@
+"""Replay recorded sessions offline and report node-level latency.
+
+Record a session first with RECORD_MODE=record (the HAR is written when the
+browser closes), then run:
+
+    python benchmark_replay.py [thread_id ...] [--repeat N]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+# Must be set before src is imported: tools wrap their LLMs at import time
+os.environ["RECORD_MODE"] = "replay"
+
+from src.utils.recorder import recorder
+from src.core.graph import open_graph, run_graph, resume_graph
+from src.automation.browser_manager import browser_manager
+from src.utils.metrics import metrics
+
+
+async def replay_session(thread_id: str) -> float:
+    """
+    Re-run one recorded session against its recordings.
+
+    Args:
+        thread_id: Recorded thread ID
+
+    Returns:
+        Wall-clock duration in seconds
+    """
+    initial_state = recorder.load_initial_state(thread_id)
+    initial_state["start_time"] = time.time()
+    initial_state["last_update_time"] = time.time()
+
+    # Fresh graph (and checkpointer) per run so the recorded thread_id can be reused
+    config_dict = {"configurable": {"thread_id": thread_id}}
+
+    start = time.perf_counter()
+    try:
+        async with open_graph() as graph:
+            await run_graph(graph, initial_state, thread_id)
+
+            # Resume through HITL interrupts; recorded answers are served instantly
+            while (await graph.aget_state(config_dict)).next:
+                await resume_graph(graph, thread_id)
+    finally:
+        await browser_manager.close()
+
+    return time.perf_counter() - start
+
+
+async def main():
+    """Replay sessions and print a latency breakdown."""
+    parser = argparse.ArgumentParser(description="Replay recorded MPOnline sessions")
+    parser.add_argument("thread_ids", nargs="*", help="Recorded thread IDs (default: all)")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per session")
+    args = parser.parse_args()
+
+    thread_ids = args.thread_ids or recorder.list_sessions()
+
+    if not thread_ids:
+        print("❌ No recordings found. Record a run with RECORD_MODE=record first.")
+        return 1
+
+    print("\n" + "=" * 70)
+    print("⏱️  OFFLINE REPLAY BENCHMARK")
+    print("=" * 70)
+
+    for thread_id in thread_ids:
+        for run in range(args.repeat):
+            duration = await replay_session(thread_id)
+            print(f"   {thread_id} run {run + 1}: {duration:.2f}s")
+
+    print("\n📊 Node latency (sorted by total time):")
+    print("-" * 70)
+    for row in metrics.summary("mponline_node_latency_seconds"):
+        labels = row["labels"]
+        print(
+            f"   {labels['node']:<12} {labels['outcome']:<9} "
+            f"n={row['count']:<4} total={row['total']:.2f}s mean={row['mean']:.3f}s"
+        )
+
+    metrics.write_prometheus_file()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
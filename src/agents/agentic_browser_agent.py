@@ -9,14 +9,29 @@ This agent:
 
 Based on: https://docs.browser-use.com/introduction
 """
-from typing import Dict, Any, List, TypedDict
+import asyncio
+import time
+from typing import Dict, Any, List, Optional, TypedDict
+from urllib.parse import urlparse
 from langgraph.graph import StateGraph, END
-from browser_use import Agent
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
+from browser_use import Agent, Browser
 
 from src import config
 from src.utils.logging_config import logger
+from src.utils.llm_usage import llm_usage
+from src.utils.browser_use_helper import get_configured_llm, record_agent_usage
+from src.services.strategy_stats import strategy_stats
+
+
+# Navigation strategies, in default order
+STRATEGIES = ["google_search", "direct_url", "explore_portal", "alternative_search"]
+
+# A strategy succeeded when it ends on the portal with at least this many
+# visible fillable fields
+MIN_FORM_FIELDS = 3
+FORM_FIELD_COUNT_JS = """() => [...document.querySelectorAll('input, select, textarea')].filter(
+    el => !['hidden', 'submit', 'button', 'image', 'reset'].includes(el.type) && el.offsetParent !== null
+).length"""
 
 
 class AgenticBrowserState(TypedDict):
@@ -44,30 +59,36 @@ class AgenticBrowserAgent:
     def __init__(self):
         self.llm = self._get_llm()
         self.browser_controller = None
+        self.browser_session = None  # Browser of the strategy that reached the form
         
     def _get_llm(self):
         """Get configured LLM for browser-use."""
-        if config.LLM_PROVIDER == "openai":
-            return ChatOpenAI(model="gpt-4o", temperature=0.1)
-        else:
-            return ChatAnthropic(model="claude-3-5-sonnet-20241022", temperature=0.1)
+        return get_configured_llm(source="agentic")
     
-    async def strategy_google_search(self, state: AgenticBrowserState) -> Dict[str, Any]:
+    async def _run_agent(self, task: str, browser: Any = None, source: str = "agentic"):
         """
-        Strategy 1: Search Google for the service.
-        """
-        logger.info("agentic_strategy", strategy="google_search", attempt=state['attempt_count'])
+        Run one browser-use agent task and account for its LLM usage.
         
-        service_queries = {
-            "mppsc": "MPOnline MPPSC application form official",
-            "electricity": "MPOnline electricity bill payment madhya pradesh",
-            "university": "MPOnline university admission madhya pradesh"
-        }
-        
-        query = service_queries.get(state['service_type'], f"MPOnline {state['service_type']}")
-        
-        try:
-            task = f"""
+        Concurrent runs must use distinct sources, since usage is measured
+        per source between a mark and the end of the run.
+        """
+        llm = self.llm if source == "agentic" else get_configured_llm(source=source)
+        usage_mark = llm_usage.mark(source)
+        started = time.perf_counter()
+        result = await Agent(task=task, llm=llm, browser=browser, calculate_cost=True).run()
+        record_agent_usage(result, source, config.get_llm_config()["model"], time.perf_counter() - started, usage_mark)
+        return result
+    
+    def _strategy_task(self, strategy: str, service_type: str) -> str:
+        """Natural-language task for a navigation strategy."""
+        if strategy == "google_search":
+            service_queries = {
+                "mppsc": "MPOnline MPPSC application form official",
+                "electricity": "MPOnline electricity bill payment madhya pradesh",
+                "university": "MPOnline university admission madhya pradesh"
+            }
+            query = service_queries.get(service_type, f"MPOnline {service_type}")
+            return f"""
             1. Go to google.com
             2. Search for: "{query}"
             3. Look for results from mponline.gov.in
@@ -75,9 +96,96 @@ class AgenticBrowserAgent:
             5. Navigate to the application or service page
             6. Stop when you see a form or application page
             """
+        
+        if strategy == "direct_url":
+            direct_urls = {
+                "mppsc": "https://www.mponline.gov.in/Portal/Examinations/MPPSC/",
+                "electricity": "https://www.mponline.gov.in/Portal/Services/MPEDC/Home.aspx",
+                "university": "https://www.mponline.gov.in/Portal/Services/Universities/Home.aspx"
+            }
+            url = direct_urls.get(service_type, "https://www.mponline.gov.in")
+            return f"""
+            1. Navigate to: {url}
+            2. Wait for the page to load completely
+            3. Look for application or registration link
+            4. Click on it to reach the form
+            5. Stop when you see a form
+            """
+        
+        if strategy == "explore_portal":
+            return f"""
+            1. Go to https://www.mponline.gov.in
+            2. Look at the homepage carefully
+            3. Find navigation menu or links related to "{service_type}"
+            4. Click through the navigation intelligently
+            5. Look for keywords: application, registration, form, {service_type}
+            6. Keep exploring until you find a form page
+            7. Don't give up easily - try different menu items
+            """
+        
+        return f"""
+            1. Go to duckduckgo.com
+            2. Search for: "MPOnline {service_type} application site:mponline.gov.in"
+            3. Click on relevant results
+            4. Navigate to the form page
+            5. Keep trying different links until you find a form
+            """
+    
+    async def _run_strategy(self, strategy: str, service_type: str):
+        """
+        Run a strategy in its own browser and check it reached a form page.
+        
+        Args:
+            strategy: Strategy name
+            service_type: Service type
             
-            agent = Agent(task=task, llm=self.llm)
-            result = await agent.run()
+        Returns:
+            The strategy's browser session, left on the form page
+            
+        Raises:
+            RuntimeError: If the agent finished somewhere that is not a form
+        """
+        # keep_alive: the winning browser is reused to discover and fill fields
+        session = Browser(headless=config.HEADLESS_MODE, keep_alive=True)
+        started = time.perf_counter()
+        try:
+            # Own usage source per strategy: racers run at the same time
+            await self._run_agent(
+                self._strategy_task(strategy, service_type), browser=session, source=f"agentic:{strategy}"
+            )
+            url, field_count = await _inspect_page(session)
+        except asyncio.CancelledError:
+            # Lost a race; no verdict on the strategy
+            await _close_session(session)
+            raise
+        except Exception:
+            strategy_stats.record(service_type, strategy, False, time.perf_counter() - started)
+            await _close_session(session)
+            raise
+        
+        reached = _is_form_page(url, field_count)
+        strategy_stats.record(service_type, strategy, reached, time.perf_counter() - started)
+        if not reached:
+            await _close_session(session)
+            raise RuntimeError(f"No form page reached (url={url}, fields={field_count})")
+        
+        logger.info("agentic_form_page_reached", strategy=strategy, url=url, fields=field_count)
+        return session
+    
+    async def _adopt_session(self, session):
+        """Continue in a strategy's browser, closing the previous one."""
+        previous, self.browser_session = self.browser_session, session
+        if previous is not None and previous is not session:
+            await _close_session(previous)
+    
+    async def strategy_google_search(self, state: AgenticBrowserState) -> Dict[str, Any]:
+        """
+        Strategy 1: Search Google for the service.
+        """
+        logger.info("agentic_strategy", strategy="google_search", attempt=state['attempt_count'])
+        
+        try:
+            await self._adopt_session(await self._run_strategy("google_search", state['service_type']))
             
             return {
                 "current_strategy": "google_search",
@@ -106,25 +214,8 @@ class AgenticBrowserAgent:
         """
         logger.info("agentic_strategy", strategy="direct_url", attempt=state['attempt_count'])
         
-        direct_urls = {
-            "mppsc": "https://www.mponline.gov.in/Portal/Examinations/MPPSC/",
-            "electricity": "https://www.mponline.gov.in/Portal/Services/MPEDC/Home.aspx",
-            "university": "https://www.mponline.gov.in/Portal/Services/Universities/Home.aspx"
-        }
-        
-        url = direct_urls.get(state['service_type'], "https://www.mponline.gov.in")
-        
         try:
-            task = f"""
-            1. Navigate to: {url}
-            2. Wait for the page to load completely
-            3. Look for application or registration link
-            4. Click on it to reach the form
-            5. Stop when you see a form
-            """
-            
-            agent = Agent(task=task, llm=self.llm)
-            result = await agent.run()
+            await self._adopt_session(await self._run_strategy("direct_url", state['service_type']))
             
             return {
                 "current_strategy": "direct_url",
@@ -154,18 +245,7 @@ class AgenticBrowserAgent:
         logger.info("agentic_strategy", strategy="explore_portal", attempt=state['attempt_count'])
         
         try:
-            task = f"""
-            1. Go to https://www.mponline.gov.in
-            2. Look at the homepage carefully
-            3. Find navigation menu or links related to "{state['service_type']}"
-            4. Click through the navigation intelligently
-            5. Look for keywords: application, registration, form, {state['service_type']}
-            6. Keep exploring until you find a form page
-            7. Don't give up easily - try different menu items
-            """
-            
-            agent = Agent(task=task, llm=self.llm)
-            result = await agent.run()
+            await self._adopt_session(await self._run_strategy("explore_portal", state['service_type']))
             
             return {
                 "current_strategy": "explore_portal",
@@ -195,16 +275,7 @@ class AgenticBrowserAgent:
         logger.info("agentic_strategy", strategy="alternative_search", attempt=state['attempt_count'])
         
         try:
-            task = f"""
-            1. Go to duckduckgo.com
-            2. Search for: "MPOnline {state['service_type']} application site:mponline.gov.in"
-            3. Click on relevant results
-            4. Navigate to the form page
-            5. Keep trying different links until you find a form
-            """
-            
-            agent = Agent(task=task, llm=self.llm)
-            result = await agent.run()
+            await self._adopt_session(await self._run_strategy("alternative_search", state['service_type']))
             
             return {
                 "current_strategy": "alternative_search",
@@ -227,6 +298,66 @@ class AgenticBrowserAgent:
                 "reasoning": "All strategies exhausted"
             }
     
+    async def race_strategies(self, state: AgenticBrowserState) -> Dict[str, Any]:
+        """
+        Run the best untried strategies concurrently, each in its own browser.
+        
+        The first to reach a validated form page wins and the others are
+        cancelled (their browsers closed). Strategies are ranked by their
+        success rate and latency for the service.
+        """
+        tried = state['strategies_tried']
+        ranked = strategy_stats.rank(state['service_type'], [s for s in STRATEGIES if s not in tried])
+        racers = ranked[:max(1, config.AGENTIC_RACE_WIDTH)]
+        logger.info("agentic_race_started", strategies=racers, attempt=state['attempt_count'])
+        
+        pending = {
+            asyncio.create_task(self._run_strategy(strategy, state['service_type'])): strategy
+            for strategy in racers
+        }
+        winner, errors = None, []
+        try:
+            while pending and winner is None:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    strategy = pending.pop(task)
+                    if task.exception() is None and winner is None:
+                        winner = strategy
+                        await self._adopt_session(task.result())
+                    elif task.exception() is None:
+                        await _close_session(task.result())  # Finished in the same tick; keep one
+                    else:
+                        logger.error("agentic_strategy_failed", strategy=strategy, error=str(task.exception()))
+                        errors.append(f"{strategy} failed: {task.exception()}")
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        
+        update = {
+            "strategies_tried": tried + racers,
+            "attempt_count": state['attempt_count'] + len(racers),
+            "errors": state['errors'] + errors,
+        }
+        if winner:
+            logger.info("agentic_race_won", strategy=winner, cancelled=[pending[task] for task in pending])
+            return {
+                **update,
+                "current_strategy": winner,
+                "success": True,
+                "next_action": "discover_fields",
+                "reasoning": f"{winner} reached the form first"
+            }
+        
+        exhausted = len(tried) + len(racers) >= len(STRATEGIES)
+        return {
+            **update,
+            "current_strategy": racers[-1],
+            "success": False,
+            "next_action": "exhausted" if exhausted else "try_next_strategy",
+            "reasoning": "All strategies exhausted" if exhausted else "Raced strategies failed, racing the rest"
+        }
+    
     async def discover_form_fields(self, state: AgenticBrowserState) -> Dict[str, Any]:
         """
         Intelligent form field discovery using AI.
@@ -245,8 +376,7 @@ class AgenticBrowserAgent:
             List all the fields you find.
             """
             
-            agent = Agent(task=task, llm=self.llm)
-            result = await agent.run()
+            result = await self._run_agent(task, browser=self.browser_session)
             
             # Parse result to extract fields (simplified)
             # In real implementation, we'd parse the AI's response
@@ -292,8 +422,7 @@ class AgenticBrowserAgent:
             6. Take your time and be accurate
             """
             
-            agent = Agent(task=task, llm=self.llm)
-            result = await agent.run()
+            result = await self._run_agent(task, browser=self.browser_session)
             
             return {
                 "success": True,
@@ -319,31 +448,23 @@ class AgenticBrowserAgent:
         def route_strategy(state: AgenticBrowserState) -> str:
             """Decide which strategy to try next."""
             tried = state.get('strategies_tried', [])
-            
-            # Try strategies in order, skipping already tried ones
-            if "google_search" not in tried:
-                return "google_search"
-            elif "direct_url" not in tried:
-                return "direct_url"
-            elif "explore_portal" not in tried:
-                return "explore_portal"
-            elif "alternative_search" not in tried:
-                return "alternative_search"
-            else:
+            untried = [strategy for strategy in STRATEGIES if strategy not in tried]
+            if not untried:
                 return "exhausted"
+            
+            if config.AGENTIC_RACE:
+                return "race"
+            
+            # Try the strategy with the best record for this service first
+            return strategy_stats.rank(state['service_type'], untried)[0]
         
         def route_after_strategy(state: AgenticBrowserState) -> str:
             """Route based on strategy success."""
             if state.get('success'):
                 return "discover_fields"
-            else:
-                next_action = state.get('next_action')
-                if next_action == "try_next_strategy":
-                    return "router"
-                elif next_action == "exhausted":
-                    return "exhausted"
-                else:
-                    return "router"
+            # The router knows what is left (strategies run in ranked order,
+            # so the one that reports "exhausted" may not be the last)
+            return "router"
         
         # Add nodes
         workflow.add_node("router", lambda s: s)  # Decision point
@@ -351,6 +472,7 @@ class AgenticBrowserAgent:
         workflow.add_node("direct_url", self.strategy_direct_url)
         workflow.add_node("explore_portal", self.strategy_explore_portal)
         workflow.add_node("alternative_search", self.strategy_alternative_search)
+        workflow.add_node("race", self.race_strategies)
         workflow.add_node("discover_fields", self.discover_form_fields)
         workflow.add_node("fill_form", self.fill_form_intelligently)
         workflow.add_node("exhausted", lambda s: {**s, "success": False, "reasoning": "All strategies exhausted"})
@@ -367,12 +489,13 @@ class AgenticBrowserAgent:
                 "direct_url": "direct_url",
                 "explore_portal": "explore_portal",
                 "alternative_search": "alternative_search",
+                "race": "race",
                 "exhausted": "exhausted"
             }
         )
         
-        # Each strategy routes based on success
-        for strategy in ["google_search", "direct_url", "explore_portal", "alternative_search"]:
+        # Each strategy (or race of strategies) routes based on success
+        for strategy in STRATEGIES + ["race"]:
             workflow.add_conditional_edges(
                 strategy,
                 route_after_strategy,
@@ -435,7 +558,10 @@ class AgenticBrowserAgent:
         
         logger.info("agentic_browser_starting", goal=goal, service=service_type)
         
-        final_state = await graph.ainvoke(initial_state)
+        try:
+            final_state = await graph.ainvoke(initial_state)
+        finally:
+            await self._adopt_session(None)
         
         logger.info("agentic_browser_completed", 
                    success=final_state.get('success'),
@@ -443,3 +569,32 @@ class AgenticBrowserAgent:
                    strategies_tried=final_state.get('strategies_tried'))
         
         return final_state
+
+
+async def _inspect_page(session) -> tuple[Optional[str], int]:
+    """URL a browser-use session ended on and its number of visible form fields."""
+    url = await session.get_current_page_url()
+    try:
+        page = await session.get_current_page()
+        field_count = int(await page.evaluate(FORM_FIELD_COUNT_JS)) if page else 0
+    except Exception as e:
+        logger.warning("agentic_page_inspect_failed", url=url, error=str(e))
+        field_count = 0
+    return url, field_count
+
+
+def _is_form_page(url: Optional[str], field_count: int) -> bool:
+    """Whether a page is an MPOnline form worth filling."""
+    hostname = urlparse(url or "").hostname or ""
+    return hostname.endswith("mponline.gov.in") and field_count >= MIN_FORM_FIELDS
+
+
+async def _close_session(session):
+    """Close a strategy's browser."""
+    if session is None:
+        return
+    try:
+        await session.kill()
+    except Exception as e:
+        logger.warning("agentic_browser_close_failed", error=str(e))
+
@@ -1,12 +1,17 @@
 """Auditor agent node - validates form state and catches errors."""
+import os
 import time
-import re
-from typing import Any
+from typing import Any, Optional
 from src.core.agent_state import AgentState
 from src.automation.browser_manager import browser_manager
 from src.automation import browser_actions
+from src.automation.page_cache import page_cache
+from src.core.event_bus import current_thread_id
+from src import config
 from src.utils.logging_config import logger
 from src.services.service_registry import SERVICE_REGISTRY
+from src.services.selector_overlay import selector_overlay
+from src.services.validation import validate_record, format_issue
 
 
 async def auditor_node(state: AgentState) -> dict[str, Any]:
@@ -37,12 +42,40 @@ async def auditor_node(state: AgentState) -> dict[str, Any]:
                 "next_action": "error"
             }
         
-        # Get field mappings for current step
-        field_mappings = service_template.get_field_mappings(state["current_step"])
-        validation_rules = service_template.get_validation_rules()
+        # Get field mappings for current step (with learned selectors)
+        field_mappings = selector_overlay.apply(
+            state["service_type"],
+            state["current_step"],
+            service_template.get_field_mappings(state["current_step"])
+        )
         
         errors = []
-        form_progress = state.get("form_progress", {})
+        form_progress = dict(state.get("form_progress", {}))
+        
+        # Read back every filled value and every visible validation message
+        # in one round trip, and un-mark fields whose value did not stick
+        # (e.g. cleared by an ASP.NET postback) so only those are re-filled
+        filled = {
+            field_name: field_config
+            for field_name, field_config in field_mappings.items()
+            if form_progress.get(field_name) and state["user_data"].get(field_name) is not None
+        }
+        form_state = await browser_actions.read_form_state(page, filled)
+        if form_state is None:
+            # Page unreadable: keep the previous progress rather than
+            # un-marking every filled field
+            form_state = {"values": {}, "messages": []}
+            filled = {}
+            errors.append("Could not read back form values")
+        mismatched = []
+        for field_name, field_config in filled.items():
+            actual = form_state["values"].get(field_name)
+            if not _value_matches(state["user_data"][field_name], actual, field_config.get("type", "text")):
+                mismatched.append(field_name)
+                form_progress[field_name] = False
+                errors.append(f"Value did not stick: {field_name}")
+                logger.warning("field_value_mismatch", field=field_name)
+        logger.info("form_values_verified", checked=len(filled), mismatched=len(mismatched))
         
         # Check required fields
         for field_name, field_config in field_mappings.items():
@@ -51,30 +84,18 @@ async def auditor_node(state: AgentState) -> dict[str, Any]:
                     errors.append(f"Required field not filled: {field_name}")
                     logger.warning("required_field_missing", field=field_name)
         
-        # Validate data formats
-        for field_name, value in state["user_data"].items():
-            # Email validation
-            if "email" in field_name.lower() and value:
-                if not _validate_email(value):
-                    errors.append(f"Invalid email format: {field_name}")
-                    logger.warning("invalid_email", field=field_name, value=value)
-            
-            # Phone validation (Indian format)
-            if "phone" in field_name.lower() or "mobile" in field_name.lower():
-                if value and not _validate_phone(value):
-                    errors.append(f"Invalid phone format: {field_name}")
-                    logger.warning("invalid_phone", field=field_name, value=value)
-            
-            # Date validation
-            if "date" in field_name.lower() or "dob" in field_name.lower():
-                if value and not _validate_date(value):
-                    errors.append(f"Invalid date format: {field_name}")
-                    logger.warning("invalid_date", field=field_name, value=value)
+        # Validate data formats with the template's compiled schema
+        # (required fields are covered by form_progress above)
+        for issue in validate_record(
+            state["service_type"], state["user_data"], fields=field_mappings, check_required=False
+        ):
+            errors.append(format_issue(issue))
+            logger.warning("invalid_field_value", field=issue["field"], code=issue["code"])
         
-        # Check for form-level errors on page
-        page_errors = await _check_page_errors(page)
-        if page_errors:
-            errors.extend(page_errors)
+        # Form-level validation messages shown on the page
+        for message in form_state["messages"]:
+            errors.append(f"Page error: {message}")
+            logger.info("page_error_found", error=message)
         
         # Take screenshot of validation state
         screenshot_path = f"{config.SCREENSHOTS_DIR}/audit_{int(time.time())}.png"
@@ -89,6 +110,8 @@ async def auditor_node(state: AgentState) -> dict[str, Any]:
         # Determine next action based on validation
         if errors:
             next_action = "fill_form"  # Go back to FormExpert to fix errors
+            # The page no longer matches what navigator captured
+            page_cache.invalidate(current_thread_id.get() or "default", reason="audit_failed")
         else:
             # Move to next step
             if state["current_step"] == "form_fill":
@@ -102,6 +125,7 @@ async def auditor_node(state: AgentState) -> dict[str, Any]:
         
         return {
             "errors": errors,
+            "form_progress": form_progress,
             "screenshot_path": screenshot_path,
             "next_action": next_action,
             "last_update_time": time.time()
@@ -115,53 +139,21 @@ async def auditor_node(state: AgentState) -> dict[str, Any]:
         }
 
 
-def _validate_email(email: str) -> bool:
-    """Validate email format."""
-    pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-    return bool(re.match(pattern, email))
-
+def _normalize(value: Any) -> str:
+    """Normalize a value for comparison (trimmed, collapsed whitespace, case-folded)."""
+    return " ".join(str(value).split()).casefold()
 
-def _validate_phone(phone: str) -> bool:
-    """Validate Indian phone number format."""
-    # Remove spaces, dashes, etc.
-    phone = re.sub(r'[\s\-\(\)]', '', phone)
-    # Check for 10 digits or +91 followed by 10 digits
-    pattern = r'^(?:\+91)?[6-9]\d{9}$'
-    return bool(re.match(pattern, phone))
 
-
-def _validate_date(date_str: str) -> bool:
-    """Validate date format (DD/MM/YYYY or DD-MM-YYYY or YYYY-MM-DD)."""
-    patterns = [
-        r'^\d{2}/\d{2}/\d{4}$',  # DD/MM/YYYY
-        r'^\d{2}-\d{2}-\d{4}$',  # DD-MM-YYYY
-        r'^\d{4}-\d{2}-\d{2}$',  # YYYY-MM-DD
-    ]
-    return any(re.match(pattern, date_str) for pattern in patterns)
-
-
-async def _check_page_errors(page) -> list[str]:
-    """Check for error messages displayed on the page."""
-    errors = []
-    
-    # Common error selectors
-    error_selectors = [
-        ".error",
-        ".alert-danger",
-        ".validation-error",
-        "[class*='error']",
-        ".field-validation-error"
-    ]
+def _value_matches(expected: Any, actual: Optional[dict], field_type: str) -> bool:
+    """Whether a value read back from the page matches the value that was filled."""
+    if not actual or not actual.get("present"):
+        return False
     
-    for selector in error_selectors:
-        try:
-            elements = await page.query_selector_all(selector)
-            for element in elements:
-                text = await element.text_content()
-                if text and text.strip():
-                    errors.append(f"Page error: {text.strip()}")
-                    logger.info("page_error_found", error=text.strip())
-        except Exception:
-            continue
+    if field_type == "file":
+        return bool(actual.get("value")) and _normalize(actual["value"]) == _normalize(os.path.basename(str(expected)))
     
-    return errors
+    candidates = [actual.get("value"), actual.get("text")]
+    return any(
+        candidate is not None and _normalize(candidate) == _normalize(expected)
+        for candidate in candidates
+    )
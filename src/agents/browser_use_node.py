@@ -3,14 +3,24 @@ import time
 import asyncio
 from typing import Dict, Any
 from browser_use import Agent, Browser
-from playwright.async_api import async_playwright, Browser as PlaywrightBrowser, Page
 
 from src.core.agent_state import AgentState
+from src.automation.browser_manager import browser_manager
+from src.automation import browser_actions
 from src.utils.browser_use_helper import (
     get_configured_llm,
     create_form_filling_task,
-    extract_browser_use_result
+    create_gap_filling_task,
+    find_gap_fields,
+    extract_browser_use_result,
+    harvest_selectors,
+    record_agent_usage
 )
+from src.utils.llm_usage import llm_usage
+from src.utils.metrics import metrics
+from src.core.budget import AI_GAP_FILL, mark_escalated
+from src.services.service_registry import SERVICE_REGISTRY
+from src.services.selector_overlay import selector_overlay, FORM_STEPS
 from src.utils.logging_config import logger
 from src import config
 
@@ -20,12 +30,13 @@ async def browser_use_node(state: AgentState) -> Dict[str, Any]:
     Use browser-use library for AI-driven browser automation.
     
     This node:
-    1. Creates a natural language task from user data
-    2. Launches browser-use agent with configured LLM
-    3. Agent searches Google for MPOnline
-    4. Agent navigates to service page
-    5. Agent fills form with user data
-    6. Returns updated state with progress
+    1. Creates a natural language task from user data - only the fields
+       still unfilled if the template path already worked on this step
+    2. Runs browser-use agent with configured LLM on the shared browser,
+       starting from the page navigator reached (or on real Chrome)
+    3. Agent fills form with user data
+    4. Hands the page back to BrowserManager for captcha/payment
+    5. Returns updated state with progress
     
     Args:
         state: Current agent state
@@ -38,29 +49,33 @@ async def browser_use_node(state: AgentState) -> Dict[str, Any]:
     start_time = time.time()
     user_data = state.get("user_data", {})
     service_type = state.get("service_type", "mppsc")
+    step = state.get("current_step", "form_fill")
+    shared_session = None
     
     try:
-        # Create the task in natural language
-        task = create_form_filling_task(user_data, service_type)
-        logger.info("browser_use_task_created", task_length=len(task))
-        
-        # Get configured LLM
-        llm = get_configured_llm()
-        
-        browser_instance = None
-        playwright = None
-        page = None
-        
         # Get browser mode from state (allows runtime override)
         use_real_browser = state.get("use_real_browser", config.USE_REAL_BROWSER)
         
-        # Choose between real Chrome browser or regular Playwright
+        # Once form_expert has worked on this step (hybrid mode, budget
+        # fallback), the AI only fills the gaps it left on the shared page
+        gap_fields = {}
+        if not use_real_browser and (state.get("attempt_count") or {}).get(step):
+            gap_fields = find_gap_fields(state)
+        source = "hybrid" if gap_fields else "browser_use"
+        
+        # Get configured LLM
+        llm = get_configured_llm(source=source)
+        
+        # Choose between real Chrome browser or the shared Playwright browser
         if use_real_browser:
             logger.info("browser_use_real_chrome", 
                        executable=config.CHROME_EXECUTABLE_PATH,
                        user_data_dir=config.CHROME_USER_DATA_DIR,
                        profile=config.CHROME_PROFILE)
             
+            # Create the task in natural language
+            task = create_form_filling_task(user_data, service_type)
+            
             # Use real Chrome browser with user data
             browser_instance = Browser(
                 executable_path=config.CHROME_EXECUTABLE_PATH,
@@ -73,85 +88,127 @@ async def browser_use_node(state: AgentState) -> Dict[str, Any]:
             agent = Agent(
                 task=task,
                 llm=llm,
-                browser=browser_instance
+                browser=browser_instance,
+                calculate_cost=True
             )
         else:
-            # Launch regular Playwright browser
-            playwright = await async_playwright().start()
-            browser = await playwright.chromium.launch(
-                headless=config.HEADLESS_MODE,
-                slow_mo=config.SLOW_MO
-            )
-            
-            # Create a new page
-            context = await browser.new_context(
-                viewport={"width": 1280, "height": 720},
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-            )
-            page = await context.new_page()
+            # Borrow the browser navigator already warmed over CDP; keep_alive
+            # stops browser_use from closing it when the agent finishes
+            page = await browser_manager.get_page()
+            start_url = page.url if page.url.startswith("http") else None
+            if gap_fields:
+                task = create_gap_filling_task(user_data, service_type, gap_fields, start_url=start_url)
+            else:
+                task = create_form_filling_task(user_data, service_type, start_url=start_url)
             
-            logger.info("browser_use_playwright_launched", headless=config.HEADLESS_MODE)
+            browser_instance = shared_session = Browser(cdp_url=browser_manager.cdp_url, keep_alive=True)
+            logger.info("browser_use_shared_browser", start_url=start_url)
             
-            # Create browser-use agent with the page
             agent = Agent(
                 task=task,
                 llm=llm,
-                browser=browser,
-                browser_context=context
+                browser=browser_instance,
+                directly_open_url=False,  # Already on the page; do not reload it
+                calculate_cost=True
             )
         
+        logger.info("browser_use_task_created", task_length=len(task), gap_fields=list(gap_fields))
         logger.info("browser_use_agent_created", task_preview=task[:100])
         
         # Run the agent
         logger.info("browser_use_agent_running", status="started")
+        usage_mark = llm_usage.mark(source)
+        run_started = time.perf_counter()
         result = await agent.run()
         logger.info("browser_use_agent_completed", duration=time.time() - start_time)
         
+        # Measured cost of this run, charged to the run's LLM budget
+        run_cost = record_agent_usage(
+            result,
+            source,
+            config.get_llm_config()["model"],
+            time.perf_counter() - run_started,
+            usage_mark
+        )
+        
         # Extract result information
         result_data = extract_browser_use_result(result)
+        _learn_selectors(service_type, harvest_selectors(result, user_data))
         
         # Take screenshot of final state
         screenshot_path = None
         current_url = None
         
         try:
-            # Get the page from the agent's browser context
             if use_real_browser:
                 # For real browser, browser-use manages everything
                 logger.info("browser_use_real_chrome_used", note="Browser remains open for user")
                 # Extract URL from result if available
                 current_url = result_data.get("final_url", "N/A")
             else:
-                # For Playwright, we have direct access to page
-                if page:
-                    screenshot_path = config.DATA_DIR / "screenshots" / f"browser_use_{int(time.time())}.png"
-                    screenshot_path.parent.mkdir(parents=True, exist_ok=True)
-                    await page.screenshot(path=str(screenshot_path), full_page=True)
-                    logger.info("browser_use_screenshot_saved", path=str(screenshot_path))
-                    current_url = page.url
+                # Hand the tab the agent finished on back to BrowserManager;
+                # the CDP session is stopped even if the URL cannot be read
+                final_url = None
+                try:
+                    final_url = await browser_instance.get_current_page_url()
+                except Exception as e:
+                    logger.warning("browser_use_final_url_unavailable", error=str(e))
+                finally:
+                    shared_session = None
+                    await browser_instance.stop()
+                page = await browser_manager.reclaim_page(final_url)
+                
+                screenshot_path = f"{config.SCREENSHOTS_DIR}/browser_use_{int(time.time())}.png"
+                await browser_actions.take_screenshot(page, screenshot_path)
+                logger.info("browser_use_page_reclaimed", url=page.url)
+                current_url = page.url
         except Exception as e:
-            logger.warning("browser_use_screenshot_failed", error=str(e))
-        
-        # Cleanup (only for Playwright, not real browser)
-        if not use_real_browser and playwright:
-            await browser.close()
-            await playwright.stop()
-            logger.info("browser_use_playwright_closed")
+            logger.warning("browser_use_handback_failed", error=str(e))
         
         # Determine if form was successfully filled
         # In a real scenario, we'd verify fields, but for now we trust the AI
         success = result_data.get("success", False)
         
+        if gap_fields:
+            # Back to the auditor, which checks what the agent filled
+            form_progress = dict(state.get("form_progress") or {})
+            field_paths = dict(state.get("field_paths") or {})
+            if success:
+                form_progress.update({field: True for field in gap_fields})
+                field_paths.update({field: "ai" for field in gap_fields})
+                _count_fields(service_type, len(gap_fields))
+            return {
+                "current_url": current_url,
+                "screenshot_path": screenshot_path,
+                "form_progress": form_progress,
+                "field_paths": field_paths,
+                "errors": result_data.get("errors", []) if not success else [],
+                "attempt_count": mark_escalated(state, AI_GAP_FILL, step),
+                "next_action": "audit",
+                "llm_spend": run_cost,
+                "last_update_time": time.time(),
+                # Only the new message: the messages reducer appends
+                "messages": [{
+                    "role": "assistant",
+                    "content": f"AI agent filled {len(gap_fields)} field(s) the template could not."
+                }]
+            }
+        
+        if success:
+            _count_fields(service_type, len(user_data))
+        
         # Update state
         return {
             "current_step": "form_filled" if success else "error",
             "current_url": current_url,
-            "screenshot_path": str(screenshot_path) if screenshot_path else None,
+            "screenshot_path": screenshot_path,
             "form_progress": {
                 field: True for field in user_data.keys()
             } if success else {},
+            "field_paths": {field: "ai" for field in user_data.keys()} if success else {},
             "errors": result_data.get("errors", []) if not success else [],
             "next_action": "captcha" if success else "error",
+            "llm_spend": run_cost,
             "last_update_time": time.time(),
             "messages": state.get("messages", []) + [{
                 "role": "assistant",
@@ -162,6 +219,13 @@ async def browser_use_node(state: AgentState) -> Dict[str, Any]:
     except Exception as e:
         logger.error("browser_use_node_error", error=str(e), traceback=True)
         
+        if shared_session is not None:
+            # Detach from the shared browser; it stays open for other nodes
+            try:
+                await shared_session.stop()
+            except Exception:
+                pass
+        
         return {
             "current_step": "error",
             "errors": state.get("errors", []) + [f"Browser-use error: {str(e)}"],
@@ -170,6 +234,36 @@ async def browser_use_node(state: AgentState) -> Dict[str, Any]:
         }
 
 
+def _count_fields(service_type: str, count: int):
+    """Count fields filled by the AI agent."""
+    metrics.inc(
+        "mponline_fields_filled_total",
+        amount=count,
+        help_text="Form fields filled, by automation path",
+        service_type=service_type,
+        path="ai"
+    )
+
+
+def _learn_selectors(service_type: str, harvested: Dict[str, str]):
+    """Record selectors the AI agent used into the template overlay."""
+    template = SERVICE_REGISTRY.get(service_type)
+    if not template or not harvested:
+        return
+    
+    for step in FORM_STEPS:
+        for field_name, field_config in template.get_field_mappings(step).items():
+            if field_name in harvested:
+                selector_overlay.learn(
+                    service_type,
+                    step,
+                    field_name,
+                    harvested[field_name],
+                    source="ai_agent",
+                    template_selector=field_config.get("selector")
+                )
+
+
 async def test_browser_use_simple() -> bool:
     """
     Simple test function for browser-use integration.
@@ -1,19 +1,37 @@
 """CAPTCHA handler node - manages HITL for CAPTCHA solving."""
+import asyncio
 import time
-from typing import Any
+from typing import Any, Optional
 from src.core.agent_state import AgentState
 from src.automation.browser_manager import browser_manager
 from src.automation import browser_actions
-from src.tools.human_input_tool import human_input_tool
+from src.tools.hitl_broker import hitl_broker
+from src.automation.speculative import speculative_prefetcher
+from src.core.event_bus import current_thread_id
 from src import config
 from src.utils.logging_config import logger
+from src.utils.metrics import metrics
+
+
+# CAPTCHA image selectors, checked together in one query
+CAPTCHA_IMAGE_SELECTORS = [
+    "#ctl00_ContentPlaceHolder1_CaptchaImage",  # Common MPOnline selector
+    "img[alt*='captcha' i]",
+    "img[src*='captcha' i]",
+    ".captcha-image",
+    "#captcha",
+    ".captcha",
+]
+
+# Anything that indicates a CAPTCHA on the page (image or answer input)
+CAPTCHA_SELECTORS = CAPTCHA_IMAGE_SELECTORS + ["[name='captcha']"]
 
 
 async def captcha_node(state: AgentState) -> dict[str, Any]:
     """
     CAPTCHA handler with Human-in-the-Loop:
     - Detects CAPTCHA presence
-    - Takes screenshot
+    - Captures just the CAPTCHA image in memory
     - Interrupts graph execution
     - Waits for human input
     - Submits CAPTCHA solution
@@ -50,32 +68,47 @@ async def captcha_node(state: AgentState) -> dict[str, Any]:
                 }
         
         # Detect CAPTCHA
-        captcha_present = await _detect_captcha(page)
+        captcha_element = await _detect_captcha(page)
         
-        if not captcha_present:
+        if not captcha_element:
             logger.info("no_captcha_detected")
             return {
                 "next_action": "continue",
                 "last_update_time": time.time()
             }
         
-        # Take screenshot of CAPTCHA
-        screenshot_path = f"{config.SCREENSHOTS_DIR}/captcha_{int(time.time())}.png"
-        await browser_actions.take_screenshot(page, screenshot_path)
+        # Capture just the CAPTCHA element, in memory
+        screenshot_path = None
+        attachment = await _capture_captcha(captcha_element)
+        if attachment is None:
+            # Fall back to a full-page screenshot on disk
+            screenshot_path = f"{config.SCREENSHOTS_DIR}/captcha_{int(time.time())}.png"
+            await browser_actions.take_screenshot(page, screenshot_path)
+            attachment = screenshot_path
         
-        logger.info("captcha_detected", screenshot=screenshot_path)
+        logger.info("captcha_detected", in_memory=screenshot_path is None)
         
-        # Request human input
-        request_id = f"captcha_{int(time.time())}"
+        # Prepare the next step in the background while the operator works
+        thread_id = current_thread_id.get() or "default"
+        speculative_prefetcher.start(thread_id, state)
         
-        solution = await human_input_tool.request_input(
-            request_id=request_id,
-            prompt="Please solve the CAPTCHA visible in the screenshot",
-            input_type="text",
-            timeout=config.CAPTCHA_TIMEOUT
-        )
+        # Queue for the operator pool (solve time is tracked by the broker
+        # as mponline_hitl_time_to_answer_seconds{kind="captcha"})
+        try:
+            solution = await hitl_broker.request(
+                kind="captcha",
+                prompt="Please solve the CAPTCHA shown in the image",
+                input_type="text",
+                timeout=config.CAPTCHA_TIMEOUT,
+                attachment=attachment
+            )
+        except asyncio.CancelledError:
+            await speculative_prefetcher.discard(thread_id, outcome="cancelled")
+            raise
         
         if not solution:
+            # Cancelled or timed out: nothing prepared for the next step is kept
+            await speculative_prefetcher.discard(thread_id, outcome="cancelled")
             logger.warning("captcha_timeout")
             return {
                 "errors": ["CAPTCHA solving timed out"],
@@ -93,6 +126,7 @@ async def captcha_node(state: AgentState) -> dict[str, Any]:
                 "last_update_time": time.time()
             }
         else:
+            await speculative_prefetcher.discard(thread_id)
             logger.error("captcha_submission_failed")
             return {
                 "errors": ["Failed to submit CAPTCHA"],
@@ -107,28 +141,60 @@ async def captcha_node(state: AgentState) -> dict[str, Any]:
         }
 
 
-async def _detect_captcha(page) -> bool:
-    """Detect if CAPTCHA is present on page."""
-    # Common CAPTCHA selectors
-    captcha_selectors = [
-        "#captcha",
-        ".captcha",
-        "[name='captcha']",
-        "img[alt*='captcha' i]",
-        "img[src*='captcha' i]",
-        "#ctl00_ContentPlaceHolder1_CaptchaImage",  # Common MPOnline selector
-        ".captcha-image"
-    ]
+async def _detect_captcha(page):
+    """
+    Find a visible CAPTCHA with one combined selector wait.
     
-    for selector in captcha_selectors:
-        try:
-            if await browser_actions.wait_for_selector(page, selector, timeout=2000):
-                logger.info("captcha_found", selector=selector)
-                return True
-        except Exception:
-            continue
+    Returns:
+        Element handle of the CAPTCHA image (or of whatever indicated the
+        CAPTCHA if no image matches), or None if no CAPTCHA is shown
+    """
+    try:
+        element = await page.wait_for_selector(
+            ", ".join(CAPTCHA_SELECTORS), state="visible", timeout=2000
+        )
+    except Exception:
+        return None
     
-    return False
+    if not element:
+        return None
+    logger.info("captcha_found")
+    
+    # The first match in document order may be the answer input; prefer the image
+    image = await page.query_selector(", ".join(CAPTCHA_IMAGE_SELECTORS))
+    return image or element
+
+
+async def _capture_captcha(element) -> Optional[bytes]:
+    """
+    Screenshot just the CAPTCHA element.
+    
+    The image is clipped from the rendered page rather than re-downloaded,
+    since fetching the CAPTCHA URL again would issue a new challenge.
+    
+    Returns:
+        PNG bytes, or None if the element could not be captured
+    """
+    started = time.perf_counter()
+    try:
+        image = await element.screenshot(type="png")
+    except Exception as e:
+        logger.warning("captcha_capture_failed", error=str(e))
+        return None
+    
+    elapsed = time.perf_counter() - started
+    metrics.observe(
+        "mponline_captcha_capture_seconds",
+        elapsed,
+        help_text="Time to capture the CAPTCHA image"
+    )
+    metrics.observe(
+        "mponline_captcha_payload_bytes",
+        len(image),
+        help_text="Size of the CAPTCHA image sent to operators"
+    )
+    logger.info("captcha_captured", bytes=len(image), latency=round(elapsed, 3))
+    return image
 
 
 async def _submit_captcha(page, solution: str) -> bool:
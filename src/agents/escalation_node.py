@@ -0,0 +1,72 @@
+"""Escalation node - handles exhausted retry, time and spend budgets."""
+import time
+from typing import Any
+from src.core.agent_state import AgentState
+from src.core.budget import check_budget, mark_escalated, AI_FALLBACK, HITL
+from src.automation.browser_manager import browser_manager
+from src.tools.hitl_broker import hitl_broker
+from src import config
+from src.utils.logging_config import logger
+
+
+async def escalation_node(state: AgentState) -> dict[str, Any]:
+    """
+    Escalation handler for runaway auditor/form_expert loops:
+    - Hands the step to the AI agent once (AI fallback)
+    - Asks a human whether to retry the step (HITL)
+    - Aborts and releases the run's page otherwise
+    
+    Args:
+        state: Current agent state
+        
+    Returns:
+        Partial state update
+    """
+    decision = check_budget(state)
+    step = state.get("current_step", "unknown")
+    
+    if decision is None:
+        # Budget recovered (e.g. counters reset) - continue the normal loop
+        return {"next_action": "fill_form", "last_update_time": time.time()}
+    
+    logger.warning("budget_exhausted", **decision)
+    
+    if decision["escalation"] == AI_FALLBACK:
+        return {
+            "attempt_count": mark_escalated(state, AI_FALLBACK, step),
+            "next_action": "ai_fallback",
+            "last_update_time": time.time()
+        }
+    
+    if decision["escalation"] == HITL:
+        recent_errors = (state.get("errors") or [])[-5:]
+        prompt = f"""Automation is stuck: {decision['detail']}.
+Recent errors:
+{chr(10).join(f'- {error}' for error in recent_errors) or '- none recorded'}
+
+Fix the page manually if needed, then type 'retry' to try this step again or 'abort' to stop."""
+        
+        answer = await hitl_broker.request(
+            kind="escalation",
+            prompt=prompt,
+            input_type="confirmation",
+            timeout=config.CAPTCHA_TIMEOUT
+        )
+        
+        if answer and answer.strip().lower() == "retry":
+            logger.info("escalation_retry_approved", step=step)
+            return {
+                "attempt_count": mark_escalated(state, HITL, step, reset_step=True),
+                "next_action": "fill_form",
+                "last_update_time": time.time()
+            }
+    
+    # Abort: release this run's page only; the shared browser stays up
+    logger.error("escalation_abort", step=step, reason=decision["reason"])
+    await browser_manager.close_page()
+    
+    return {
+        "errors": [f"Budget exhausted: {decision['detail']}"],
+        "next_action": "error",
+        "last_update_time": time.time()
+    }
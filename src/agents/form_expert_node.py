@@ -4,10 +4,17 @@ from typing import Any
 from src.core.agent_state import AgentState
 from src.automation.browser_manager import browser_manager
 from src.automation import browser_actions
+from src.automation.speculative import speculative_prefetcher
 from src.tools.vision_tool import vision_tool
 from src import config
 from src.utils.logging_config import logger
+from src.core.event_bus import event_bus, current_thread_id, FIELD_FILLED
+from src.utils.metrics import metrics
+from src.core.budget import charge_attempt
 from src.services.service_registry import SERVICE_REGISTRY
+from src.services.selector_overlay import selector_overlay
+from src.utils.llm_usage import llm_usage
+from src.utils.recorder import recorder
 
 
 async def form_expert_node(state: AgentState) -> dict[str, Any]:
@@ -38,14 +45,26 @@ async def form_expert_node(state: AgentState) -> dict[str, Any]:
                 "next_action": "error"
             }
         
-        # Get field mappings for current step
-        field_mappings = service_template.get_field_mappings(state["current_step"])
+        # Use what was prepared for this step during the last CAPTCHA wait
+        prepared = await speculative_prefetcher.consume(current_thread_id.get() or "default", state["current_step"])
+        user_data = {**state["user_data"], **prepared.get("documents", {})}
+        
+        # Get field mappings for current step, with learned selectors promoted
+        field_mappings = prepared.get("field_mappings") or selector_overlay.apply(
+            state["service_type"],
+            state["current_step"],
+            service_template.get_field_mappings(state["current_step"])
+        )
         
         form_progress = state.get("form_progress", {})
+        field_paths = dict(state.get("field_paths") or {})
         errors = []
         filled_count = 0
+        vision_calls = 0
+        usage_mark = llm_usage.mark("vision")
         
-        # Fill each field
+        # Build the fill plan: fields still to fill that have a value
+        plan = {}
         for field_name, field_config in field_mappings.items():
             # Skip if already filled
             if form_progress.get(field_name, False):
@@ -53,38 +72,86 @@ async def form_expert_node(state: AgentState) -> dict[str, Any]:
                 continue
             
             # Get value from user_data
-            value = state["user_data"].get(field_name)
-            if value is None:
+            if user_data.get(field_name) is None:
                 logger.warning("field_value_missing", field=field_name)
                 errors.append(f"Missing value for field: {field_name}")
                 continue
             
-            # Get selector
-            selector = field_config.get("selector")
+            plan[field_name] = field_config
+        
+        # Resolve every selector (learned and template fallback) in one DOM
+        # query instead of a blocking wait per field; only fields actually
+        # missing go to vision
+        probe_targets = {}
+        for field_name, field_config in plan.items():
+            if field_config.get("selector"):
+                probe_targets[field_name] = field_config["selector"]
+            if field_config.get("fallback_selector"):
+                probe_targets[f"{field_name}:fallback"] = field_config["fallback_selector"]
+        probe = await browser_actions.probe_selectors(page, probe_targets)
+        
+        missing = []
+        for field_name, field_config in plan.items():
             field_type = field_config.get("type", "text")
+            if _is_usable(probe.get(field_name), field_type):
+                continue
+            if field_config.get("fallback_selector"):
+                # Learned selector no longer resolves; the template may again
+                selector_overlay.record(state["service_type"], state["current_step"], field_name, hit=False)
+                if _is_usable(probe.get(f"{field_name}:fallback"), field_type):
+                    plan[field_name] = {
+                        **field_config,
+                        "selector": field_config["fallback_selector"],
+                        "selector_source": "template",
+                    }
+                    continue
+            missing.append(field_name)
+        logger.info("field_plan_resolved", planned=len(plan), missing=len(missing))
+        
+        # Resolve missing fields from the selector cache, then from one
+        # screenshot in one vision call for whatever the cache could not serve
+        vision_selectors = {}
+        if missing:
+            logger.info("using_vision_tool", fields=missing)
             
-            # If selector not found, use VisionTool
-            if not selector or not await browser_actions.wait_for_selector(page, selector, timeout=3000):
-                logger.info("using_vision_tool", field=field_name)
-                
-                # Take screenshot
-                screenshot_path = f"{config.SCREENSHOTS_DIR}/vision_{field_name}_{int(time.time())}.png"
-                await browser_actions.take_screenshot(page, screenshot_path)
-                
-                # Use VisionTool
-                vision_result = await vision_tool.identify_element(
-                    screenshot_path,
-                    field_name,
-                    field_config.get("description")
+            screenshot_path = f"{config.SCREENSHOTS_DIR}/vision_{state['current_step']}_{int(time.time())}.png"
+            batch = await vision_tool.locate_fields(
+                page,
+                state["service_type"],
+                {field_name: plan[field_name].get("description") for field_name in missing},
+                screenshot_path
+            )
+            if batch["vision_called"]:
+                vision_calls += 1
+            
+            for field_name, vision_result in batch["fields"].items():
+                vision_found = bool(vision_result.get("selector")) and float(vision_result.get("confidence") or 0) > 60
+                metrics.inc(
+                    "mponline_vision_fallbacks_total",
+                    help_text="Template selector misses resolved through VisionTool",
+                    service_type=state["service_type"],
+                    outcome="success" if vision_found else "failure"
                 )
                 
-                if vision_result["confidence"] > 60:
-                    selector = vision_result["selector"]
-                    logger.info("vision_tool_success", field=field_name, selector=selector)
+                if vision_found:
+                    vision_selectors[field_name] = vision_result["selector"]
+                    logger.info("vision_tool_success", field=field_name, selector=vision_result["selector"])
                 else:
                     logger.error("vision_tool_failed", field=field_name)
+        
+        # Fill each field
+        for field_name, field_config in plan.items():
+            value = user_data[field_name]
+            
+            # Get selector (vision result for fields missing from the page)
+            selector = field_config.get("selector")
+            field_type = field_config.get("type", "text")
+            
+            if field_name in missing:
+                if field_name not in vision_selectors:
                     errors.append(f"Could not find selector for: {field_name}")
                     continue
+                selector = vision_selectors[field_name]
             
             # Fill the field based on type
             success = False
@@ -103,10 +170,25 @@ async def form_expert_node(state: AgentState) -> dict[str, Any]:
             elif field_type == "file":
                 success = await browser_actions.upload_file(page, selector, str(value))
             
+            if field_name in missing and success:
+                # Remember the vision selector so the next run skips the vision call
+                selector_overlay.learn(
+                    state["service_type"],
+                    state["current_step"],
+                    field_name,
+                    selector,
+                    source="vision",
+                    template_selector=field_config.get("fallback_selector") or field_config.get("selector")
+                )
+            elif field_config.get("selector_source") not in (None, "template"):
+                selector_overlay.record(state["service_type"], state["current_step"], field_name, hit=success)
+            
             if success:
                 form_progress[field_name] = True
+                field_paths[field_name] = "template"
                 filled_count += 1
                 logger.info("field_filled", field=field_name, type=field_type)
+                event_bus.publish(FIELD_FILLED, field=field_name, field_type=field_type)
             else:
                 errors.append(f"Failed to fill field: {field_name}")
                 logger.error("field_fill_failed", field=field_name)
@@ -118,6 +200,14 @@ async def form_expert_node(state: AgentState) -> dict[str, Any]:
         # Extract DOM
         dom = await browser_actions.extract_dom_snapshot(page)
         
+        metrics.inc(
+            "mponline_fields_filled_total",
+            amount=filled_count,
+            help_text="Form fields filled, by automation path",
+            service_type=state["service_type"],
+            path="template"
+        )
+        
         logger.info(
             "form_expert_completed",
             filled=filled_count,
@@ -131,14 +221,21 @@ async def form_expert_node(state: AgentState) -> dict[str, Any]:
         else:
             next_action = "audit"  # Always audit before proceeding
         
-        return {
+        update = {
             "form_progress": form_progress,
+            "field_paths": field_paths,
             "screenshot_path": screenshot_path,
             "dom_snapshot": dom,
             "errors": errors if errors else [],
+            "attempt_count": charge_attempt(state),
+            "llm_spend": _vision_spend(usage_mark, vision_calls),
             "next_action": next_action,
             "last_update_time": time.time()
         }
+        if prepared.get("documents"):
+            # Upload (and audit against) the copies re-encoded to fit the size limits
+            update["user_data"] = user_data
+        return update
     
     except Exception as e:
         logger.error("form_expert_node_error", error=str(e))
@@ -146,3 +243,22 @@ async def form_expert_node(state: AgentState) -> dict[str, Any]:
             "errors": [f"FormExpert error: {str(e)}"],
             "next_action": "error"
         }
+
+
+def _is_usable(flags: dict, field_type: str) -> bool:
+    """Whether a probed template selector can be filled without vision."""
+    if not flags or not flags.get("present"):
+        return False
+    # File inputs are commonly hidden behind styled buttons
+    return field_type == "file" or flags.get("visible", False)
+
+
+def _vision_spend(usage_mark: tuple, vision_calls: int) -> float:
+    """
+    Vision cost since the mark: measured usage only, so LLM cache hits cost
+    nothing. Replay has no measured usage and is charged the flat per-call
+    estimate instead, so budgets behave as in the recorded run.
+    """
+    if recorder.replaying:
+        return vision_calls * config.VISION_CALL_COST
+    return llm_usage.since(usage_mark)["cost"]
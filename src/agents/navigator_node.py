@@ -1,9 +1,11 @@
 """Navigator agent node - handles URL routing and login."""
 import time
-from typing import Any
+from typing import Any, Optional
 from src.core.agent_state import AgentState
 from src.automation.browser_manager import browser_manager
 from src.automation import browser_actions
+from src.automation.page_cache import page_cache
+from src.core.event_bus import current_thread_id
 from src import config
 from src.utils.logging_config import logger
 from src.services.service_registry import SERVICE_REGISTRY
@@ -41,23 +43,15 @@ async def navigator_node(state: AgentState) -> dict[str, Any]:
         current_step = state.get("current_step", "start")
         
         if current_step == "start":
-            # Navigate to service URL
+            # Navigate to service URL (skipped if the page is already there)
             url = service_template.get_url()
-            await page.goto(url)
-            logger.info("navigated_to_service", url=url)
-            
-            # Take screenshot
-            screenshot_path = f"{config.SCREENSHOTS_DIR}/nav_start_{int(time.time())}.png"
-            await browser_actions.take_screenshot(page, screenshot_path)
-            
-            # Extract DOM
-            dom = await browser_actions.extract_dom_snapshot(page)
+            captured = await _capture_page_state(page, "start", url)
             
             return {
                 "current_step": "login",
                 "current_url": url,
-                "screenshot_path": screenshot_path,
-                "dom_snapshot": dom,
+                "screenshot_path": captured["screenshot_path"],
+                "dom_snapshot": captured["dom_snapshot"],
                 "next_action": "navigate",
                 "last_update_time": time.time()
             }
@@ -72,16 +66,13 @@ async def navigator_node(state: AgentState) -> dict[str, Any]:
                     "next_action": "error"
                 }
             
-            # Take screenshot after login
-            screenshot_path = f"{config.SCREENSHOTS_DIR}/nav_login_{int(time.time())}.png"
-            await browser_actions.take_screenshot(page, screenshot_path)
-            
-            dom = await browser_actions.extract_dom_snapshot(page)
+            # Capture page after login
+            captured = await _capture_page_state(page, "login")
             
             return {
                 "current_step": "form_fill",
-                "screenshot_path": screenshot_path,
-                "dom_snapshot": dom,
+                "screenshot_path": captured["screenshot_path"],
+                "dom_snapshot": captured["dom_snapshot"],
                 "next_action": "fill_form",
                 "last_update_time": time.time()
             }
@@ -91,19 +82,17 @@ async def navigator_node(state: AgentState) -> dict[str, Any]:
             nav_success = await _navigate_to_step(page, service_template, current_step)
             
             if not nav_success:
+                page_cache.invalidate(current_thread_id.get() or "default", reason="navigation_failed")
                 return {
                     "errors": [f"Failed to navigate to {current_step}"],
                     "next_action": "error"
                 }
             
-            screenshot_path = f"{config.SCREENSHOTS_DIR}/nav_{current_step}_{int(time.time())}.png"
-            await browser_actions.take_screenshot(page, screenshot_path)
-            
-            dom = await browser_actions.extract_dom_snapshot(page)
+            captured = await _capture_page_state(page, current_step)
             
             return {
-                "screenshot_path": screenshot_path,
-                "dom_snapshot": dom,
+                "screenshot_path": captured["screenshot_path"],
+                "dom_snapshot": captured["dom_snapshot"],
                 "current_url": page.url,
                 "next_action": state.get("next_action", "continue"),
                 "last_update_time": time.time()
@@ -123,6 +112,55 @@ async def navigator_node(state: AgentState) -> dict[str, Any]:
         }
 
 
+async def _capture_page_state(page, step: str, url: Optional[str] = None) -> dict[str, Any]:
+    """
+    Navigate to url if needed, then take screenshot and DOM snapshot.
+    
+    Only when the page is already on the target and its fingerprint matches
+    this thread's last capture are goto, screenshot and DOM extraction
+    skipped. A matching URL alone is not enough: ASP.NET pages keep one URL
+    across postbacks, so the page showing may be stale.
+    
+    Args:
+        page: Playwright page object
+        step: Navigation step (used for screenshot names and timing)
+        url: Target URL, or None to capture the current page
+        
+    Returns:
+        Dict with screenshot_path and dom_snapshot
+    """
+    thread_id = current_thread_id.get() or "default"
+    started = time.perf_counter()
+    on_target = url is None or browser_actions.normalize_url(page.url) == browser_actions.normalize_url(url)
+    
+    if on_target:
+        cached = page_cache.lookup(thread_id, await browser_actions.page_fingerprint(page))
+        if cached:
+            page_cache.record_skip(thread_id, step)
+            return cached
+    if url is not None:
+        await page.goto(url)
+        logger.info("navigated_to_service", url=url)
+    
+    screenshot_path = f"{config.SCREENSHOTS_DIR}/nav_{step}_{int(time.time())}.png"
+    await browser_actions.take_screenshot(page, screenshot_path)
+    dom = await browser_actions.extract_dom_snapshot(page)
+    
+    page_cache.store(
+        thread_id,
+        step,
+        await browser_actions.page_fingerprint(page),
+        screenshot_path,
+        dom,
+        time.perf_counter() - started
+    )
+    
+    return {
+        "screenshot_path": screenshot_path,
+        "dom_snapshot": dom
+    }
+
+
 async def _perform_login(page, service_template) -> bool:
     """Perform login to MPOnline portal."""
     try:
@@ -1,12 +1,55 @@
 """Payment verification node - manages HITL for payment confirmation."""
+import asyncio
 import time
 from typing import Any
 from src.core.agent_state import AgentState
 from src.automation.browser_manager import browser_manager
 from src.automation import browser_actions
-from src.tools.human_input_tool import human_input_tool
+from src.tools.hitl_broker import hitl_broker
 from src import config
 from src.utils.logging_config import logger
+from src.utils.metrics import metrics
+
+
+# Payment amount and service name, most specific first
+AMOUNT_SELECTORS = [
+    ".payment-amount",
+    "#paymentAmount",
+    ".total-amount",
+    "[class*='amount']",
+]
+SERVICE_SELECTORS = [
+    ".service-name",
+    ".application-type",
+    "h2",
+    "h3",
+]
+
+# Buttons that hand over to the payment gateway
+PROCEED_SELECTORS = [
+    "#btnPayNow",
+    ".payment-btn",
+    "button:has-text('Pay Now')",
+    "button:has-text('Proceed')",
+    "input[value*='Proceed']",
+    "input[value*='Pay']",
+    "button[type='submit']",
+]
+
+# How gateway result pages are recognised by URL path, page text or
+# element (failure is checked first)
+PAYMENT_OUTCOME_SIGNATURES = {
+    "success": {
+        "url": r"success|receipt|acknowledg",
+        "text": r"payment (was )?successful|transaction successful|payment received|e-?receipt",
+        "selectors": [".success-message", ".payment-success", "#lblReceiptNo"],
+    },
+    "failure": {
+        "url": r"fail|declin|cancel|error",
+        "text": r"payment (has )?failed|transaction (has )?failed|declined|transaction cancelled",
+        "selectors": [".payment-failure", ".failure-message"],
+    },
+}
 
 
 async def payment_node(state: AgentState) -> dict[str, Any]:
@@ -32,28 +75,10 @@ async def payment_node(state: AgentState) -> dict[str, Any]:
         # Check if payment already confirmed
         if state.get("payment_confirmed", False):
             # Proceed with payment
-            success = await _process_payment(page, state)
-            
-            if success:
-                logger.info("payment_processed_successfully")
-                
-                # Take final screenshot
-                screenshot_path = f"{config.SCREENSHOTS_DIR}/payment_success_{int(time.time())}.png"
-                await browser_actions.take_screenshot(page, screenshot_path)
-                
-                return {
-                    "current_step": "complete",
-                    "screenshot_path": screenshot_path,
-                    "next_action": "complete",
-                    "last_update_time": time.time()
-                }
-            else:
-                return {
-                    "errors": ["Payment processing failed"],
-                    "next_action": "error"
-                }
+            result = await _process_payment(page, time.perf_counter())
+            return await _payment_result(page, result)
         
-        # Extract payment details from page
+        # Extract payment details from page in one pass
         payment_details = await _extract_payment_details(page)
         
         # Take screenshot of payment page
@@ -62,20 +87,19 @@ async def payment_node(state: AgentState) -> dict[str, Any]:
         
         logger.info("payment_confirmation_required", details=payment_details)
         
-        # Request human confirmation
-        request_id = f"payment_{int(time.time())}"
-        
+        # Request human confirmation from the operator pool
         prompt = f"""Payment Confirmation Required:
-{payment_details}
+{_format_payment_details(payment_details)}
 
 Please review the payment details and confirm to proceed.
 Type 'confirm' to proceed or 'cancel' to abort."""
         
-        confirmation = await human_input_tool.request_input(
-            request_id=request_id,
+        confirmation = await hitl_broker.request(
+            kind="payment",
             prompt=prompt,
             input_type="confirmation",
-            timeout=config.PAYMENT_TIMEOUT
+            timeout=config.PAYMENT_TIMEOUT,
+            attachment=screenshot_path
         )
         
         if not confirmation or confirmation.lower() != "confirm":
@@ -86,26 +110,8 @@ Type 'confirm' to proceed or 'cancel' to abort."""
             }
         
         # Mark as confirmed and process
-        success = await _process_payment(page, state)
-        
-        if success:
-            logger.info("payment_completed")
-            
-            final_screenshot = f"{config.SCREENSHOTS_DIR}/payment_final_{int(time.time())}.png"
-            await browser_actions.take_screenshot(page, final_screenshot)
-            
-            return {
-                "payment_confirmed": True,
-                "current_step": "complete",
-                "screenshot_path": final_screenshot,
-                "next_action": "complete",
-                "last_update_time": time.time()
-            }
-        else:
-            return {
-                "errors": ["Payment failed"],
-                "next_action": "error"
-            }
+        result = await _process_payment(page, time.perf_counter())
+        return {"payment_confirmed": True, **(await _payment_result(page, result))}
     
     except Exception as e:
         logger.error("payment_node_error", error=str(e))
@@ -115,104 +121,234 @@ Type 'confirm' to proceed or 'cancel' to abort."""
         }
 
 
-async def _extract_payment_details(page) -> str:
-    """Extract payment information from the page."""
+async def _payment_result(page, result: dict[str, Any]) -> dict[str, Any]:
+    """Turn a gateway outcome into a state update."""
+    if result["outcome"] != "success":
+        message = {
+            "failure": "Payment failed at the gateway",
+            "unknown": "Payment outcome unknown; check the portal for a receipt before retrying",
+            "no_button": "Payment processing failed: no proceed button found",
+        }[result["outcome"]]
+        return {
+            "errors": [message],
+            "next_action": "error"
+        }
+    
+    logger.info("payment_completed", elapsed=round(result["elapsed"], 3))
+    
+    # Take final screenshot of the receipt
+    screenshot_path = f"{config.SCREENSHOTS_DIR}/payment_success_{int(time.time())}.png"
+    await browser_actions.take_screenshot(page, screenshot_path)
+    
+    return {
+        "current_step": "complete",
+        "screenshot_path": screenshot_path,
+        "next_action": "complete",
+        "last_update_time": time.time()
+    }
+
+
+async def _extract_payment_details(page) -> dict[str, Any]:
+    """
+    Extract amount, fees, application ID and gateway options in one DOM evaluation.
+    
+    Returns:
+        Dict with amount, fees (label -> text), application_id, service,
+        gateway_options (list of labels) and url; missing values are None
+    """
     try:
-        # Look for payment amount
-        amount_selectors = [
-            ".payment-amount",
-            "#paymentAmount",
-            "[class*='amount']",
-            ".total-amount"
-        ]
-        
-        amount = "Not found"
-        for selector in amount_selectors:
-            try:
-                element = await page.query_selector(selector)
-                if element:
-                    amount = await element.text_content()
-                    break
-            except Exception:
-                continue
-        
-        # Look for service/application details
-        service_selectors = [
-            ".service-name",
-            ".application-type",
-            "h2",
-            "h3"
-        ]
-        
-        service = "Not found"
-        for selector in service_selectors:
-            try:
-                element = await page.query_selector(selector)
-                if element:
-                    service = await element.text_content()
-                    break
-            except Exception:
-                continue
-        
-        details = f"""
-Amount: {amount}
-Service: {service}
-URL: {page.url}
-"""
-        
-        return details.strip()
+        details = await page.evaluate(
+            """(selectors) => {
+                const clean = (text) => (text || '').replace(/\\s+/g, ' ').trim();
+                const first = (list) => {
+                    for (const selector of list) {
+                        let el = null;
+                        try { el = document.querySelector(selector); } catch (e) {}
+                        if (el && clean(el.textContent)) return clean(el.textContent);
+                    }
+                    return null;
+                };
+                
+                // Label/value pairs from table rows and definition-style layouts
+                const pairs = [];
+                for (const row of document.querySelectorAll('tr')) {
+                    const cells = row.querySelectorAll('th, td');
+                    if (cells.length >= 2) {
+                        pairs.push([clean(cells[0].textContent), clean(cells[cells.length - 1].textContent)]);
+                    }
+                }
+                for (const label of document.querySelectorAll('label, dt, .label')) {
+                    const next = label.nextElementSibling;
+                    if (next) pairs.push([clean(label.textContent), clean(next.textContent || next.value)]);
+                }
+                
+                let applicationId = null;
+                const fees = {};
+                for (const [label, value] of pairs) {
+                    if (!label || !value || label === value) continue;
+                    if (!applicationId && /application\\s*(no|number|id)|reference\\s*(no|number|id)|registration\\s*(no|number)/i.test(label)) {
+                        applicationId = value;
+                    } else if (/fee|charge|gst|tax/i.test(label)) {
+                        fees[label.replace(/[:*]+$/, '').trim()] = value;
+                    }
+                }
+                
+                // Gateway choices: radio buttons or select options near payment wording
+                const gateways = [];
+                for (const radio of document.querySelectorAll('input[type=radio]')) {
+                    const context = (radio.name || '') + ' ' + (radio.id || '');
+                    const label = clean(
+                        (radio.labels && radio.labels[0] && radio.labels[0].textContent)
+                        || (radio.nextSibling && radio.nextSibling.textContent)
+                        || radio.value
+                    );
+                    if (/gateway|bank|pay|mode/i.test(context + ' ' + label) && label) gateways.push(label);
+                }
+                for (const select of document.querySelectorAll('select')) {
+                    if (!/gateway|bank|pay|mode/i.test((select.name || '') + ' ' + (select.id || ''))) continue;
+                    for (const option of select.options) {
+                        if (option.value && clean(option.textContent)) gateways.push(clean(option.textContent));
+                    }
+                }
+                
+                return {
+                    amount: first(selectors.amount),
+                    fees: fees,
+                    application_id: applicationId,
+                    service: first(selectors.service),
+                    gateway_options: gateways,
+                    url: location.href,
+                };
+            }""",
+            {"amount": AMOUNT_SELECTORS, "service": SERVICE_SELECTORS}
+        )
+        logger.info(
+            "payment_details_extracted",
+            amount=details["amount"],
+            fees=len(details["fees"]),
+            application_id=details["application_id"],
+            gateways=len(details["gateway_options"])
+        )
+        return details
         
     except Exception as e:
         logger.error("payment_details_extraction_error", error=str(e))
+        return {}
+
+
+def _format_payment_details(details: dict[str, Any]) -> str:
+    """Render extracted payment details for the operator prompt."""
+    if not details:
         return "Could not extract payment details. Please review the page manually."
+    
+    lines = [f"Amount: {details.get('amount') or 'Not found'}"]
+    for label, value in details.get("fees", {}).items():
+        lines.append(f"{label}: {value}")
+    lines.append(f"Application ID: {details.get('application_id') or 'Not found'}")
+    lines.append(f"Service: {details.get('service') or 'Not found'}")
+    if details.get("gateway_options"):
+        lines.append(f"Gateway options: {', '.join(details['gateway_options'])}")
+    lines.append(f"URL: {details.get('url', '')}")
+    return "\n".join(lines)
 
 
-async def _process_payment(page, state: AgentState) -> bool:
-    """Process the payment (click continue/proceed buttons)."""
+async def _process_payment(page, confirmed_at: float) -> dict[str, Any]:
+    """
+    Click proceed, then follow the gateway redirects until a success or
+    failure page is recognised by its URL or DOM signature.
+    
+    Args:
+        page: Playwright page object
+        confirmed_at: perf_counter() time the payment was confirmed
+    
+    Returns:
+        Dict with outcome ('success', 'failure', 'unknown' or 'no_button'),
+        seconds from confirmation to the outcome page, and the final URL
+    """
+    # Listen before clicking so a redirect fired by the click is not missed
+    navigated = asyncio.get_running_loop().create_future()
+    
+    def _on_navigated(frame):
+        if frame == page.main_frame and not navigated.done():
+            navigated.set_result(frame.url)
+    
+    page.on("framenavigated", _on_navigated)
     try:
-        # Common payment proceed buttons
-        proceed_selectors = [
-            "button:has-text('Proceed')",
-            "button:has-text('Pay Now')",
-            "input[value*='Proceed']",
-            "input[value*='Pay']",
-            "#btnPayNow",
-            ".payment-btn",
-            "button[type='submit']"
-        ]
-        
-        for selector in proceed_selectors:
-            try:
-                if await browser_actions.safe_click(page, selector, timeout=5000):
-                    logger.info("payment_proceed_clicked", selector=selector)
-                    
-                    # Wait for payment gateway or confirmation
-                    await page.wait_for_load_state("networkidle", timeout=30000)
-                    
-                    # Check for success indicators
-                    success_indicators = [
-                        ":has-text('Success')",
-                        ":has-text('Successful')",
-                        ":has-text('Confirmed')",
-                        ".success-message",
-                        ".confirmation"
-                    ]
-                    
-                    for indicator in success_indicators:
-                        if await browser_actions.wait_for_selector(page, indicator, timeout=5000):
-                            logger.info("payment_success_detected")
-                            return True
-                    
-                    # If no explicit success, assume it worked
-                    return True
-                    
-            except Exception as e:
-                logger.warning("payment_proceed_attempt_failed", selector=selector, error=str(e))
-                continue
-        
-        logger.error("no_payment_proceed_button_found")
-        return False
+        # Try each known proceed button in priority order
+        for selector in PROCEED_SELECTORS:
+            if await browser_actions.safe_click(page, selector, timeout=5000, retries=1):
+                logger.info("payment_proceed_clicked", selector=selector)
+                break
+        else:
+            logger.error("no_payment_proceed_button_found")
+            return {"outcome": "no_button", "elapsed": time.perf_counter() - confirmed_at, "url": page.url}
         
-    except Exception as e:
-        logger.error("payment_processing_error", error=str(e))
-        return False
+        outcome = await _wait_for_payment_outcome(page, navigated, config.PAYMENT_GATEWAY_TIMEOUT)
+    finally:
+        page.remove_listener("framenavigated", _on_navigated)
+    
+    elapsed = time.perf_counter() - confirmed_at
+    
+    metrics.observe(
+        "mponline_payment_confirmation_to_receipt_seconds",
+        elapsed,
+        help_text="Time from payment confirmation to the gateway's outcome page",
+        outcome=outcome
+    )
+    logger.info("payment_outcome", outcome=outcome, elapsed=round(elapsed, 3), url=page.url)
+    return {"outcome": outcome, "elapsed": elapsed, "url": page.url}
+
+
+async def _wait_for_payment_outcome(page, navigated: asyncio.Future, timeout: float) -> str:
+    """
+    Wait for the page to navigate away, then until it matches a success or
+    failure signature.
+    
+    Signatures are only checked after the navigation, since text on the
+    payment page itself (e.g. 'payment failed? retry') would otherwise match.
+    The check runs in the page on every poll; navigations between gateway
+    pages destroy the evaluation context, so it is re-armed until the deadline.
+    
+    Args:
+        page: Playwright page object
+        navigated: Resolved when the main frame first navigates after the click
+        timeout: Seconds to wait for an outcome page
+    
+    Returns:
+        'success', 'failure' or 'unknown' (deadline reached)
+    """
+    deadline = time.monotonic() + timeout
+    try:
+        await asyncio.wait_for(navigated, timeout)
+    except asyncio.TimeoutError:
+        logger.warning("payment_no_navigation", url=page.url)
+        return "unknown"
+    
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return "unknown"
+        try:
+            handle = await page.wait_for_function(
+                """(signatures) => {
+                    const text = document.body ? document.body.innerText : '';
+                    for (const outcome of ['failure', 'success']) {
+                        const signature = signatures[outcome];
+                        if (new RegExp(signature.url, 'i').test(location.pathname)) return outcome;
+                        if (new RegExp(signature.text, 'i').test(text)) return outcome;
+                        for (const selector of signature.selectors) {
+                            try { if (document.querySelector(selector)) return outcome; } catch (e) {}
+                        }
+                    }
+                    return null;
+                }""",
+                arg=PAYMENT_OUTCOME_SIGNATURES,
+                polling=250,
+                timeout=remaining * 1000
+            )
+            return await handle.json_value()
+        except Exception as e:
+            if "Timeout" in type(e).__name__ or "timeout" in str(e).lower():
+                return "unknown"
+            # Context destroyed by a gateway redirect; re-arm on the new page
+            await asyncio.sleep(0.1)
@@ -1,12 +1,36 @@
 """Browser automation actions with retry logic and human-like behavior."""
 import asyncio
+import hashlib
+import json
 import random
-from typing import Optional
+from typing import Any, Optional
+from urllib.parse import urlsplit, urlunsplit
 from playwright.async_api import Page, ElementHandle, TimeoutError as PlaywrightTimeout
 from src import config
 from src.utils.logging_config import logger
+from src.core.event_bus import event_bus, SCREENSHOT_TAKEN, ERROR
+from src.utils.metrics import metrics, profile_action
+from src.utils.recorder import recorder
 
 
+async def _human_delay():
+    """Sleep for a random human-like delay (skipped when replaying recordings)."""
+    if recorder.replaying:
+        return
+    delay = random.randint(config.MIN_DELAY, config.MAX_DELAY) / 1000
+    await asyncio.sleep(delay)
+
+
+def _count_retry(action: str):
+    """Count a retry attempt of a browser action."""
+    metrics.inc(
+        "mponline_browser_action_retries_total",
+        help_text="Browser action retry attempts",
+        action=action
+    )
+
+
+@profile_action
 async def safe_click(
     page: Page,
     selector: str,
@@ -26,13 +50,14 @@ async def safe_click(
         True if successful, False otherwise
     """
     for attempt in range(retries):
+        if attempt:
+            _count_retry("safe_click")
         try:
             # Wait for element to be visible and enabled
             await page.wait_for_selector(selector, state="visible", timeout=timeout)
             
             # Random delay before clicking (mimic human)
-            delay = random.randint(config.MIN_DELAY, config.MAX_DELAY) / 1000
-            await asyncio.sleep(delay)
+            await _human_delay()
             
             # Click the element
             await page.click(selector)
@@ -49,6 +74,7 @@ async def safe_click(
             )
             if attempt == retries - 1:
                 logger.error("safe_click_failed", selector=selector)
+                event_bus.publish(ERROR, action="safe_click", selector=selector)
                 return False
             await asyncio.sleep(1)  # Wait before retry
             
@@ -66,6 +92,7 @@ async def safe_click(
     return False
 
 
+@profile_action
 async def safe_fill(
     page: Page,
     selector: str,
@@ -87,19 +114,20 @@ async def safe_fill(
         True if successful, False otherwise
     """
     for attempt in range(retries):
+        if attempt:
+            _count_retry("safe_fill")
         try:
             # Wait for element
             await page.wait_for_selector(selector, state="visible", timeout=timeout)
             
             # Random delay before typing
-            delay = random.randint(config.MIN_DELAY, config.MAX_DELAY) / 1000
-            await asyncio.sleep(delay)
+            await _human_delay()
             
             # Clear existing text
             await page.fill(selector, "")
             
             # Type with human-like speed
-            await page.type(selector, text, delay=config.TYPING_SPEED)
+            await page.type(selector, text, delay=0 if recorder.replaying else config.TYPING_SPEED)
             
             logger.info(
                 "safe_fill_success",
@@ -118,6 +146,7 @@ async def safe_fill(
             )
             if attempt == retries - 1:
                 logger.error("safe_fill_failed", selector=selector)
+                event_bus.publish(ERROR, action="safe_fill", selector=selector)
                 return False
             await asyncio.sleep(1)
             
@@ -135,6 +164,7 @@ async def safe_fill(
     return False
 
 
+@profile_action
 async def safe_select(
     page: Page,
     selector: str,
@@ -156,11 +186,12 @@ async def safe_select(
         True if successful, False otherwise
     """
     for attempt in range(retries):
+        if attempt:
+            _count_retry("safe_select")
         try:
             await page.wait_for_selector(selector, state="visible", timeout=timeout)
             
-            delay = random.randint(config.MIN_DELAY, config.MAX_DELAY) / 1000
-            await asyncio.sleep(delay)
+            await _human_delay()
             
             await page.select_option(selector, value)
             
@@ -191,6 +222,7 @@ async def safe_select(
     return False
 
 
+@profile_action
 async def wait_for_selector(
     page: Page,
     selector: str,
@@ -221,6 +253,7 @@ async def wait_for_selector(
         return False
 
 
+@profile_action
 async def extract_dom_snapshot(page: Page) -> str:
     """
     Extract page accessibility tree for LLM consumption.
@@ -267,6 +300,302 @@ async def extract_dom_snapshot(page: Page) -> str:
         return ""
 
 
+@profile_action
+async def probe_selectors(page: Page, selectors: dict[str, str]) -> dict[str, dict[str, bool]]:
+    """
+    Resolve many selectors in one DOM query, without waiting.
+    
+    Supports CSS selectors and XPath (``//...`` or ``xpath=...``). Selectors
+    the browser cannot parse are reported as not present.
+    
+    Args:
+        page: Playwright page object
+        selectors: Field name -> selector
+        
+    Returns:
+        Field name -> {"present", "visible", "enabled"} flags
+    """
+    try:
+        return await page.evaluate(
+            """(selectors) => {
+                const result = {};
+                for (const [name, selector] of Object.entries(selectors)) {
+                    let el = null;
+                    try {
+                        if (selector.startsWith('xpath=') || selector.startsWith('//')) {
+                            const xpath = selector.startsWith('xpath=') ? selector.slice(6) : selector;
+                            el = document.evaluate(
+                                xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+                            ).singleNodeValue;
+                        } else {
+                            el = document.querySelector(selector);
+                        }
+                    } catch (e) {
+                        el = null;
+                    }
+                    if (!el) {
+                        result[name] = {present: false, visible: false, enabled: false};
+                        continue;
+                    }
+                    const style = window.getComputedStyle(el);
+                    const visible = !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length)
+                        && style.visibility !== 'hidden';
+                    result[name] = {present: true, visible: visible, enabled: !el.disabled};
+                }
+                return result;
+            }""",
+            selectors
+        )
+    except Exception as e:
+        logger.error("probe_selectors_error", count=len(selectors), error=str(e))
+        return {
+            name: {"present": False, "visible": False, "enabled": False}
+            for name in selectors
+        }
+
+
+# Selectors for validation messages (ASP.NET validators, common CSS frameworks)
+VALIDATION_MESSAGE_SELECTORS = [
+    ".error",
+    ".alert-danger",
+    ".validation-error",
+    "[class*='error']",
+    ".field-validation-error",
+    "span[id*='Validator']",
+    ".validation-summary-errors li",
+]
+
+
+@profile_action
+async def read_form_state(page: Page, fields: dict[str, dict[str, str]]) -> Optional[dict[str, Any]]:
+    """
+    Read every field's current value and every visible validation message in one call.
+    
+    A field is read through its ``selector`` or, if that matches nothing,
+    its ``fallback_selector`` (the template selector behind a learned one),
+    so fields filled through either read back.
+    
+    Args:
+        page: Playwright page object
+        fields: Field name -> {"selector", "fallback_selector", "type"} (field config)
+        
+    Returns:
+        Dict with ``values`` (field name -> {"present", "value", "text"}) and
+        ``messages`` (visible validation message texts, de-duplicated), or
+        None if the page could not be read
+    """
+    targets = {
+        name: {
+            "selectors": [
+                selector for selector in (field_config.get("selector"), field_config.get("fallback_selector"))
+                if selector
+            ],
+            "type": field_config.get("type", "text"),
+        }
+        for name, field_config in fields.items()
+        if field_config.get("selector") or field_config.get("fallback_selector")
+    }
+    try:
+        return await page.evaluate(
+            """([targets, messageSelectors]) => {
+                const isVisible = (el) => !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length)
+                    && window.getComputedStyle(el).visibility !== 'hidden';
+                const findAll = (selector) => {
+                    try {
+                        if (selector.startsWith('xpath=') || selector.startsWith('//')) {
+                            const xpath = selector.startsWith('xpath=') ? selector.slice(6) : selector;
+                            const snapshot = document.evaluate(
+                                xpath, document, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null
+                            );
+                            return Array.from({length: snapshot.snapshotLength}, (_, i) => snapshot.snapshotItem(i));
+                        }
+                        return Array.from(document.querySelectorAll(selector));
+                    } catch (e) {
+                        return [];
+                    }
+                };
+
+                const values = {};
+                for (const [name, target] of Object.entries(targets)) {
+                    let elements = [];
+                    for (const selector of target.selectors) {
+                        elements = findAll(selector);
+                        if (elements.length) break;
+                    }
+                    if (!elements.length) {
+                        values[name] = {present: false, value: null, text: null};
+                        continue;
+                    }
+                    const el = elements[0];
+                    if (target.type === 'radio' || target.type === 'checkbox') {
+                        const checked = elements.find(e => e.checked);
+                        values[name] = {present: true, value: checked ? checked.value : null, text: null};
+                    } else if (el.tagName === 'SELECT') {
+                        const option = el.options[el.selectedIndex];
+                        values[name] = {present: true, value: el.value, text: option ? option.text : null};
+                    } else if (el.type === 'file') {
+                        const file = el.files && el.files.length ? el.files[0].name : null;
+                        values[name] = {present: true, value: file, text: null};
+                    } else {
+                        values[name] = {present: true, value: el.value, text: null};
+                    }
+                }
+
+                const seen = new Set();
+                const messages = [];
+                for (const el of document.querySelectorAll(messageSelectors.join(','))) {
+                    const text = (el.textContent || '').trim();
+                    if (text && !seen.has(text) && isVisible(el)) {
+                        seen.add(text);
+                        messages.push(text);
+                    }
+                }
+                return {values: values, messages: messages};
+            }""",
+            [targets, VALIDATION_MESSAGE_SELECTORS]
+        )
+    except Exception as e:
+        logger.error("read_form_state_error", fields=len(targets), error=str(e))
+        return None
+
+
+def normalize_url(url: str) -> str:
+    """
+    Normalize a URL for page-state comparison (case-insensitive host, no fragment).
+    
+    Args:
+        url: Page URL
+        
+    Returns:
+        Normalized URL
+    """
+    parts = urlsplit(url or "")
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, parts.query, ""))
+
+
+@profile_action
+async def page_fingerprint(page: Page) -> Optional[dict[str, Any]]:
+    """
+    Fingerprint the page structure in a single evaluate call.
+    
+    The hash covers form identity and key controls (tag, id, name, type,
+    visibility) but not their values, so typing into fields does not change it.
+    
+    Args:
+        page: Playwright page object
+        
+    Returns:
+        Dict with url, form_id, controls_hash and digest, or None on failure
+    """
+    try:
+        structure = await page.evaluate(
+            """() => {
+                const form = document.querySelector('form');
+                const controls = Array.from(
+                    document.querySelectorAll('input, select, textarea, button')
+                ).map(el => [
+                    el.tagName, el.id, el.name, el.type,
+                    !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length)
+                ].join('|'));
+                return {
+                    formId: form ? (form.id || form.getAttribute('action') || '') : '',
+                    controls: controls,
+                };
+            }"""
+        )
+        controls_hash = hashlib.sha1(
+            json.dumps(structure["controls"]).encode("utf-8")
+        ).hexdigest()
+        url = normalize_url(page.url)
+        digest = hashlib.sha1(
+            f"{url}|{structure['formId']}|{controls_hash}".encode("utf-8")
+        ).hexdigest()
+        
+        return {
+            "url": url,
+            "form_id": structure["formId"],
+            "controls_hash": controls_hash,
+            "digest": digest,
+        }
+    except Exception as e:
+        logger.warning("page_fingerprint_error", error=str(e))
+        return None
+
+
+@profile_action
+async def form_region(page: Page, hints: Optional[list[str]] = None, margin: int = 40) -> Optional[dict[str, float]]:
+    """
+    Locate the page region worth showing to a vision model, in one evaluate call.
+
+    With hints, the region spans the form's width around the labels whose text
+    matches any hint; otherwise (or if nothing matches) it is the bounding box
+    of all visible form controls.
+
+    Args:
+        page: Playwright page object
+        hints: Label texts to look for (e.g. field names or descriptions)
+        margin: Padding around the region in CSS pixels
+
+    Returns:
+        Dict with x, y, width, height in document CSS pixels and the page's
+        device_pixel_ratio, or None if no visible controls were found
+    """
+    try:
+        return await page.evaluate(
+            """([hints, margin]) => {
+                const isVisible = (el) => !!(el.offsetWidth || el.offsetHeight || el.getClientRects().length);
+                const box = (el) => {
+                    const r = el.getBoundingClientRect();
+                    return {
+                        left: r.left + window.scrollX, top: r.top + window.scrollY,
+                        right: r.right + window.scrollX, bottom: r.bottom + window.scrollY,
+                    };
+                };
+                const union = (boxes) => boxes.reduce((acc, b) => ({
+                    left: Math.min(acc.left, b.left), top: Math.min(acc.top, b.top),
+                    right: Math.max(acc.right, b.right), bottom: Math.max(acc.bottom, b.bottom),
+                }));
+
+                const controls = Array.from(document.querySelectorAll('input, select, textarea'))
+                    .filter(el => el.type !== 'hidden' && isVisible(el));
+                if (!controls.length) return null;
+                let region = union(controls.map(box));
+
+                const needles = (hints || []).map(h => h.toLowerCase().trim()).filter(h => h.length > 2);
+                if (needles.length) {
+                    const labels = Array.from(document.querySelectorAll('label, td, th, span, legend'))
+                        .filter(el => el.children.length === 0 && isVisible(el))
+                        .filter(el => {
+                            const text = (el.textContent || '').toLowerCase().trim();
+                            return text && needles.some(n => text.includes(n));
+                        });
+                    if (labels.length) {
+                        const around = union(labels.map(box));
+                        region = {left: region.left, right: region.right, top: around.top, bottom: around.bottom};
+                    }
+                }
+
+                const docWidth = document.documentElement.scrollWidth;
+                const docHeight = document.documentElement.scrollHeight;
+                const left = Math.max(0, region.left - margin);
+                const top = Math.max(0, region.top - margin);
+                return {
+                    x: left,
+                    y: top,
+                    width: Math.min(docWidth, region.right + margin) - left,
+                    height: Math.min(docHeight, region.bottom + margin) - top,
+                    device_pixel_ratio: window.devicePixelRatio || 1,
+                };
+            }""",
+            [hints or [], margin]
+        )
+    except Exception as e:
+        logger.warning("form_region_error", error=str(e))
+        return None
+
+
+@profile_action
 async def take_screenshot(page: Page, path: str) -> bool:
     """
     Take screenshot of current page.
@@ -281,12 +610,14 @@ async def take_screenshot(page: Page, path: str) -> bool:
     try:
         await page.screenshot(path=path, full_page=True)
         logger.info("screenshot_taken", path=path)
+        event_bus.publish(SCREENSHOT_TAKEN, path=path, url=page.url)
         return True
     except Exception as e:
         logger.error("screenshot_error", path=path, error=str(e))
         return False
 
 
+@profile_action
 async def upload_file(
     page: Page,
     selector: str,
@@ -308,8 +639,7 @@ async def upload_file(
     try:
         await page.wait_for_selector(selector, state="attached", timeout=timeout)
         
-        delay = random.randint(config.MIN_DELAY, config.MAX_DELAY) / 1000
-        await asyncio.sleep(delay)
+        await _human_delay()
         
         await page.set_input_files(selector, file_path)
         
@@ -318,4 +648,5 @@ async def upload_file(
         
     except Exception as e:
         logger.error("file_upload_error", selector=selector, error=str(e))
+        event_bus.publish(ERROR, action="upload_file", selector=selector, error=str(e))
         return False
@@ -0,0 +1,88 @@
+"""Persist browser state alongside graph checkpoints for crash-resume."""
+import functools
+from typing import Any, Callable
+from src.core.agent_state import AgentState
+from src.automation.browser_manager import browser_manager
+from src.automation.page_cache import page_cache
+from src.core.event_bus import current_thread_id
+from src.services.service_registry import SERVICE_REGISTRY
+from src.services.selector_overlay import selector_overlay
+from src.utils.encryption import encryptor
+from src.utils.logging_config import logger
+
+
+# session_data key holding the (encrypted) browser snapshot
+BROWSER_STATE_KEY = "browser_state"
+
+
+def _filled_field_selectors(state: dict[str, Any]) -> dict[str, str]:
+    """Selectors of template fields marked filled in form_progress."""
+    template = SERVICE_REGISTRY.get(state.get("service_type", ""))
+    if not template:
+        return {}
+
+    form_progress = state.get("form_progress") or {}
+    step = state.get("current_step", "")
+    mappings = selector_overlay.apply(state.get("service_type", ""), step, template.get_field_mappings(step))
+    return {
+        name: field_config["selector"]
+        for name, field_config in mappings.items()
+        if form_progress.get(name) and field_config.get("selector")
+    }
+
+
+def checkpoint_browser(func: Callable) -> Callable:
+    """
+    Decorator adding a browser snapshot to a node's state update.
+
+    The snapshot (storage_state, URL and filled values) lands in
+    ``session_data`` so it is saved with the same checkpoint as the graph state.
+
+    Args:
+        func: Async graph node
+
+    Returns:
+        Wrapped node
+    """
+    @functools.wraps(func)
+    async def wrapper(state: AgentState, *args, **kwargs):
+        update = await func(state, *args, **kwargs)
+        if not isinstance(update, dict) or not browser_manager.is_alive():
+            return update
+
+        try:
+            merged = {**state, **update}
+            snapshot = await browser_manager.snapshot(_filled_field_selectors(merged))
+            if snapshot:
+                session_data = dict(merged.get("session_data") or {})
+                session_data[BROWSER_STATE_KEY] = encryptor.encrypt_data(snapshot)
+                update = {**update, "session_data": session_data}
+        except Exception as e:
+            # A failed snapshot must never fail the node itself
+            logger.warning("browser_checkpoint_failed", error=str(e))
+
+        return update
+    return wrapper
+
+
+async def restore_browser_state(state: dict[str, Any]) -> list[str]:
+    """
+    Rebuild the browser page for a resumed thread if it was lost.
+
+    Args:
+        state: Checkpointed agent state
+
+    Returns:
+        Fields marked filled whose values could not be restored (empty if the
+        page was alive or no snapshot exists)
+    """
+    if browser_manager.is_alive():
+        return []
+
+    encrypted = (state.get("session_data") or {}).get(BROWSER_STATE_KEY)
+    if not encrypted:
+        return []
+
+    snapshot = encryptor.decrypt_data(encrypted)
+    page_cache.invalidate(current_thread_id.get() or "default", reason="browser_restored")
+    return await browser_manager.restore(snapshot, _filled_field_selectors(state))
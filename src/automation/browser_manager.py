@@ -1,9 +1,11 @@
 """Browser manager for Playwright context and session management."""
 import asyncio
-from typing import Optional
+import socket
+from typing import Any, Optional
 from playwright.async_api import async_playwright, Browser, BrowserContext, Page, Playwright
 from src import config
 from src.utils.logging_config import logger
+from src.utils.recorder import recorder
 
 
 class BrowserManager:
@@ -17,12 +19,16 @@ class BrowserManager:
         self.browser: Optional[Browser] = None
         self.context: Optional[BrowserContext] = None
         self.page: Optional[Page] = None
+        self.cdp_url: Optional[str] = None  # DevTools endpoint other clients (browser_use) attach to
         self._lock = asyncio.Lock()
     
-    async def start(self) -> Page:
+    async def start(self, storage_state: Optional[Any] = None) -> Page:
         """
         Start browser and return page instance.
         
+        Args:
+            storage_state: Optional cookies/storage (dict or file path) to seed the context
+        
         Returns:
             Playwright page object
         """
@@ -30,12 +36,20 @@ class BrowserManager:
             if self.page:
                 return self.page
             
+            if self.context:
+                # Browser still up (page released by close_page): open a new tab
+                self.page = await self.context.new_page()
+                self.page.set_default_timeout(config.BROWSER_TIMEOUT)
+                return self.page
+            
             logger.info("browser_starting", headless=config.HEADLESS_MODE)
             
             # Launch Playwright
             self.playwright = await async_playwright().start()
             
-            # Launch browser with stealth settings
+            # Launch browser with stealth settings; the loopback DevTools port
+            # lets browser_use drive this same browser instead of launching one
+            cdp_port = _free_port()
             self.browser = await self.playwright.chromium.launch(
                 headless=config.HEADLESS_MODE,
                 slow_mo=config.SLOW_MO,
@@ -43,8 +57,10 @@ class BrowserManager:
                     '--disable-blink-features=AutomationControlled',
                     '--disable-dev-shm-usage',
                     '--no-sandbox',
+                    f'--remote-debugging-port={cdp_port}',
                 ]
             )
+            self.cdp_url = f"http://127.0.0.1:{cdp_port}"
             
             # Create context with realistic settings
             self.context = await self.browser.new_context(
@@ -54,8 +70,13 @@ class BrowserManager:
                 timezone_id='Asia/Kolkata',
                 permissions=['geolocation'],
                 color_scheme='light',
+                storage_state=storage_state,
+                **recorder.context_options(),
             )
             
+            # Serve recorded traffic instead of the live portal in replay mode
+            await recorder.configure_context(self.context)
+            
             # Add stealth scripts
             await self.context.add_init_script("""
                 Object.defineProperty(navigator, 'webdriver', {
@@ -94,15 +115,108 @@ class BrowserManager:
             state_path: Path to saved state file
         """
         try:
-            if self.playwright and not self.context:
-                self.context = await self.playwright.chromium.new_context(
-                    storage_state=state_path
-                )
-                self.page = await self.context.new_page()
+            if not self.context:
+                await self.start(storage_state=state_path)
                 logger.info("session_loaded", path=state_path)
         except Exception as e:
             logger.error("session_load_error", error=str(e))
     
+    def is_alive(self) -> bool:
+        """
+        Check whether the managed page is still usable.
+        
+        Returns:
+            True if a page exists and has not been closed
+        """
+        return bool(self.page) and not self.page.is_closed()
+    
+    async def snapshot(self, field_selectors: dict[str, str]) -> Optional[dict[str, Any]]:
+        """
+        Capture enough browser state to rebuild the page after a crash.
+        
+        Args:
+            field_selectors: Field name -> selector for fields whose values to keep
+            
+        Returns:
+            Dict with storage_state, url and field values, or None if no page
+        """
+        if not self.is_alive():
+            return None
+        
+        storage_state = await self.context.storage_state()
+        values = await self.page.evaluate(
+            """(selectors) => {
+                const values = {};
+                for (const [name, selector] of Object.entries(selectors)) {
+                    let el = null;
+                    try { el = document.querySelector(selector); } catch (e) {}
+                    if (!el || el.type === 'file') continue;
+                    values[name] = (el.type === 'checkbox' || el.type === 'radio') ? String(el.checked) : el.value;
+                }
+                return values;
+            }""",
+            field_selectors
+        )
+        
+        return {
+            "storage_state": storage_state,
+            "url": self.page.url,
+            "field_values": values,
+        }
+    
+    async def restore(self, snapshot: dict[str, Any], field_selectors: dict[str, str]) -> list[str]:
+        """
+        Rebuild a page from a snapshot, re-filling only fields whose value was lost.
+        
+        Args:
+            snapshot: Snapshot from :meth:`snapshot`
+            field_selectors: Field name -> selector for fields expected to be filled
+            
+        Returns:
+            Field names that could not be restored and must be filled again
+        """
+        if self.is_alive():
+            await self.close()
+        
+        page = await self.start(storage_state=snapshot.get("storage_state"))
+        await page.goto(snapshot["url"], wait_until="domcontentloaded")
+        
+        saved_values = snapshot.get("field_values", {})
+        current = (await self.snapshot(field_selectors) or {}).get("field_values", {})
+        
+        unrestored = []
+        restored = 0
+        for field_name, selector in field_selectors.items():
+            value = saved_values.get(field_name)
+            if value is None:
+                # File inputs and fields missing from the snapshot cannot be replayed
+                unrestored.append(field_name)
+                continue
+            if current.get(field_name) == value:
+                continue
+            try:
+                tag, input_type = await page.eval_on_selector(
+                    selector, "el => [el.tagName.toLowerCase(), el.type]"
+                )
+                if tag == "select":
+                    await page.select_option(selector, value)
+                elif input_type in ("checkbox", "radio"):
+                    await page.set_checked(selector, value == "true")
+                else:
+                    await page.fill(selector, value)
+                restored += 1
+            except Exception as e:
+                logger.warning("browser_restore_field_failed", field=field_name, error=str(e))
+                unrestored.append(field_name)
+        
+        logger.info(
+            "browser_restored",
+            url=snapshot["url"],
+            refilled=restored,
+            unrestored=len(unrestored)
+        )
+        return unrestored
+    
     async def get_page(self) -> Page:
         """
         Get current page or create new one.
@@ -114,6 +228,62 @@ class BrowserManager:
             return await self.start()
         return self.page
     
+    async def adopt_page(self, page: Page):
+        """
+        Make another tab of the managed context the managed page,
+        closing the previous one.
+        
+        Args:
+            page: Page to manage from now on
+        """
+        async with self._lock:
+            previous, self.page = self.page, page
+        if previous and previous is not page and not previous.is_closed():
+            await previous.close()
+        logger.info("browser_page_adopted", url=page.url)
+    
+    async def reclaim_page(self, url: Optional[str] = None) -> Page:
+        """
+        Take the page back after another client (browser_use) drove the browser.
+        
+        The tab showing ``url`` becomes the managed page; if there is none and
+        the managed page was closed, the newest open tab is used.
+        
+        Args:
+            url: URL the other client finished on
+        
+        Returns:
+            Managed page
+        """
+        pages = [page for page in self.context.pages if not page.is_closed()] if self.context else []
+        target = None
+        if url:
+            target = next((page for page in reversed(pages) if page.url.rstrip("/") == url.rstrip("/")), None)
+        if target is None and not self.is_alive() and pages:
+            target = pages[-1]
+        
+        if target is not None and target is not self.page:
+            await self.adopt_page(target)
+        return await self.get_page()
+    
+    async def close_page(self):
+        """
+        Close only the managed page, keeping the browser and context (and
+        their cookies) for the next run; the next get_page opens a new tab.
+        
+        The manager drives one page, so it supports one run at a time per
+        process; this releases that run's page without tearing down the
+        browser other callers (e.g. a browser_use session) attach to.
+        """
+        async with self._lock:
+            page, self.page = self.page, None
+        if page and not page.is_closed():
+            try:
+                await page.close()
+            except Exception as e:
+                logger.error("browser_page_close_error", error=str(e))
+        logger.info("browser_page_closed")
+    
     async def close(self):
         """Close browser and cleanup resources."""
         async with self._lock:
@@ -129,6 +299,7 @@ class BrowserManager:
                 if self.browser:
                     await self.browser.close()
                     self.browser = None
+                    self.cdp_url = None
                 
                 if self.playwright:
                     await self.playwright.stop()
@@ -148,5 +319,12 @@ class BrowserManager:
         await self.close()
 
 
+def _free_port() -> int:
+    """Pick an unused loopback TCP port."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
 # Global browser manager instance
 browser_manager = BrowserManager()
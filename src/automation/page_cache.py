@@ -0,0 +1,128 @@
+"""Page-state fingerprint cache so navigation work is skipped when nothing changed."""
+from typing import Any, Optional
+from src.utils.logging_config import logger
+from src.utils.metrics import metrics
+
+
+class PageStateCache:
+    """
+    Remembers the last captured page state (fingerprint, screenshot, DOM
+    snapshot) per thread and how long capturing it took, so navigator can
+    reuse it and account for the time saved. The cost travels with the
+    entry, so a step that reuses another step's capture reports its saving.
+    """
+
+    def __init__(self):
+        """Initialize page state cache."""
+        self.entries: dict[str, dict[str, Any]] = {}
+        self.saved_seconds: dict[str, float] = {}  # thread_id -> seconds saved
+        self.skips: dict[str, int] = {}  # thread_id -> skipped captures
+
+    def lookup(self, thread_id: str, fingerprint: Optional[dict]) -> Optional[dict[str, Any]]:
+        """
+        Return the cached capture if the page still matches it.
+
+        Args:
+            thread_id: Graph thread ID
+            fingerprint: Current page fingerprint
+
+        Returns:
+            Cached entry with screenshot_path and dom_snapshot, or None
+        """
+        entry = self.entries.get(thread_id)
+        if not entry or not fingerprint:
+            return None
+        if entry["fingerprint"]["digest"] != fingerprint["digest"]:
+            return None
+        return entry
+
+    def store(
+        self,
+        thread_id: str,
+        step: str,
+        fingerprint: Optional[dict],
+        screenshot_path: str,
+        dom_snapshot: str,
+        cost: float
+    ):
+        """
+        Cache a fresh capture.
+
+        Args:
+            thread_id: Graph thread ID
+            step: Navigation step that produced the capture
+            fingerprint: Page fingerprint at capture time
+            screenshot_path: Screenshot taken
+            dom_snapshot: DOM snapshot extracted
+            cost: Seconds spent on navigation and capture
+        """
+        if not fingerprint:
+            self.entries.pop(thread_id, None)
+            return
+        self.entries[thread_id] = {
+            "fingerprint": fingerprint,
+            "screenshot_path": screenshot_path,
+            "dom_snapshot": dom_snapshot,
+            "step": step,
+            "cost": cost,
+        }
+
+    def record_skip(self, thread_id: str, step: str) -> float:
+        """
+        Account for a skipped capture.
+
+        Args:
+            thread_id: Graph thread ID
+            step: Navigation step that was skipped
+
+        Returns:
+            Estimated seconds saved (cost of the full capture being reused)
+        """
+        saved = self.entries.get(thread_id, {}).get("cost", 0.0)
+        self.saved_seconds[thread_id] = self.saved_seconds.get(thread_id, 0.0) + saved
+        self.skips[thread_id] = self.skips.get(thread_id, 0) + 1
+
+        metrics.inc(
+            "mponline_navigation_skips_total",
+            help_text="Navigator captures skipped because the page was unchanged",
+            step=step
+        )
+        metrics.inc(
+            "mponline_navigation_time_saved_seconds_total",
+            amount=saved,
+            help_text="Estimated navigator time saved by the page-state cache",
+            step=step
+        )
+        logger.info("navigation_skipped", step=step, saved_seconds=round(saved, 3))
+        return saved
+
+    def run_report(self, thread_id: str) -> dict[str, Any]:
+        """
+        Time saved for a thread so far.
+
+        Args:
+            thread_id: Graph thread ID
+
+        Returns:
+            Dict with skipped captures and seconds saved
+        """
+        return {
+            "navigation_skips": self.skips.get(thread_id, 0),
+            "navigation_time_saved": round(self.saved_seconds.get(thread_id, 0.0), 3),
+        }
+
+    def invalidate(self, thread_id: str, reason: str = "stale"):
+        """
+        Drop the cached capture for a thread (browser restored, navigation
+        failed, or the auditor found the page not as captured).
+
+        Args:
+            thread_id: Graph thread ID
+            reason: Why the capture is no longer trusted (for logs)
+        """
+        if self.entries.pop(thread_id, None):
+            logger.info("page_cache_invalidated", thread_id=thread_id, reason=reason)
+
+
+# Global page state cache instance
+page_cache = PageStateCache()
@@ -0,0 +1,221 @@
+"""Speculative preparation of the next step while a session waits on a human."""
+import asyncio
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Optional
+from src import config
+from src.services.selector_overlay import selector_overlay
+from src.services.service_registry import SERVICE_REGISTRY
+from src.services.validation import validate_record
+from src.tools.image_prep import fit_image_file
+from src.utils.logging_config import logger
+from src.utils.metrics import metrics
+
+
+# Step reached after each step's HITL wait
+NEXT_STEP = {
+    "form_fill": "document_upload",
+    "document_upload": "preview",
+    "preview": "payment",
+}
+
+# next_action values that name the step the graph is heading to
+ACTION_STEPS = {
+    "upload_documents": "document_upload",
+    "preview": "preview",
+    "payment": "payment",
+}
+
+# Image formats that can be re-encoded to fit an upload size limit
+FITTABLE_FORMATS = ("jpg", "jpeg")
+
+
+class SpeculativePrefetcher:
+    """
+    Prepares the next step while a session is blocked on a human (e.g. a
+    CAPTCHA), so the step starts from warm state.
+
+    Preparation runs as a background task per thread and needs no page:
+
+    - the next step's template selectors are resolved against the learned
+      selector overlay;
+    - documents for ``document_upload`` are validated, and oversized JPEGs
+      are re-encoded to fit the template's size limit.
+
+    ``consume`` hands the results to form_expert when the step starts;
+    ``discard`` throws everything away (cancelled HITL, abandoned session).
+    Work that has not finished by the time it is consumed is discarded
+    rather than waited for, so speculation never delays the real path.
+    """
+
+    def __init__(self, work_dir: str = str(config.DATA_DIR / "speculative")):
+        """Initialize prefetcher."""
+        self.work_dir = work_dir
+        self.entries: dict[str, dict[str, Any]] = {}  # thread_id -> task and step
+
+    def start(self, thread_id: str, state: dict[str, Any]) -> Optional[str]:
+        """
+        Begin preparing the step that follows the current one.
+
+        Args:
+            thread_id: Graph thread ID
+            state: Current agent state
+
+        Returns:
+            Step being prepared, or None if there is nothing to prepare
+        """
+        if not config.SPECULATIVE_PREFETCH:
+            return None
+
+        step = _next_step(state)
+        template = SERVICE_REGISTRY.get(state.get("service_type"))
+        if not step or not template:
+            return None
+
+        entry = self.entries.get(thread_id)
+        if entry and entry["step"] == step:
+            return step  # Already preparing this step
+        if entry:
+            self._drop(thread_id, "superseded")
+
+        task = asyncio.create_task(self._prepare(thread_id, step, template, state))
+        self.entries[thread_id] = {"step": step, "task": task}
+        logger.info("speculation_started", thread_id=thread_id, step=step)
+        return step
+
+    async def _prepare(self, thread_id: str, step: str, template, state: dict[str, Any]) -> dict[str, Any]:
+        """Do the speculative work for a step."""
+        started = time.perf_counter()
+        field_mappings = selector_overlay.apply(
+            state["service_type"], step, template.get_field_mappings(step)
+        )
+
+        documents = {}
+        if step == "document_upload":
+            documents = await asyncio.to_thread(
+                self._prepare_documents, thread_id, state["service_type"], template, field_mappings, state["user_data"]
+            )
+
+        metrics.observe(
+            "mponline_speculation_seconds",
+            time.perf_counter() - started,
+            help_text="Time spent preparing a step during a HITL wait",
+            step=step
+        )
+        return {"field_mappings": field_mappings, "documents": documents}
+
+    def _prepare_documents(
+        self,
+        thread_id: str,
+        service_type: str,
+        template,
+        field_mappings: dict[str, dict[str, Any]],
+        user_data: dict[str, Any]
+    ) -> dict[str, str]:
+        """Validate upload files and fit oversized images (runs in a worker thread)."""
+        schema = template.get_validation_schema() if hasattr(template, "get_validation_schema") else {}
+        file_fields = [
+            name for name, field in field_mappings.items()
+            if field.get("type") == "file" and user_data.get(name)
+        ]
+
+        prepared = {}
+        for issue in validate_record(service_type, user_data, fields=file_fields, check_required=False):
+            path = str(user_data[issue["field"]])
+            spec = schema.get(issue["field"], {})
+            extension = os.path.splitext(path)[1].lower().lstrip(".")
+            if issue["code"] != "file_size" or extension not in FITTABLE_FORMATS:
+                logger.warning("speculative_document_invalid", field=issue["field"], code=issue["code"])
+                continue
+
+            out_dir = Path(self.work_dir) / thread_id
+            out_dir.mkdir(parents=True, exist_ok=True)
+            fitted = fit_image_file(path, spec["max_size"], str(out_dir / f"{issue['field']}.jpg"))
+            if fitted:
+                prepared[issue["field"]] = fitted
+                logger.info("speculative_document_fitted", field=issue["field"], size=os.path.getsize(fitted))
+
+        return prepared
+
+    async def consume(self, thread_id: str, step: str) -> dict[str, Any]:
+        """
+        Take the prepared state for a step as it starts.
+
+        Args:
+            thread_id: Graph thread ID
+            step: Step that is starting
+
+        Returns:
+            Dict with ``field_mappings`` (overlay applied) and ``documents``
+            (field -> prepared file path); empty if nothing usable was prepared
+        """
+        entry = self.entries.get(thread_id)
+        if not entry or entry["step"] != step:
+            return {}
+
+        if not entry["task"].done():
+            await self.discard(thread_id, outcome="unfinished")
+            return {}
+
+        self.entries.pop(thread_id, None)
+        error = None if entry["task"].cancelled() else entry["task"].exception()
+        if error or entry["task"].cancelled():
+            logger.warning("speculation_failed", step=step, error=str(error))
+            self._remove_files(thread_id)
+            metrics.inc("mponline_speculation_total", help_text="Speculative step preparations", step=step, outcome="failed")
+            return {}
+
+        result = entry["task"].result()
+        metrics.inc("mponline_speculation_total", help_text="Speculative step preparations", step=step, outcome="used")
+        logger.info(
+            "speculation_consumed",
+            thread_id=thread_id,
+            step=step,
+            fields=len(result["field_mappings"]),
+            documents=list(result["documents"])
+        )
+        return result
+
+    async def discard(self, thread_id: str, outcome: str = "discarded"):
+        """
+        Cancel and throw away speculative work for a thread.
+
+        Args:
+            thread_id: Graph thread ID
+            outcome: Metric label for why it was discarded
+        """
+        entry = self.entries.pop(thread_id, None)
+        if entry:
+            await self._discard_entry(thread_id, entry, outcome)
+
+    async def _discard_entry(self, thread_id: str, entry: dict[str, Any], outcome: str):
+        """Cancel an entry's task and delete its files."""
+        entry["task"].cancel()
+        try:
+            await entry["task"]
+        except BaseException:
+            pass  # Cancelled or failed; either way nothing is kept
+        self._remove_files(thread_id)
+
+        metrics.inc("mponline_speculation_total", help_text="Speculative step preparations", step=entry["step"], outcome=outcome)
+        logger.info("speculation_discarded", thread_id=thread_id, step=entry["step"], outcome=outcome)
+
+    def _drop(self, thread_id: str, outcome: str):
+        """Discard without waiting (from synchronous code)."""
+        entry = self.entries.pop(thread_id)
+        asyncio.create_task(self._discard_entry(thread_id, entry, outcome))
+
+    def _remove_files(self, thread_id: str):
+        """Delete documents prepared for a thread."""
+        shutil.rmtree(Path(self.work_dir) / thread_id, ignore_errors=True)
+
+
+def _next_step(state: dict[str, Any]) -> Optional[str]:
+    """Step the graph will run after the current HITL wait."""
+    return ACTION_STEPS.get(state.get("next_action", "")) or NEXT_STEP.get(state.get("current_step", ""))
+
+
+# Global speculative prefetcher instance
+speculative_prefetcher = SpeculativePrefetcher()
@@ -29,6 +29,7 @@ ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY", "")
 
 # Database
 SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", str(DATA_DIR / "checkpoints.db"))
+CHECKPOINT_BACKEND = os.getenv("CHECKPOINT_BACKEND", "memory").lower()  # memory or sqlite
 
 # Browser settings
 HEADLESS_MODE = os.getenv("HEADLESS_MODE", "true") == "true"
@@ -49,20 +50,84 @@ USE_REAL_BROWSER = os.getenv("USE_REAL_BROWSER", "false").lower() == "true"
 
 # Browser-use AI automation
 USE_AI_AUTOMATION = os.getenv("USE_AI_AUTOMATION", "true").lower() == "true"
+# template: selectors (+ vision) only; ai: browser_use fills everything;
+# hybrid: template first, then browser_use only for the fields it missed
+AUTOMATION_MODE = os.getenv("AUTOMATION_MODE", "hybrid" if USE_AI_AUTOMATION else "template").lower()
 BROWSER_USE_TIMEOUT = int(os.getenv("BROWSER_USE_TIMEOUT", "120"))
 
+# AgenticBrowserAgent strategies: race the best AGENTIC_RACE_WIDTH at once
+# in separate browsers instead of trying them one by one
+AGENTIC_RACE = os.getenv("AGENTIC_RACE", "false").lower() == "true"
+AGENTIC_RACE_WIDTH = int(os.getenv("AGENTIC_RACE_WIDTH", "2"))
+STRATEGY_STATS_PATH = os.getenv("STRATEGY_STATS_PATH", str(DATA_DIR / "strategy_stats.json"))
+
+# Loop budgets for the auditor/form_expert cycle
+MAX_STEP_RETRIES = int(os.getenv("MAX_STEP_RETRIES", "3"))  # form_expert passes per step
+MAX_TOTAL_STEPS = int(os.getenv("MAX_TOTAL_STEPS", "15"))  # form_expert passes per run
+RUN_DEADLINE_SECONDS = int(os.getenv("RUN_DEADLINE_SECONDS", "1800"))
+MAX_LLM_SPEND = float(os.getenv("MAX_LLM_SPEND", "2.0"))  # USD per run
+
+# Measured LLM usage (tokens, latency, cost per call) for cost percentiles
+LLM_USAGE_PATH = os.getenv("LLM_USAGE_PATH", str(DATA_DIR / "llm_usage.jsonl"))
+LLM_USAGE_MIN_RUNS = int(os.getenv("LLM_USAGE_MIN_RUNS", "5"))  # Runs needed before estimates use measurements
+BUDGET_AI_FALLBACK = os.getenv("BUDGET_AI_FALLBACK", "true").lower() == "true"
+VISION_CALL_COST = float(os.getenv("VISION_CALL_COST", "0.01"))  # USD per vision call
+
+# Shared LLM client pool (per provider/model)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))  # In-flight calls per event loop
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "60"))  # Until provider headers say otherwise
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))  # Retries of rate-limited calls
+
+# Vision image preparation (crop to the form, downscale, re-encode)
+VISION_IMAGE_PREP = os.getenv("VISION_IMAGE_PREP", "true").lower() == "true"
+VISION_MAX_WIDTH = int(os.getenv("VISION_MAX_WIDTH", "1024"))
+VISION_IMAGE_FORMAT = os.getenv("VISION_IMAGE_FORMAT", "jpeg").lower()  # jpeg, webp or png
+VISION_IMAGE_QUALITY = int(os.getenv("VISION_IMAGE_QUALITY", "80"))
+
+# Persistent vision selector cache
+SELECTOR_CACHE_PATH = os.getenv("SELECTOR_CACHE_PATH", str(DATA_DIR / "selector_cache.db"))
+SELECTOR_CACHE_MAX_ENTRIES = int(os.getenv("SELECTOR_CACHE_MAX_ENTRIES", "5000"))
+SELECTOR_CACHE_HALF_LIFE_DAYS = float(os.getenv("SELECTOR_CACHE_HALF_LIFE_DAYS", "14"))
+
+# Exact-match response cache for temperature-0 LLM calls
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_BYPASS = os.getenv("LLM_CACHE_BYPASS", "false").lower() == "true"  # Skip lookups, keep storing
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", str(DATA_DIR / "llm_cache.db"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 86400)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2000"))
+
+# Learned selectors layered over service templates
+SELECTOR_OVERLAY_PATH = os.getenv("SELECTOR_OVERLAY_PATH", str(DATA_DIR / "selector_overlay.json"))
+
 # Security settings
 ENCRYPT_USER_DATA = os.getenv("ENCRYPT_USER_DATA", "true").lower() == "true"
 ENCRYPTION_KEY = os.getenv("ENCRYPTION_KEY", "")
 SESSION_TIMEOUT = int(os.getenv("SESSION_TIMEOUT", "1800"))
 
+# Record/replay for offline benchmarking: off, record or replay
+RECORD_MODE = os.getenv("RECORD_MODE", "off").lower()
+RECORDINGS_DIR = os.getenv("RECORDINGS_DIR", str(DATA_DIR / "recordings"))
+
 # Logging
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 LOG_FILE_PATH = os.getenv("LOG_FILE_PATH", str(LOGS_DIR / "agent.log"))
 
+# Performance metrics (Prometheus text format)
+METRICS_FILE_PATH = os.getenv("METRICS_FILE_PATH", str(DATA_DIR / "metrics.prom"))
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0 disables the HTTP endpoint
+
 # HITL Settings
 CAPTCHA_TIMEOUT = int(os.getenv("CAPTCHA_TIMEOUT", "300"))
 PAYMENT_TIMEOUT = int(os.getenv("PAYMENT_TIMEOUT", "300"))
+PAYMENT_GATEWAY_TIMEOUT = int(os.getenv("PAYMENT_GATEWAY_TIMEOUT", "600"))  # Seconds to reach a result page
+HITL_CAPTCHA_BATCH = int(os.getenv("HITL_CAPTCHA_BATCH", "4"))  # CAPTCHAs per operator view
+# memory: in-process only; server: also serve other processes; client: use another process's server
+HITL_BACKEND = os.getenv("HITL_BACKEND", "memory").lower()
+HITL_SOCKET_PATH = os.getenv("HITL_SOCKET_PATH", str(DATA_DIR / "hitl.sock"))
+HITL_TCP_PORT = int(os.getenv("HITL_TCP_PORT", "8765"))  # Used where Unix sockets are unavailable
+HITL_TOKEN_PATH = os.getenv("HITL_TOKEN_PATH", str(DATA_DIR / "hitl.token"))  # Shared secret for the TCP server
+# Prepare the next step (selectors, upload documents) during CAPTCHA waits
+SPECULATIVE_PREFETCH = os.getenv("SPECULATIVE_PREFETCH", "false").lower() == "true"
 
 # Bot Detection Mitigation
 MIN_DELAY = int(os.getenv("MIN_DELAY", "1000"))
@@ -19,6 +19,8 @@ class AgentState(TypedDict):
     # Workflow tracking
     current_step: str  # e.g., 'login', 'form_fill', 'document_upload', 'preview', 'payment'
     form_progress: dict[str, bool]  # Track which fields have been filled
+    field_paths: dict[str, str]  # Field -> path that filled it ('template' or 'ai')
+    automation_mode: Optional[str]  # 'template', 'ai' or 'hybrid' (defaults to AUTOMATION_MODE)
     
     # Browser state
     dom_snapshot: Optional[str]  # Current page accessibility tree or HTML
@@ -43,5 +45,6 @@ class AgentState(TypedDict):
     
     # Metadata
     attempt_count: dict[str, int]  # Track retry attempts per step
+    llm_spend: Annotated[float, operator.add]  # Estimated LLM cost (USD) charged by nodes
     start_time: Optional[float]  # Workflow start timestamp
     last_update_time: Optional[float]  # Last state update timestamp
@@ -0,0 +1,132 @@
+"""Step, time and LLM-spend budgets for the auditor/form_expert retry loop."""
+import time
+from typing import Optional, TypedDict
+from src import config
+from src.core.agent_state import AgentState
+
+
+# attempt_count key counting every fill attempt of the run (never reset)
+TOTAL_KEY = "_total"
+
+# Escalation actions, in the order they are tried for a step
+AI_FALLBACK = "ai_fallback"
+AI_GAP_FILL = "ai_gap_fill"  # Hybrid mode: AI agent for the fields the template path missed
+HITL = "hitl"
+ABORT = "abort"
+
+
+class BudgetDecision(TypedDict):
+    """Outcome of a budget check when a budget has run out."""
+
+    reason: str  # 'step_retries', 'total_steps', 'deadline' or 'llm_spend'
+    escalation: str  # AI_FALLBACK, HITL or ABORT
+    step: str  # Workflow step the budget was exhausted on
+    detail: str  # Human-readable explanation
+
+
+def charge_attempt(state: AgentState, step: Optional[str] = None) -> dict[str, int]:
+    """
+    Count one more attempt at a workflow step.
+
+    Args:
+        state: Current agent state
+        step: Step to charge (defaults to current_step)
+
+    Returns:
+        Updated attempt_count dict to return from the node
+    """
+    step = step or state.get("current_step", "unknown")
+    attempt_count = dict(state.get("attempt_count") or {})
+    attempt_count[step] = attempt_count.get(step, 0) + 1
+    attempt_count[TOTAL_KEY] = attempt_count.get(TOTAL_KEY, 0) + 1
+    return attempt_count
+
+
+def _escalation_key(escalation: str, step: str) -> str:
+    """attempt_count key recording that an escalation was used for a step."""
+    return f"{escalation}:{step}"
+
+
+def mark_escalated(state: AgentState, escalation: str, step: str, reset_step: bool = False) -> dict[str, int]:
+    """
+    Record that an escalation was used for a step.
+
+    Args:
+        state: Current agent state
+        escalation: Escalation action taken
+        step: Step it was taken for
+        reset_step: Whether to reset the step's retry counter (fresh retries)
+
+    Returns:
+        Updated attempt_count dict
+    """
+    attempt_count = dict(state.get("attempt_count") or {})
+    key = _escalation_key(escalation, step)
+    attempt_count[key] = attempt_count.get(key, 0) + 1
+    if reset_step:
+        attempt_count[step] = 0
+    return attempt_count
+
+
+def escalation_used(state: AgentState, escalation: str, step: str) -> bool:
+    """
+    Whether an escalation was already used for a step.
+
+    Args:
+        state: Current agent state
+        escalation: Escalation action
+        step: Workflow step
+
+    Returns:
+        True if :func:`mark_escalated` recorded it
+    """
+    return bool((state.get("attempt_count") or {}).get(_escalation_key(escalation, step)))
+
+
+def check_budget(state: AgentState) -> Optional[BudgetDecision]:
+    """
+    Check the run against its budgets.
+
+    Time and spend budgets abort outright. When a step runs out of retries,
+    escalation goes AI fallback -> HITL -> abort, each used once per step.
+
+    Args:
+        state: Current agent state
+
+    Returns:
+        Decision if a budget is exhausted, None if the loop may continue
+    """
+    step = state.get("current_step", "unknown")
+    attempt_count = state.get("attempt_count") or {}
+
+    start_time = state.get("start_time")
+    if start_time and time.time() - start_time > config.RUN_DEADLINE_SECONDS:
+        return _decision("deadline", ABORT, step, f"Run exceeded {config.RUN_DEADLINE_SECONDS}s deadline")
+
+    llm_spend = state.get("llm_spend", 0.0) or 0.0
+    if llm_spend > config.MAX_LLM_SPEND:
+        return _decision("llm_spend", ABORT, step, f"LLM spend ${llm_spend:.2f} exceeded ${config.MAX_LLM_SPEND:.2f}")
+
+    total_steps = attempt_count.get(TOTAL_KEY, 0)
+    if total_steps >= config.MAX_TOTAL_STEPS:
+        return _decision("total_steps", ABORT, step, f"Run used {total_steps} fill attempts")
+
+    if attempt_count.get(step, 0) >= config.MAX_STEP_RETRIES:
+        detail = f"Step '{step}' failed {attempt_count[step]} times"
+        if config.BUDGET_AI_FALLBACK and not attempt_count.get(_escalation_key(AI_FALLBACK, step)):
+            return _decision("step_retries", AI_FALLBACK, step, detail)
+        if not attempt_count.get(_escalation_key(HITL, step)):
+            return _decision("step_retries", HITL, step, detail)
+        return _decision("step_retries", ABORT, step, detail)
+
+    return None
+
+
+def _decision(reason: str, escalation: str, step: str, detail: str) -> BudgetDecision:
+    """Build a budget decision (logged by the escalation node when acted on)."""
+    return {
+        "reason": reason,
+        "escalation": escalation,
+        "step": step,
+        "detail": detail,
+    }
@@ -0,0 +1,192 @@
+"""Async progress event bus for streaming graph run updates to subscribers."""
+import asyncio
+import time
+from contextvars import ContextVar
+from typing import Any, Optional, TypedDict
+from src.utils.logging_config import logger
+
+
+# Event types published during a run
+NODE_START = "node_start"
+NODE_END = "node_end"
+FIELD_FILLED = "field_filled"
+SCREENSHOT_TAKEN = "screenshot_taken"
+HITL_REQUIRED = "hitl_required"
+ERROR = "error"
+RUN_STARTED = "run_started"
+RUN_COMPLETED = "run_completed"
+
+# Thread ID of the graph run executing in the current task. Set by run_graph /
+# resume_graph so that helpers deep in the call stack (browser actions, tools)
+# can publish events without the thread ID being threaded through every call.
+current_thread_id: ContextVar[Optional[str]] = ContextVar("current_thread_id", default=None)
+
+
+class ProgressEvent(TypedDict):
+    """A single progress event delivered to subscribers."""
+
+    type: str  # One of the event type constants above
+    thread_id: Optional[str]  # Graph thread the event belongs to
+    timestamp: float  # Wall-clock time the event was published
+    data: dict[str, Any]  # Event-specific payload
+
+
+class Subscription:
+    """
+    Bounded event queue for a single subscriber.
+
+    Publishing never blocks: when the queue is full the oldest event is
+    dropped so that a slow consumer only loses history, never stalls automation.
+    """
+
+    def __init__(self, bus: "EventBus", name: str, maxsize: int, thread_id: Optional[str] = None):
+        """Initialize subscription."""
+        self.bus = bus
+        self.name = name
+        self.thread_id = thread_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def offer(self, event: ProgressEvent):
+        """
+        Enqueue an event without blocking.
+
+        Args:
+            event: Event to deliver
+        """
+        if self.thread_id and event["thread_id"] != self.thread_id:
+            return
+
+        if self.queue.full():
+            try:
+                self.queue.get_nowait()
+                self.dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[ProgressEvent]:
+        """
+        Wait for the next event.
+
+        Args:
+            timeout: Maximum wait time in seconds (None waits forever)
+
+        Returns:
+            Next event or None on timeout
+        """
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def drain(self) -> list[ProgressEvent]:
+        """
+        Return all queued events without waiting (for polling UIs like Streamlit).
+
+        Returns:
+            List of queued events, oldest first
+        """
+        events = []
+        while True:
+            try:
+                events.append(self.queue.get_nowait())
+            except asyncio.QueueEmpty:
+                return events
+
+    def close(self):
+        """Stop receiving events."""
+        self.bus.unsubscribe(self)
+
+    def __aiter__(self):
+        """Iterate over events as they arrive."""
+        return self
+
+    async def __anext__(self) -> ProgressEvent:
+        """Return the next event."""
+        return await self.queue.get()
+
+
+class EventBus:
+    """
+    Fan-out event bus with one bounded queue per subscriber.
+
+    Multiple consumers (Streamlit, CLI, metrics) subscribe independently and
+    each gets its own copy of every event.
+    """
+
+    def __init__(self, default_maxsize: int = 256):
+        """Initialize event bus."""
+        self.default_maxsize = default_maxsize
+        self.subscriptions: list[Subscription] = []
+
+    def subscribe(
+        self,
+        name: str,
+        maxsize: Optional[int] = None,
+        thread_id: Optional[str] = None
+    ) -> Subscription:
+        """
+        Register a new subscriber.
+
+        Args:
+            name: Subscriber name (used in logs)
+            maxsize: Queue size before oldest events are dropped
+            thread_id: Only receive events for this thread (None receives all)
+
+        Returns:
+            Subscription to read events from
+        """
+        subscription = Subscription(self, name, maxsize or self.default_maxsize, thread_id)
+        self.subscriptions.append(subscription)
+        logger.info("event_bus_subscribed", subscriber=name, thread_id=thread_id)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """
+        Remove a subscriber.
+
+        Args:
+            subscription: Subscription to remove
+        """
+        if subscription in self.subscriptions:
+            self.subscriptions.remove(subscription)
+            logger.info(
+                "event_bus_unsubscribed",
+                subscriber=subscription.name,
+                dropped=subscription.dropped
+            )
+
+    def publish(self, event_type: str, thread_id: Optional[str] = None, **data: Any):
+        """
+        Publish an event to all subscribers without blocking.
+
+        Args:
+            event_type: Event type constant
+            thread_id: Thread ID (defaults to the run executing in this context)
+            **data: Event payload
+        """
+        if not self.subscriptions:
+            return
+
+        event: ProgressEvent = {
+            "type": event_type,
+            "thread_id": thread_id or current_thread_id.get(),
+            "timestamp": time.time(),
+            "data": data,
+        }
+
+        for subscription in list(self.subscriptions):
+            try:
+                subscription.offer(event)
+            except Exception as e:
+                logger.warning(
+                    "event_bus_delivery_failed",
+                    subscriber=subscription.name,
+                    error=str(e)
+                )
+
+
+# Global event bus instance
+event_bus = EventBus()
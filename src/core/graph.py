@@ -1,6 +1,7 @@
 """LangGraph workflow definition for MPOnline automation."""
 import time
-from typing import Literal
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Literal, Optional
 from langgraph.graph import StateGraph, END
 from langgraph.checkpoint.memory import MemorySaver
 from src.core.agent_state import AgentState
@@ -10,14 +11,84 @@ from src.agents.auditor_node import auditor_node
 from src.agents.captcha_node import captcha_node
 from src.agents.payment_node import payment_node
 from src.agents.browser_use_node import browser_use_node
+from src.agents.escalation_node import escalation_node
+from src.core.budget import check_budget, escalation_used, AI_GAP_FILL
+from src.automation.browser_checkpoint import checkpoint_browser, restore_browser_state
+from src.automation.page_cache import page_cache
 from src import config
+from src.core.event_bus import (
+    event_bus,
+    current_thread_id,
+    NODE_START,
+    NODE_END,
+    ERROR,
+    HITL_REQUIRED,
+    RUN_STARTED,
+    RUN_COMPLETED
+)
 from src.utils.logging_config import logger
+from src.utils.metrics import metrics, profile_node, start_metrics_server
+from src.utils.recorder import recorder
+from src.utils.llm_usage import llm_usage, track_node
+from src.utils.browser_use_helper import find_gap_fields, fill_path_report
+from src.tools.hitl_remote import start_hitl_server
 
 
-def create_graph():
+def _instrument(name: str, node):
+    """Wrap a node with latency profiling, LLM usage attribution and browser-state checkpointing."""
+    return profile_node(name)(track_node(name)(checkpoint_browser(node)))
+
+
+def _automation_mode(state: AgentState) -> str:
+    """
+    Automation mode for a run: 'template', 'ai' or 'hybrid'.
+    
+    ``use_ai_automation=False`` in the state forces the template path;
+    otherwise the state's ``automation_mode`` or AUTOMATION_MODE applies.
+    """
+    if not state.get("use_ai_automation", True):
+        return "template"
+    return state.get("automation_mode") or config.AUTOMATION_MODE
+
+
+@asynccontextmanager
+async def open_graph(graph: Any = None) -> AsyncIterator[Any]:
+    """
+    Yield a graph whose checkpointer is open for the duration of the block.
+    
+    With CHECKPOINT_BACKEND=sqlite a graph is built on an AsyncSqliteSaver
+    connection opened for the block (checkpoints live on disk, so a graph
+    opened later resumes the same threads, even after a crash). Otherwise
+    ``graph`` is yielded, or a new in-memory graph if none is given.
+    
+    Args:
+        graph: In-memory graph to reuse between calls (ignored for sqlite)
+    
+    Yields:
+        Compiled graph
+    """
+    if config.CHECKPOINT_BACKEND == "sqlite":
+        try:
+            from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+        except ImportError:
+            logger.warning("checkpointer_sqlite_unavailable", fallback="memory")
+        else:
+            async with AsyncSqliteSaver.from_conn_string(config.SQLITE_DB_PATH) as checkpointer:
+                logger.info("checkpointer_sqlite", path=config.SQLITE_DB_PATH)
+                yield create_graph(checkpointer)
+            return
+    
+    yield graph or create_graph()
+
+
+def create_graph(checkpointer: Optional[Any] = None):
     """
     Create the LangGraph workflow with supervisor pattern.
     
+    Args:
+        checkpointer: Checkpoint saver (default: in memory). The SQLite
+            saver needs an open async connection; use :func:`open_graph`.
+    
     Returns:
         Compiled graph with checkpointer
     """
@@ -29,10 +100,9 @@ def create_graph():
         
         next_action = state.get("next_action", "")
         
-        # Check if AI automation is enabled
-        use_ai = state.get("use_ai_automation", config.USE_AI_AUTOMATION)
-        
-        if use_ai:
+        # Full AI mode hands the whole form to browser_use; hybrid and
+        # template modes start with the template path
+        if _automation_mode(state) == "ai":
             logger.info("routing_to_browser_use", ai_mode=True)
             return "browser_use"
         elif next_action == "fill_form":
@@ -44,21 +114,34 @@ def create_graph():
     
     def route_after_form_expert(state: AgentState) -> Literal["auditor", "captcha", "error"]:
         """Route after form expert node."""
-        if state.get("errors") and len(state.get("errors", [])) > 5:
-            # Too many errors, stop
+        if state.get("next_action") == "error":
             return "error"
         
+        # Every pass is audited; the budget is checked only when the auditor
+        # sends the step back (route_after_auditor)
+        
         # Check for CAPTCHA
         # Note: In real implementation, captcha detection happens in captcha_node
         # For routing, we always go to auditor first
         return "auditor"
     
-    def route_after_auditor(state: AgentState) -> Literal["form_expert", "navigator", "captcha", END]:
+    def route_after_auditor(state: AgentState) -> Literal["form_expert", "browser_use", "navigator", "captcha", "escalate", END]:
         """Route after auditor node."""
         next_action = state.get("next_action", "")
         
         if next_action == "fill_form":
-            # Validation failed, go back to form expert
+            # Validation failed, go back to form expert unless the step is out of budget
+            if check_budget(state):
+                return "escalate"
+            # Hybrid: fields the template path missed go to the AI agent, once per step
+            step = state.get("current_step", "unknown")
+            if (
+                _automation_mode(state) == "hybrid"
+                and not escalation_used(state, AI_GAP_FILL, step)
+                and find_gap_fields(state)
+            ):
+                logger.info("routing_gaps_to_browser_use", step=step)
+                return "browser_use"
             return "form_expert"
         elif next_action == "upload_documents":
             # Move to document upload step
@@ -87,13 +170,23 @@ def create_graph():
         else:
             return "navigator"
     
+    def route_after_escalation(state: AgentState) -> Literal["form_expert", "browser_use", "error"]:
+        """Route after budget escalation."""
+        next_action = state.get("next_action", "")
+        
+        if next_action == "ai_fallback":
+            return "browser_use"
+        elif next_action == "fill_form":
+            return "form_expert"
+        return "error"
+    
     def route_after_payment(state: AgentState) -> Literal["error", END]:
         """Route after payment node."""
         if state.get("errors"):
             return "error"
         return END
     
-    def handle_error(state: AgentState) -> dict:
+    async def handle_error(state: AgentState) -> dict:
         """Error handler node."""
         logger.error("workflow_error", errors=state.get("errors"))
         return {
@@ -104,14 +197,15 @@ def create_graph():
     # Create graph
     workflow = StateGraph(AgentState)
     
-    # Add nodes
-    workflow.add_node("navigator", navigator_node)
-    workflow.add_node("form_expert", form_expert_node)
-    workflow.add_node("browser_use", browser_use_node)  # NEW: AI-driven automation
-    workflow.add_node("auditor", auditor_node)
-    workflow.add_node("captcha", captcha_node)
-    workflow.add_node("payment", payment_node)
-    workflow.add_node("error", handle_error)
+    # Add nodes (each wrapped with latency profiling and browser checkpointing)
+    workflow.add_node("navigator", _instrument("navigator", navigator_node))
+    workflow.add_node("form_expert", _instrument("form_expert", form_expert_node))
+    workflow.add_node("browser_use", _instrument("browser_use", browser_use_node))  # NEW: AI-driven automation
+    workflow.add_node("auditor", _instrument("auditor", auditor_node))
+    workflow.add_node("captcha", _instrument("captcha", captcha_node))
+    workflow.add_node("payment", _instrument("payment", payment_node))
+    workflow.add_node("escalate", _instrument("escalate", escalation_node))
+    workflow.add_node("error", _instrument("error", handle_error))
     
     # Set entry point
     workflow.set_entry_point("navigator")
@@ -128,12 +222,14 @@ def create_graph():
         }
     )
     
-    # Add edge from browser_use to captcha (AI fills form, then CAPTCHA)
+    # Add edge from browser_use to captcha (AI fills form, then CAPTCHA),
+    # or back to the auditor after filling only the template path's gaps
     workflow.add_conditional_edges(
         "browser_use",
-        lambda state: "captcha" if state.get("next_action") == "captcha" else "error",
+        lambda state: {"captcha": "captcha", "audit": "auditor"}.get(state.get("next_action"), "error"),
         {
             "captcha": "captcha",
+            "auditor": "auditor",
             "error": "error"
         }
     )
@@ -153,12 +249,24 @@ def create_graph():
         route_after_auditor,
         {
             "form_expert": "form_expert",
+            "browser_use": "browser_use",
             "navigator": "navigator",
             "captcha": "captcha",
+            "escalate": "escalate",
             END: END
         }
     )
     
+    workflow.add_conditional_edges(
+        "escalate",
+        route_after_escalation,
+        {
+            "form_expert": "form_expert",
+            "browser_use": "browser_use",
+            "error": "error"
+        }
+    )
+    
     workflow.add_conditional_edges(
         "captcha",
         route_after_captcha,
@@ -182,8 +290,10 @@ def create_graph():
     # Error node goes to END
     workflow.add_edge("error", END)
     
-    # Create checkpointer (in-memory for now, can be upgraded to SQLite later)
-    checkpointer = MemorySaver()
+    if checkpointer is None:
+        if config.CHECKPOINT_BACKEND == "sqlite":
+            logger.warning("checkpointer_sqlite_needs_open_graph", fallback="memory")
+        checkpointer = MemorySaver()
     
     # Compile graph with HITL interrupts
     graph = workflow.compile(
@@ -193,13 +303,87 @@ def create_graph():
     
     logger.info("graph_compiled", nodes=len(workflow.nodes))
     
+    if config.METRICS_PORT:
+        start_metrics_server(config.METRICS_PORT)
+    
+    if config.HITL_BACKEND == "server":
+        start_hitl_server()
+    
     return graph
 
 
+async def _stream_graph(graph, graph_input, config_dict: dict, thread_id: str):
+    """
+    Stream a graph run, publishing progress events as nodes start and finish.
+    
+    Args:
+        graph: Compiled graph
+        graph_input: Initial state, state updates or None to resume
+        config_dict: Run configuration with thread_id
+        thread_id: Thread ID for event tagging
+        
+    Returns:
+        Last state update chunk
+    """
+    final_state = None
+    
+    async for mode, chunk in graph.astream(
+        graph_input,
+        config_dict,
+        stream_mode=["updates", "debug"]
+    ):
+        if mode == "updates":
+            logger.info("graph_state_update", state_keys=list(chunk.keys()))
+            final_state = chunk
+            continue
+        
+        payload = chunk.get("payload") or {}
+        if chunk.get("type") == "task":
+            event_bus.publish(NODE_START, node=payload.get("name"), step=chunk.get("step"))
+        elif chunk.get("type") == "task_result":
+            node_update = _task_result_update(payload.get("result"))
+            event_bus.publish(
+                NODE_END,
+                node=payload.get("name"),
+                step=chunk.get("step"),
+                next_action=node_update.get("next_action"),
+                current_step=node_update.get("current_step")
+            )
+            if payload.get("error") or node_update.get("errors"):
+                event_bus.publish(
+                    ERROR,
+                    node=payload.get("name"),
+                    errors=node_update.get("errors") or [str(payload.get("error"))]
+                )
+    
+    # Surface HITL interrupts (interrupt_before captcha/payment) to subscribers
+    snapshot = await graph.aget_state(config_dict)
+    if snapshot.next:
+        event_bus.publish(
+            HITL_REQUIRED,
+            pending_nodes=list(snapshot.next),
+            screenshot_path=snapshot.values.get("screenshot_path")
+        )
+    
+    return final_state
+
+
+def _task_result_update(result) -> dict:
+    """Normalize a debug task_result payload into a state update dict."""
+    if isinstance(result, dict):
+        return result
+    if isinstance(result, (list, tuple)):
+        # Older LangGraph versions report writes as (channel, value) pairs
+        return {key: value for key, value in result if isinstance(key, str)}
+    return {}
+
+
 async def run_graph(graph, initial_state: AgentState, thread_id: str):
     """
     Run the graph with given initial state.
     
+    Progress is published to ``event_bus`` while the run executes.
+    
     Args:
         graph: Compiled graph
         initial_state: Initial agent state
@@ -215,19 +399,32 @@ async def run_graph(graph, initial_state: AgentState, thread_id: str):
     }
     
     logger.info("graph_execution_started", thread_id=thread_id)
+    token = current_thread_id.set(thread_id)
+    event_bus.publish(RUN_STARTED, service=initial_state.get("service_type"))
+    
+    if recorder.recording:
+        recorder.save_initial_state(thread_id, initial_state)
     
     try:
-        final_state = None
-        async for state in graph.astream(initial_state, config_dict):
-            logger.info("graph_state_update", state_keys=list(state.keys()))
-            final_state = state
+        final_state = await _stream_graph(graph, initial_state, config_dict, thread_id)
         
-        logger.info("graph_execution_completed", thread_id=thread_id)
+        snapshot = await graph.aget_state(config_dict)
+        report = {
+            **page_cache.run_report(thread_id),
+            **llm_usage.run_report(thread_id),
+            **fill_path_report(snapshot.values)
+        }
+        logger.info("graph_execution_completed", thread_id=thread_id, **report)
+        event_bus.publish(RUN_COMPLETED, **report)
         return final_state
         
     except Exception as e:
         logger.error("graph_execution_error", error=str(e), thread_id=thread_id)
+        event_bus.publish(ERROR, errors=[str(e)])
         raise
+    finally:
+        current_thread_id.reset(token)
+        metrics.write_prometheus_file()
 
 
 async def resume_graph(graph, thread_id: str, updates: dict = None):
@@ -249,24 +446,37 @@ async def resume_graph(graph, thread_id: str, updates: dict = None):
     }
     
     logger.info("graph_resuming", thread_id=thread_id, updates=updates)
+    token = current_thread_id.set(thread_id)
     
     try:
-        final_state = None
+        # Rebuild the browser page if it was lost (crash/restart); fields whose
+        # values could not be restored are marked unfilled so only they are redone
+        snapshot = await graph.aget_state(config_dict)
+        unrestored = await restore_browser_state(snapshot.values)
+        if unrestored:
+            form_progress = dict(snapshot.values.get("form_progress") or {})
+            form_progress.update({field: False for field in unrestored})
+            updates = {**(updates or {}), "form_progress": form_progress}
         
-        # If updates provided, continue with them
+        # Apply updates to the checkpoint, then continue from where the run paused
         if updates:
-            async for state in graph.astream(updates, config_dict):
-                logger.info("graph_state_update", state_keys=list(state.keys()))
-                final_state = state
-        else:
-            # Just resume from checkpoint
-            async for state in graph.astream(None, config_dict):
-                logger.info("graph_state_update", state_keys=list(state.keys()))
-                final_state = state
+            await graph.aupdate_state(config_dict, updates)
+        final_state = await _stream_graph(graph, None, config_dict, thread_id)
         
-        logger.info("graph_resumed_completed", thread_id=thread_id)
+        snapshot = await graph.aget_state(config_dict)
+        report = {
+            **page_cache.run_report(thread_id),
+            **llm_usage.run_report(thread_id),
+            **fill_path_report(snapshot.values)
+        }
+        logger.info("graph_resumed_completed", thread_id=thread_id, **report)
+        event_bus.publish(RUN_COMPLETED, **report)
         return final_state
         
     except Exception as e:
         logger.error("graph_resume_error", error=str(e), thread_id=thread_id)
+        event_bus.publish(ERROR, errors=[str(e)])
         raise
+    finally:
+        current_thread_id.reset(token)
+        metrics.write_prometheus_file()
@@ -49,6 +49,16 @@ class ElectricityTemplate:
             "consumer_number_length": 10
         }
     
+    @staticmethod
+    def get_validation_schema() -> Dict[str, Dict[str, Any]]:
+        """Get declarative per-field validation schema."""
+        rules = ElectricityTemplate.get_validation_rules()
+        return {
+            "consumer_number": {"required": True, "format": "digits", "length": rules["consumer_number_length"]},
+            "mobile": {"required": True, "format": "indian_mobile"},
+            "email": {"required": False, "format": "email"},
+        }
+    
     @staticmethod
     def get_service_info() -> Dict[str, str]:
         """Get service information."""
@@ -147,6 +157,21 @@ class UniversityTemplate:
             "marksheet_max_size": 512000
         }
     
+    @staticmethod
+    def get_validation_schema() -> Dict[str, Dict[str, Any]]:
+        """Get declarative per-field validation schema."""
+        rules = UniversityTemplate.get_validation_rules()
+        return {
+            "student_name": {"required": True, "max_length": 100},
+            "father_name": {"required": True, "max_length": 100},
+            "date_of_birth": {"required": True, "format": "date"},
+            "email": {"required": True, "format": "email"},
+            "mobile": {"required": True, "format": "indian_mobile"},
+            "course": {"required": True},
+            "photo": {"required": True, "file_formats": ["jpg", "jpeg"], "max_size": rules["photo_max_size"]},
+            "marksheet": {"required": True, "file_formats": ["pdf", "jpg", "jpeg"], "max_size": rules["marksheet_max_size"]},
+        }
+    
     @staticmethod
     def get_service_info() -> Dict[str, str]:
         """Get service information."""
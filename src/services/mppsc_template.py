@@ -148,6 +148,34 @@ class MPPSCTemplate:
             "certificate_format": ["pdf"]
         }
     
+    @staticmethod
+    def get_validation_schema() -> Dict[str, Dict[str, Any]]:
+        """
+        Get declarative per-field validation schema.
+        
+        Keys per field: required, format (see services.validation.FORMATS),
+        pattern, length, min_length, max_length, choices, file_formats, max_size.
+        """
+        rules = MPPSCTemplate.get_validation_rules()
+        return {
+            "full_name": {"required": True, "max_length": 100},
+            "father_name": {"required": True, "max_length": 100},
+            "mother_name": {"required": True, "max_length": 100},
+            "date_of_birth": {"required": True, "format": "date"},
+            "gender": {"required": True, "choices": ["Male", "Female", "Other"]},
+            "category": {"required": True, "choices": ["General", "OBC", "SC", "ST"]},
+            "email": {"required": True, "format": "email"},
+            "mobile": {"required": True, "format": "indian_mobile"},
+            "address": {"required": True, "max_length": 300},
+            "district": {"required": True},
+            "state": {"required": True},
+            "pincode": {"required": True, "format": "pincode"},
+            "qualification": {"required": True},
+            "photo": {"required": True, "file_formats": rules["photo_format"], "max_size": rules["photo_max_size"]},
+            "signature": {"required": True, "file_formats": rules["signature_format"], "max_size": rules["signature_max_size"]},
+            "certificate": {"required": False, "file_formats": rules["certificate_format"], "max_size": rules["certificate_max_size"]},
+        }
+    
     @staticmethod
     def get_service_info() -> Dict[str, str]:
         """Get service information for display."""
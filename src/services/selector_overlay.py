@@ -0,0 +1,204 @@
+"""Learned selector overlay layered over SERVICE_REGISTRY templates."""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+from src import config
+from src.utils.logging_config import logger
+from src.utils.metrics import metrics
+
+
+# Template steps that carry field mappings
+FORM_STEPS = ("form_fill", "document_upload")
+
+# An overlay entry is dropped once it misses this often and more than it hits
+MAX_OVERLAY_MISSES = 3
+
+
+class SelectorOverlay:
+    """
+    Persists selectors learned at runtime (from vision or the AI agent) per
+    service, step and field, with hit/miss counters.
+
+    A learned selector is promoted above the template selector for its field,
+    with the template selector kept as a fallback. Entries that keep missing
+    are dropped so a fixed template takes over again. Stored as JSON so the
+    drift can be reviewed and merged back into the templates.
+    """
+
+    def __init__(self, path: str = config.SELECTOR_OVERLAY_PATH):
+        """Initialize overlay store."""
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.entries: dict[str, dict[str, dict[str, dict[str, Any]]]] = {}
+        self._load()
+
+    def _load(self):
+        """Load overlay entries from disk."""
+        if not self.path.exists():
+            return
+        try:
+            self.entries = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("selector_overlay_load_failed", path=str(self.path), error=str(e))
+            self.entries = {}
+
+    def _save(self):
+        """Write overlay entries to disk atomically (caller holds the lock)."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.entries, indent=2, sort_keys=True), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def get(self, service: str, step: str, field: str) -> Optional[dict[str, Any]]:
+        """
+        Get the overlay entry for a field.
+
+        Args:
+            service: Service type
+            step: Template step
+            field: Field name
+
+        Returns:
+            Entry dict or None
+        """
+        return self.entries.get(service, {}).get(step, {}).get(field)
+
+    def apply(self, service: str, step: str, mappings: dict[str, dict[str, Any]]) -> dict[str, dict[str, Any]]:
+        """
+        Overlay learned selectors onto template field mappings.
+
+        Args:
+            service: Service type
+            step: Template step
+            mappings: Template field mappings
+
+        Returns:
+            Copy of the mappings where learned fields use the learned
+            ``selector``, keep the template one as ``fallback_selector`` and
+            are tagged ``selector_source``
+        """
+        learned = self.entries.get(service, {}).get(step, {})
+        merged = {}
+        for field, field_config in mappings.items():
+            entry = learned.get(field)
+            if entry and entry["selector"] != field_config.get("selector"):
+                merged[field] = {
+                    **field_config,
+                    "selector": entry["selector"],
+                    "fallback_selector": field_config.get("selector"),
+                    "selector_source": entry["source"],
+                }
+            else:
+                merged[field] = {**field_config, "selector_source": "template"}
+        return merged
+
+    def learn(
+        self,
+        service: str,
+        step: str,
+        field: str,
+        selector: str,
+        source: str,
+        template_selector: Optional[str] = None
+    ):
+        """
+        Record a selector that worked where the template selector did not.
+
+        Args:
+            service: Service type
+            step: Template step
+            field: Field name
+            selector: Working selector
+            source: Where it was learned ('vision' or 'ai_agent')
+            template_selector: Template selector it replaces
+        """
+        if not selector or selector == template_selector:
+            return
+
+        now = time.time()
+        with self._lock:
+            fields = self.entries.setdefault(service, {}).setdefault(step, {})
+            entry = fields.get(field)
+            if entry and entry["selector"] == selector:
+                entry["hits"] += 1
+                entry["last_used"] = now
+            else:
+                fields[field] = {
+                    "selector": selector,
+                    "source": source,
+                    "template_selector": template_selector,
+                    "hits": 1,
+                    "misses": 0,
+                    "learned_at": now,
+                    "last_used": now,
+                }
+            self._save()
+
+        logger.info("selector_learned", service=service, step=step, field=field, source=source)
+
+    def record(self, service: str, step: str, field: str, hit: bool):
+        """
+        Count a use of a learned selector, dropping it if it keeps missing.
+
+        Args:
+            service: Service type
+            step: Template step
+            field: Field name
+            hit: Whether the learned selector worked
+        """
+        with self._lock:
+            fields = self.entries.get(service, {}).get(step, {})
+            entry = fields.get(field)
+            if not entry:
+                return
+
+            entry["hits" if hit else "misses"] += 1
+            entry["last_used"] = time.time()
+            if entry["misses"] >= MAX_OVERLAY_MISSES and entry["misses"] > entry["hits"]:
+                del fields[field]
+                logger.info("selector_overlay_dropped", service=service, step=step, field=field)
+            self._save()
+
+        metrics.inc(
+            "mponline_selector_overlay_uses_total",
+            help_text="Uses of learned overlay selectors",
+            service_type=service,
+            outcome="hit" if hit else "miss"
+        )
+
+    def export_diff(self, path: Optional[str] = None) -> list[dict[str, Any]]:
+        """
+        List learned selectors next to the template selectors they replace.
+
+        Args:
+            path: Optional file to write the diff to (JSON)
+
+        Returns:
+            One row per overlay entry, sorted by service, step and field
+        """
+        rows = [
+            {
+                "service": service,
+                "step": step,
+                "field": field,
+                "template_selector": entry.get("template_selector"),
+                "learned_selector": entry["selector"],
+                "source": entry["source"],
+                "hits": entry["hits"],
+                "misses": entry["misses"],
+            }
+            for service, steps in sorted(self.entries.items())
+            for step, fields in sorted(steps.items())
+            for field, entry in sorted(fields.items())
+        ]
+        if path:
+            Path(path).write_text(json.dumps(rows, indent=2), encoding="utf-8")
+            logger.info("selector_overlay_exported", path=path, entries=len(rows))
+        return rows
+
+
+# Global selector overlay instance
+selector_overlay = SelectorOverlay()
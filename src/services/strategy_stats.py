@@ -0,0 +1,110 @@
+"""Per-service success and latency history of AgenticBrowserAgent strategies."""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any
+from src import config
+from src.utils.logging_config import logger
+from src.utils.metrics import metrics
+
+
+class StrategyStats:
+    """
+    Persists, per service and strategy, how often the strategy reached a
+    validated form page and how long its runs took.
+
+    ``rank`` orders strategies by smoothed success rate, then by mean
+    latency of successful runs, so the likeliest and fastest route is tried
+    (or raced) first. Strategies with no history keep their default order
+    after those with a good record. Stored as JSON like the selector overlay.
+    """
+
+    def __init__(self, path: str = config.STRATEGY_STATS_PATH):
+        """Initialize strategy stats store."""
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.entries: dict[str, dict[str, dict[str, Any]]] = {}  # service -> strategy -> counters
+        self._load()
+
+    def _load(self):
+        """Load stats from disk."""
+        if not self.path.exists():
+            return
+        try:
+            self.entries = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning("strategy_stats_load_failed", path=str(self.path), error=str(e))
+            self.entries = {}
+
+    def _save(self):
+        """Write stats to disk atomically (caller holds the lock)."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(self.entries, indent=2, sort_keys=True), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def record(self, service: str, strategy: str, success: bool, latency: float):
+        """
+        Count a finished strategy run.
+
+        Args:
+            service: Service type
+            strategy: Strategy name
+            success: Whether it reached a validated form page
+            latency: Seconds the run took
+        """
+        with self._lock:
+            entry = self.entries.setdefault(service, {}).setdefault(
+                strategy, {"attempts": 0, "successes": 0, "success_seconds": 0.0}
+            )
+            entry["attempts"] += 1
+            if success:
+                entry["successes"] += 1
+                entry["success_seconds"] += latency
+            entry["last_run"] = time.time()
+            self._save()
+
+        metrics.inc(
+            "mponline_agentic_strategy_runs_total",
+            help_text="AgenticBrowserAgent strategy runs",
+            service_type=service,
+            strategy=strategy,
+            outcome="success" if success else "failure"
+        )
+        metrics.observe(
+            "mponline_agentic_strategy_seconds",
+            latency,
+            help_text="AgenticBrowserAgent strategy run time",
+            service_type=service,
+            strategy=strategy
+        )
+
+    def rank(self, service: str, strategies: list[str]) -> list[str]:
+        """
+        Order strategies best first.
+
+        Args:
+            service: Service type
+            strategies: Candidate strategies in default order
+
+        Returns:
+            The same strategies, reordered
+        """
+        history = self.entries.get(service, {})
+
+        def score(item: tuple[int, str]):
+            index, strategy = item
+            entry = history.get(strategy)
+            if not entry or not entry["attempts"]:
+                return (-0.5, 0.0, index)  # Unknown: as good as a coin flip
+            rate = (entry["successes"] + 1) / (entry["attempts"] + 2)
+            mean_latency = entry["success_seconds"] / entry["successes"] if entry["successes"] else float("inf")
+            return (-rate, mean_latency, index)
+
+        return [strategy for _, strategy in sorted(enumerate(strategies), key=score)]
+
+
+# Global strategy stats instance
+strategy_stats = StrategyStats()
@@ -0,0 +1,234 @@
+"""Schema-driven validation of applicant data against service templates."""
+import functools
+import os
+import re
+from typing import Any, Callable, Iterable, Optional, Sequence, TypedDict
+from src.services.service_registry import SERVICE_REGISTRY
+
+
+# Named formats usable as ``"format"`` in a template validation schema
+FORMATS = {
+    "email": (r"[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}", "Invalid email format"),
+    "indian_mobile": (r"(?:\+91)?[6-9]\d{9}", "Invalid phone format"),
+    "date": (r"\d{2}/\d{2}/\d{4}|\d{2}-\d{2}-\d{4}|\d{4}-\d{2}-\d{2}", "Invalid date format"),
+    "pincode": (r"[1-9]\d{5}", "Invalid PIN code"),
+    "digits": (r"\d+", "Must contain digits only"),
+}
+
+# Characters ignored when checking phone-like formats
+_PHONE_SEPARATORS = re.compile(r"[\s\-\(\)]")
+
+
+class ValidationIssue(TypedDict):
+    """One structured validation failure."""
+
+    field: str
+    code: str  # 'required', 'format', 'pattern', 'length', 'choices', 'file_format', 'file_size', 'file_missing'
+    message: str
+    row: Optional[int]  # Row index for batch validation, None for single records
+
+
+# A compiled check returns (code, message) on failure, None on success
+Check = Callable[[str], Optional[tuple[str, str]]]
+
+
+def _compile_field(spec: dict[str, Any]) -> list[Check]:
+    """Compile one field's schema into a list of checks on its string value."""
+    checks: list[Check] = []
+
+    if "format" in spec:
+        pattern, message = FORMATS[spec["format"]]
+        regex = re.compile(pattern)
+        strip = spec["format"] == "indian_mobile"
+        checks.append(
+            lambda value, regex=regex, message=message, strip=strip: None
+            if regex.fullmatch(_PHONE_SEPARATORS.sub("", value) if strip else value)
+            else ("format", message)
+        )
+
+    if "pattern" in spec:
+        regex = re.compile(spec["pattern"])
+        checks.append(
+            lambda value, regex=regex: None if regex.fullmatch(value) else ("pattern", "Does not match expected pattern")
+        )
+
+    if "length" in spec:
+        length = spec["length"]
+        checks.append(
+            lambda value, length=length: None if len(value) == length else ("length", f"Must be {length} characters")
+        )
+
+    if "min_length" in spec or "max_length" in spec:
+        low, high = spec.get("min_length", 0), spec.get("max_length")
+        checks.append(
+            lambda value, low=low, high=high: None
+            if len(value) >= low and (high is None or len(value) <= high)
+            else ("length", f"Length must be between {low} and {high if high is not None else 'any'}")
+        )
+
+    if "choices" in spec:
+        choices = {choice.casefold() for choice in spec["choices"]}
+        allowed = ", ".join(spec["choices"])
+        checks.append(
+            lambda value, choices=choices, allowed=allowed: None
+            if value.casefold() in choices
+            else ("choices", f"Must be one of: {allowed}")
+        )
+
+    if "file_formats" in spec or "max_size" in spec:
+        formats = {ext.lower().lstrip(".") for ext in spec.get("file_formats", [])}
+        max_size = spec.get("max_size")
+        checks.append(lambda value, formats=formats, max_size=max_size: _check_file(value, formats, max_size))
+
+    return checks
+
+
+def _check_file(path: str, formats: set[str], max_size: Optional[int]) -> Optional[tuple[str, str]]:
+    """Check an uploaded file's extension and size."""
+    extension = os.path.splitext(path)[1].lower().lstrip(".")
+    if formats and extension not in formats:
+        return "file_format", f"File must be one of: {', '.join(sorted(formats))}"
+    if max_size is not None:
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return "file_missing", "File not found"
+        if size > max_size:
+            return "file_size", f"File exceeds {max_size // 1024}KB"
+    return None
+
+
+class CompiledSchema:
+    """Validators for one service, compiled once from its template schema."""
+
+    def __init__(self, schema: dict[str, dict[str, Any]]):
+        """Compile schema."""
+        self.required = {field for field, spec in schema.items() if spec.get("required", False)}
+        self.checks = {field: _compile_field(spec) for field, spec in schema.items()}
+
+    def validate_value(self, field: str, value: Any, row: Optional[int] = None, check_required: bool = True) -> list[ValidationIssue]:
+        """
+        Validate one field value.
+
+        Args:
+            field: Field name
+            value: Raw value (None or blank counts as missing)
+            row: Row index for batch validation
+            check_required: Whether a missing required value is an issue
+
+        Returns:
+            Issues found (empty if valid)
+        """
+        text = "" if value is None else str(value).strip()
+        if not text:
+            if check_required and field in self.required:
+                return [{"field": field, "code": "required", "message": "Required field is missing", "row": row}]
+            return []
+
+        issues = []
+        for check in self.checks.get(field, ()):
+            failure = check(text)
+            if failure:
+                issues.append({"field": field, "code": failure[0], "message": failure[1], "row": row})
+        return issues
+
+
+@functools.lru_cache(maxsize=None)
+def get_compiled_schema(service_type: str) -> CompiledSchema:
+    """
+    Get the compiled validators for a service (compiled on first use).
+
+    Args:
+        service_type: Service type key
+
+    Returns:
+        Compiled schema (empty if the template declares none)
+    """
+    template = SERVICE_REGISTRY.get(service_type)
+    get_schema = getattr(template, "get_validation_schema", None)
+    return CompiledSchema(get_schema() if get_schema else {})
+
+
+def validate_record(
+    service_type: str,
+    record: dict[str, Any],
+    fields: Optional[Iterable[str]] = None,
+    check_required: bool = True
+) -> list[ValidationIssue]:
+    """
+    Validate one applicant record.
+
+    Args:
+        service_type: Service type key
+        record: Field name -> value
+        fields: Restrict validation to these fields (default: every schema field)
+        check_required: Whether missing required values are issues
+
+    Returns:
+        Issues found (empty if valid)
+    """
+    schema = get_compiled_schema(service_type)
+    issues = []
+    for field in (schema.checks if fields is None else fields):
+        if field in schema.checks:
+            issues.extend(schema.validate_value(field, record.get(field), check_required=check_required))
+    return issues
+
+
+def validate_batch(service_type: str, columns: dict[str, Sequence[Any]]) -> dict[str, Any]:
+    """
+    Validate many applicants at once from column-oriented data.
+
+    Each schema field's column is validated in one pass with its compiled
+    checks, so no per-row dicts are built.
+
+    Args:
+        service_type: Service type key
+        columns: Field name -> values, one per applicant (all the same length)
+
+    Returns:
+        Dict with ``rows`` (count), ``invalid_rows`` (sorted row indices) and
+        ``issues`` (ValidationIssue list, each with its row index)
+    """
+    schema = get_compiled_schema(service_type)
+    rows = max((len(values) for values in columns.values()), default=0)
+
+    issues = []
+    for field in schema.checks:
+        values = columns.get(field) or [None] * rows
+        for row, value in enumerate(values):
+            issues.extend(schema.validate_value(field, value, row=row))
+
+    return {
+        "rows": rows,
+        "invalid_rows": sorted({issue["row"] for issue in issues}),
+        "issues": issues,
+    }
+
+
+def records_to_columns(records: Sequence[dict[str, Any]]) -> dict[str, list[Any]]:
+    """
+    Convert row-oriented records (e.g. csv.DictReader rows) to columns for validate_batch.
+
+    Args:
+        records: Applicant records
+
+    Returns:
+        Field name -> values
+    """
+    fields = {field for record in records for field in record}
+    return {field: [record.get(field) for record in records] for field in fields}
+
+
+def format_issue(issue: ValidationIssue) -> str:
+    """
+    Render an issue as a single human-readable line.
+
+    Args:
+        issue: Validation issue
+
+    Returns:
+        Message such as ``"email: Invalid email format"``
+    """
+    prefix = f"row {issue['row']}: " if issue["row"] is not None else ""
+    return f"{prefix}{issue['field']}: {issue['message']}"
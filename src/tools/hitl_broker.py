@@ -0,0 +1,334 @@
+"""Shared operator queue for HITL requests with priorities and SLA tracking."""
+import heapq
+import itertools
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Optional
+from src import config
+from src.core.event_bus import current_thread_id
+from src.tools.human_input_tool import human_input_tool
+from src.utils.logging_config import logger
+from src.utils.metrics import metrics
+
+
+# Request kinds, most urgent first (lower value is served first)
+PRIORITIES = {
+    "payment": 0,
+    "escalation": 1,
+    "captcha": 2,
+}
+
+# Kinds an operator can answer several of from one view
+BATCHABLE_KINDS = ("captcha",)
+
+QUEUED = "queued"
+CLAIMED = "claimed"
+DONE = "done"
+
+
+class HITLBroker:
+    """
+    Queues human requests from all sessions for a pool of operators.
+
+    Requests are served by priority, then earliest deadline. Operators claim
+    work; CAPTCHAs are claimed in batches so one operator view can solve
+    several at once. Answers are delivered through human_input_tool, which
+    wakes the waiting session. Queue depth, time-to-answer and expired
+    requests are tracked for staffing.
+    """
+
+    def __init__(self, captcha_batch_size: int = config.HITL_CAPTCHA_BATCH):
+        """Initialize broker."""
+        self.captcha_batch_size = captcha_batch_size
+        self.requests: dict[str, dict[str, Any]] = {}
+        self._heap: list[tuple] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._answer_times: deque = deque(maxlen=1000)
+        self._counts = {"submitted": 0, "answered": 0, "expired": 0, "cancelled": 0}
+        self._operator_answers: dict[str, int] = {}
+
+    async def request(
+        self,
+        kind: str,
+        prompt: str,
+        input_type: str = "text",
+        timeout: int = 300,
+        priority: Optional[int] = None,
+        attachment: Optional[Any] = None,
+        record: bool = True
+    ) -> Optional[Any]:
+        """
+        Queue a request for the operator pool and wait for its answer.
+
+        Args:
+            kind: Request kind ('captcha', 'payment', 'escalation', ...)
+            prompt: Prompt shown to the operator
+            input_type: HITL input type
+            timeout: Seconds until the request expires
+            priority: Override the kind's default priority (lower is sooner)
+            attachment: Optional payload shown with the prompt (e.g. a CAPTCHA image)
+            record: Apply record/replay in this process (see HumanInputTool.request_input)
+
+        Returns:
+            Operator's answer, or None if the request expired or was cancelled
+        """
+        request_id = f"{kind}_{uuid.uuid4().hex[:12]}"
+        now = time.time()
+        entry = {
+            "request_id": request_id,
+            "kind": kind,
+            "prompt": prompt,
+            "input_type": input_type,
+            "attachment": attachment,
+            "priority": PRIORITIES.get(kind, len(PRIORITIES)) if priority is None else priority,
+            "thread_id": current_thread_id.get(),
+            "created_at": now,
+            "deadline": now + timeout,
+            "status": QUEUED,
+            "operator": None,
+        }
+
+        with self._lock:
+            self.requests[request_id] = entry
+            heapq.heappush(self._heap, (entry["priority"], entry["deadline"], next(self._sequence), request_id))
+            self._counts["submitted"] += 1
+            depth = self._queued_count()
+
+        metrics.observe(
+            "mponline_hitl_queue_depth",
+            depth,
+            help_text="HITL queue depth when a request is enqueued",
+            kind=kind
+        )
+        logger.info("hitl_request_queued", request_id=request_id, kind=kind, depth=depth)
+
+        answer = None
+        try:
+            answer = await human_input_tool.request_input(
+                request_id=request_id,
+                prompt=prompt,
+                input_type=input_type,
+                timeout=timeout,
+                record=record
+            )
+        finally:
+            self._finish(request_id, answer)
+
+        return answer
+
+    def _finish(self, request_id: str, answer: Optional[Any]):
+        """Close a request and account for its outcome."""
+        with self._lock:
+            entry = self.requests.pop(request_id, None)
+        if not entry:
+            return
+
+        elapsed = time.time() - entry["created_at"]
+        if answer is not None:
+            outcome = "answered"
+            self._answer_times.append(elapsed)
+            metrics.observe(
+                "mponline_hitl_time_to_answer_seconds",
+                elapsed,
+                help_text="Time from HITL request to operator answer",
+                kind=entry["kind"]
+            )
+        elif time.time() >= entry["deadline"]:
+            outcome = "expired"
+            metrics.inc(
+                "mponline_hitl_expired_total",
+                help_text="HITL requests that expired unanswered",
+                kind=entry["kind"]
+            )
+        else:
+            outcome = "cancelled"
+
+        with self._lock:
+            self._counts[outcome] += 1
+        logger.info("hitl_request_finished", request_id=request_id, outcome=outcome, elapsed=round(elapsed, 3))
+
+    def _queued_count(self) -> int:
+        """Number of requests waiting for an operator (caller holds the lock)."""
+        return sum(1 for entry in self.requests.values() if entry["status"] == QUEUED)
+
+    def claim(self, operator_id: str, max_items: int = 1) -> list[dict[str, Any]]:
+        """
+        Assign the most urgent queued work to an operator.
+
+        If the most urgent request is batchable (CAPTCHA), up to
+        ``captcha_batch_size`` requests of that kind are claimed together.
+
+        Args:
+            operator_id: Operator identifier
+            max_items: Maximum non-batchable requests to claim
+
+        Returns:
+            Claimed requests (request_id, kind, prompt, input_type, attachment, deadline)
+        """
+        claimed = []
+        deferred = []
+        now = time.time()
+
+        with self._lock:
+            batch_kind = None
+            while self._heap:
+                item = heapq.heappop(self._heap)
+                entry = self.requests.get(item[3])
+                if not entry or entry["status"] != QUEUED or entry["deadline"] <= now:
+                    continue  # Answered, claimed or expired: drop lazily
+
+                if batch_kind is None:
+                    batch_kind = entry["kind"] if entry["kind"] in BATCHABLE_KINDS else ""
+                elif batch_kind and entry["kind"] != batch_kind:
+                    deferred.append(item)
+                    continue
+
+                entry["status"] = CLAIMED
+                entry["operator"] = operator_id
+                entry["claimed_at"] = now
+                claimed.append(self._public(entry))
+
+                limit = self.captcha_batch_size if batch_kind else max_items
+                if len(claimed) >= limit:
+                    break
+
+            for item in deferred:
+                heapq.heappush(self._heap, item)
+
+        if claimed:
+            logger.info("hitl_claimed", operator=operator_id, count=len(claimed), kind=claimed[0]["kind"])
+        return claimed
+
+    def claimed_by(self, operator_id: str) -> list[dict[str, Any]]:
+        """
+        Requests currently assigned to an operator.
+
+        Args:
+            operator_id: Operator identifier
+
+        Returns:
+            Claimed requests, most urgent first
+        """
+        with self._lock:
+            entries = [
+                entry for entry in self.requests.values()
+                if entry["status"] == CLAIMED and entry["operator"] == operator_id
+            ]
+        entries.sort(key=lambda entry: (entry["priority"], entry["deadline"]))
+        return [self._public(entry) for entry in entries]
+
+    def answer(self, operator_id: str, request_id: str, response: Any) -> bool:
+        """
+        Deliver an operator's answer to the waiting session.
+
+        Args:
+            operator_id: Operator identifier
+            request_id: Request identifier
+            response: Answer
+
+        Returns:
+            True if the request was still open
+        """
+        with self._lock:
+            entry = self.requests.get(request_id)
+            if not entry or entry["status"] == DONE:
+                return False
+            entry["status"] = DONE
+            self._operator_answers[operator_id] = self._operator_answers.get(operator_id, 0) + 1
+
+        human_input_tool.submit_response(request_id, response)
+        return True
+
+    def release(self, operator_id: str) -> int:
+        """
+        Return an operator's unanswered claims to the queue (e.g. on sign-off).
+
+        Args:
+            operator_id: Operator identifier
+
+        Returns:
+            Number of requests requeued
+        """
+        with self._lock:
+            released = 0
+            for entry in self.requests.values():
+                if entry["status"] == CLAIMED and entry["operator"] == operator_id:
+                    entry["status"] = QUEUED
+                    entry["operator"] = None
+                    heapq.heappush(
+                        self._heap,
+                        (entry["priority"], entry["deadline"], next(self._sequence), entry["request_id"])
+                    )
+                    released += 1
+        logger.info("hitl_released", operator=operator_id, count=released)
+        return released
+
+    def cancel_thread(self, thread_id: str) -> int:
+        """
+        Cancel every pending request of a session (e.g. when it is abandoned).
+
+        Args:
+            thread_id: Graph thread ID
+
+        Returns:
+            Number of requests cancelled
+        """
+        return human_input_tool.cancel_thread(thread_id)
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Queue and SLA statistics for staffing.
+
+        Returns:
+            Dict with queue depth (total and per kind), claimed count,
+            submitted/answered/expired/cancelled counts, p50/p95
+            time-to-answer in seconds and answers per operator
+        """
+        with self._lock:
+            queued = [entry for entry in self.requests.values() if entry["status"] == QUEUED]
+            claimed = sum(1 for entry in self.requests.values() if entry["status"] == CLAIMED)
+            counts = dict(self._counts)
+            operators = dict(self._operator_answers)
+            answer_times = sorted(self._answer_times)
+
+        depth_by_kind: dict[str, int] = {}
+        for entry in queued:
+            depth_by_kind[entry["kind"]] = depth_by_kind.get(entry["kind"], 0) + 1
+
+        return {
+            "queue_depth": len(queued),
+            "queue_depth_by_kind": depth_by_kind,
+            "claimed": claimed,
+            **counts,
+            "time_to_answer_p50": _percentile(answer_times, 0.5),
+            "time_to_answer_p95": _percentile(answer_times, 0.95),
+            "answers_by_operator": operators,
+        }
+
+    @staticmethod
+    def _public(entry: dict[str, Any]) -> dict[str, Any]:
+        """Operator-facing view of a request."""
+        return {
+            key: entry[key]
+            for key in ("request_id", "kind", "prompt", "input_type", "attachment", "deadline")
+        }
+
+
+def _percentile(sorted_values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted values (0.0 if empty)."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return round(sorted_values[index], 3)
+
+
+# Global HITL broker instance (a client of another process's broker when
+# HITL_BACKEND=client)
+if config.HITL_BACKEND == "client":
+    from src.tools.hitl_remote import HITLClient
+    hitl_broker = HITLClient()
+else:
+    hitl_broker = HITLBroker()
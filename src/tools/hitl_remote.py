@@ -0,0 +1,491 @@
+"""Cross-process HITL: serve the local broker over a socket, and a client with the same API."""
+import asyncio
+import base64
+import hmac
+import json
+import os
+import secrets
+import socket
+import sys
+import threading
+from typing import Any, AsyncIterator, Optional
+from src import config
+from src.core.event_bus import current_thread_id
+from src.utils.logging_config import logger
+from src.utils.recorder import recorder
+
+
+# Maximum message size (attachments such as CAPTCHA crops travel inline)
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+
+_hitl_server: Optional["HITLServer"] = None
+
+
+def _use_unix_socket() -> bool:
+    """Unix domain sockets where available, loopback TCP otherwise (Windows)."""
+    return hasattr(socket, "AF_UNIX") and not sys.platform.startswith("win")
+
+
+def _encode(value: Any) -> Any:
+    """Make a value JSON-safe (bytes become base64 objects)."""
+    if isinstance(value, (bytes, bytearray)):
+        return {"__bytes__": base64.b64encode(value).decode("ascii")}
+    if isinstance(value, dict):
+        return {key: _encode(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(item) for item in value]
+    return value
+
+
+def _decode(value: Any) -> Any:
+    """Reverse _encode."""
+    if isinstance(value, dict):
+        if set(value) == {"__bytes__"}:
+            return base64.b64decode(value["__bytes__"])
+        return {key: _decode(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_decode(item) for item in value]
+    return value
+
+
+def _write_token(path: str) -> str:
+    """Generate a new shared secret and write it readable by this user only."""
+    token = secrets.token_hex(32)
+    if os.path.exists(path):
+        os.unlink(path)  # Never reuse a file someone else may have created
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as stream:
+        stream.write(token)
+    return token
+
+
+def _read_token(path: str) -> str:
+    """Read the shared secret written by the server."""
+    with open(path, encoding="utf-8") as stream:
+        return stream.read().strip()
+
+
+def _dumps(message: dict) -> bytes:
+    """Serialize one protocol message (newline-delimited JSON)."""
+    return (json.dumps(_encode(message), default=str) + "\n").encode("utf-8")
+
+
+class HITLServer:
+    """
+    Serves this process's human_input_tool and hitl_broker to other processes.
+
+    Runs its own event loop in a daemon thread. Requests waiting for a human
+    are held open on their connection and answered by push the moment a
+    response is submitted; subscribers get pushed 'pending'/'resolved' events.
+    Closing a connection cancels the requests waiting on it.
+
+    The Unix socket is protected by file permissions. The loopback TCP
+    fallback is reachable by any local user, so there every message must
+    carry the secret the server writes to ``token_path`` (mode 0600).
+    """
+
+    def __init__(
+        self,
+        socket_path: str = config.HITL_SOCKET_PATH,
+        port: int = config.HITL_TCP_PORT,
+        token_path: str = config.HITL_TOKEN_PATH
+    ):
+        """Initialize server."""
+        self.socket_path = socket_path
+        self.port = port
+        self.token_path = token_path
+        self._token: Optional[str] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server = None
+        self._subscribers: set = set()
+        self._ready = threading.Event()
+        self._error: Optional[Exception] = None
+
+    def start(self, timeout: float = 5.0) -> bool:
+        """
+        Start serving in a daemon thread.
+
+        Args:
+            timeout: Seconds to wait for the listener to come up
+
+        Returns:
+            True if the server is listening
+        """
+        thread = threading.Thread(target=self._run, name="hitl-server", daemon=True)
+        thread.start()
+        self._ready.wait(timeout)
+        if self._error or not self._server:
+            logger.error("hitl_server_error", error=str(self._error))
+            return False
+        return True
+
+    def _run(self):
+        """Thread entry point: run the server loop forever."""
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self._listen())
+        except Exception as e:
+            self._error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        self.loop.run_forever()
+
+    async def _listen(self):
+        """Open the listening socket and hook into human_input_tool notifications."""
+        from src.tools.human_input_tool import human_input_tool
+
+        if _use_unix_socket():
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)  # Stale socket from a previous run
+            self._server = await asyncio.start_unix_server(
+                self._handle, path=self.socket_path, limit=MAX_MESSAGE_BYTES
+            )
+            logger.info("hitl_server_started", socket=self.socket_path)
+        else:
+            self._token = _write_token(self.token_path)
+            self._server = await asyncio.start_server(
+                self._handle, host="127.0.0.1", port=self.port, limit=MAX_MESSAGE_BYTES
+            )
+            logger.info("hitl_server_started", host="127.0.0.1", port=self.port)
+
+        human_input_tool.add_listener(self._on_change)
+
+    def stop(self):
+        """Stop serving."""
+        from src.tools.human_input_tool import human_input_tool
+
+        human_input_tool.remove_listener(self._on_change)
+        if self.loop and self._server:
+            self.loop.call_soon_threadsafe(self._server.close)
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        if self._token and os.path.exists(self.token_path):
+            os.unlink(self.token_path)
+        logger.info("hitl_server_stopped")
+
+    def _on_change(self, event: str, request_id: str, details: Optional[dict]):
+        """human_input_tool listener; runs on the waiter's thread."""
+        if self.loop and self._subscribers:
+            message = _dumps({"event": event, "request_id": request_id, "details": details})
+            self.loop.call_soon_threadsafe(self._broadcast, message)
+
+    def _broadcast(self, message: bytes):
+        """Push a message to every subscriber (server loop)."""
+        for writer in list(self._subscribers):
+            if writer.is_closing():
+                self._subscribers.discard(writer)
+                continue
+            writer.write(message)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve one client connection."""
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = _decode(json.loads(line))
+                if not self._authorized(message):
+                    logger.warning("hitl_server_unauthorized", op=message.get("op"))
+                    writer.write(_dumps({"id": message.get("id"), "error": "Unauthorized"}))
+                    await writer.drain()
+                    break
+                if message.get("op") == "subscribe":
+                    self._subscribers.add(writer)
+                    continue
+                task = asyncio.create_task(self._dispatch(message, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (ConnectionError, json.JSONDecodeError) as e:
+            logger.warning("hitl_server_connection_error", error=str(e))
+        finally:
+            # The client went away: stop waiting on its behalf
+            for task in tasks:
+                task.cancel()
+            self._subscribers.discard(writer)
+            writer.close()
+
+    def _authorized(self, message: dict) -> bool:
+        """Whether a message carries the shared secret (TCP only)."""
+        if self._token is None:
+            return True
+        token = message.get("token")
+        return isinstance(token, str) and hmac.compare_digest(token, self._token)
+
+    async def _dispatch(self, message: dict, writer: asyncio.StreamWriter):
+        """Run one operation and write its result back."""
+        from src.tools.human_input_tool import human_input_tool
+        from src.tools.hitl_broker import hitl_broker
+
+        op = message.get("op")
+        args = message.get("args") or {}
+        response = {"id": message.get("id")}
+        try:
+            current_thread_id.set(args.pop("thread_id", None))
+            if op == "request_input":
+                response["result"] = await human_input_tool.request_input(**args, record=False)
+            elif op == "request":
+                response["result"] = await hitl_broker.request(**args, record=False)
+            elif op in _SYNC_TOOL_OPS:
+                response["result"] = getattr(human_input_tool, op)(**args)
+            elif op in _SYNC_BROKER_OPS:
+                response["result"] = getattr(hitl_broker, op)(**args)
+            else:
+                response["error"] = f"Unknown operation: {op}"
+        except Exception as e:
+            response["error"] = str(e)
+
+        if not writer.is_closing():
+            writer.write(_dumps(response))
+            await writer.drain()
+
+
+# Operations answered immediately by forwarding to the local objects
+_SYNC_TOOL_OPS = (
+    "submit_response",
+    "list_pending_requests",
+    "get_pending_request",
+    "cancel_request",
+    "cancel_thread",
+    "get_metrics",
+)
+_SYNC_BROKER_OPS = ("claim", "claimed_by", "answer", "release", "stats")
+
+
+class HITLClient:
+    """
+    Talks to a HITLServer in another process, with the same API as
+    human_input_tool (request_input, submit_response, list_pending_requests,
+    ...) and hitl_broker (request, claim, answer, stats, ...).
+
+    Quick operations use a short blocking connection; waiting requests hold
+    an asyncio connection open and receive their answer by push. Over TCP
+    every message carries the secret from ``token_path``.
+    """
+
+    def __init__(
+        self,
+        socket_path: str = config.HITL_SOCKET_PATH,
+        port: int = config.HITL_TCP_PORT,
+        timeout: float = 5.0,
+        token_path: str = config.HITL_TOKEN_PATH
+    ):
+        """Initialize client."""
+        self.socket_path = socket_path
+        self.port = port
+        self.timeout = timeout
+        self.token_path = token_path
+        self._ids = 0
+
+    def _next_id(self) -> int:
+        """Next message ID."""
+        self._ids += 1
+        return self._ids
+
+    def _message(self, op: str, **fields: Any) -> bytes:
+        """Build a request, adding the shared secret over TCP."""
+        message = {"id": self._next_id(), "op": op, **fields}
+        if not _use_unix_socket():
+            # Re-read every time: the server writes a new secret on each start
+            message["token"] = _read_token(self.token_path)
+        return _dumps(message)
+
+    def _call(self, op: str, **args: Any) -> Any:
+        """Run a quick operation over a blocking connection."""
+        message = self._message(op, args=args)
+        if _use_unix_socket():
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            address: Any = self.socket_path
+        else:
+            conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            address = ("127.0.0.1", self.port)
+
+        with conn:
+            conn.settimeout(self.timeout)
+            conn.connect(address)
+            conn.sendall(message)
+            with conn.makefile("rb") as stream:
+                line = stream.readline(MAX_MESSAGE_BYTES)
+        return self._result(line, op)
+
+    async def _open(self):
+        """Open an asyncio connection to the server."""
+        if _use_unix_socket():
+            return await asyncio.open_unix_connection(self.socket_path, limit=MAX_MESSAGE_BYTES)
+        return await asyncio.open_connection("127.0.0.1", self.port, limit=MAX_MESSAGE_BYTES)
+
+    async def _acall(self, op: str, **args: Any) -> Any:
+        """Run a waiting operation; cancelling the caller cancels it remotely."""
+        reader, writer = await self._open()
+        try:
+            args["thread_id"] = current_thread_id.get()
+            writer.write(self._message(op, args=args))
+            await writer.drain()
+            line = await reader.readline()
+        finally:
+            writer.close()
+        return self._result(line, op)
+
+    @staticmethod
+    def _result(line: bytes, op: str) -> Any:
+        """Unpack a server response."""
+        if not line:
+            raise ConnectionError(f"HITL server closed the connection during {op}")
+        response = _decode(json.loads(line))
+        if response.get("error"):
+            raise RuntimeError(f"HITL server error in {op}: {response['error']}")
+        return response.get("result")
+
+    # human_input_tool API
+
+    async def request_input(
+        self,
+        request_id: str,
+        prompt: str,
+        input_type: str = "text",
+        timeout: int = 300
+    ) -> Optional[Any]:
+        """
+        Request input through the remote server (see HumanInputTool.request_input).
+
+        Record/replay is applied in this process, where the run executes.
+        """
+        if recorder.replaying:
+            return recorder.replay_hitl(input_type)
+
+        response = await self._acall(
+            "request_input", request_id=request_id, prompt=prompt, input_type=input_type, timeout=timeout
+        )
+        if response is not None and recorder.recording:
+            recorder.record_hitl(input_type, response)
+        return response
+
+    def submit_response(self, request_id: str, response: Any):
+        """Submit a response for a pending request."""
+        self._call("submit_response", request_id=request_id, response=response)
+
+    def list_pending_requests(self) -> list[str]:
+        """List pending request IDs."""
+        return self._call("list_pending_requests")
+
+    def get_pending_request(self, request_id: str) -> Optional[dict]:
+        """Get details of a pending request."""
+        return self._call("get_pending_request", request_id=request_id)
+
+    def cancel_request(self, request_id: str):
+        """Cancel a pending request."""
+        self._call("cancel_request", request_id=request_id)
+
+    def cancel_thread(self, thread_id: str) -> int:
+        """Cancel every pending request of a session."""
+        return self._call("cancel_thread", thread_id=thread_id)
+
+    def get_metrics(self) -> dict[str, Any]:
+        """Get HITL wait statistics."""
+        return self._call("get_metrics")
+
+    # hitl_broker API
+
+    async def request(
+        self,
+        kind: str,
+        prompt: str,
+        input_type: str = "text",
+        timeout: int = 300,
+        priority: Optional[int] = None,
+        attachment: Optional[Any] = None
+    ) -> Optional[Any]:
+        """
+        Queue a request with the remote broker (see HITLBroker.request).
+
+        Record/replay is applied in this process, where the run executes.
+        """
+        if recorder.replaying:
+            return recorder.replay_hitl(input_type)
+
+        response = await self._acall(
+            "request",
+            kind=kind,
+            prompt=prompt,
+            input_type=input_type,
+            timeout=timeout,
+            priority=priority,
+            attachment=attachment
+        )
+        if response is not None and recorder.recording:
+            recorder.record_hitl(input_type, response)
+        return response
+
+    def claim(self, operator_id: str, max_items: int = 1) -> list[dict[str, Any]]:
+        """Claim the most urgent queued work."""
+        return self._call("claim", operator_id=operator_id, max_items=max_items)
+
+    def claimed_by(self, operator_id: str) -> list[dict[str, Any]]:
+        """Requests currently assigned to an operator."""
+        return self._call("claimed_by", operator_id=operator_id)
+
+    def answer(self, operator_id: str, request_id: str, response: Any) -> bool:
+        """Deliver an operator's answer."""
+        return self._call("answer", operator_id=operator_id, request_id=request_id, response=response)
+
+    def release(self, operator_id: str) -> int:
+        """Return an operator's unanswered claims to the queue."""
+        return self._call("release", operator_id=operator_id)
+
+    def stats(self) -> dict[str, Any]:
+        """Queue and SLA statistics."""
+        return self._call("stats")
+
+    async def subscribe(self) -> AsyncIterator[dict[str, Any]]:
+        """
+        Receive pushed request changes as they happen.
+
+        Yields:
+            Dicts with event ('pending' or 'resolved'), request_id and details
+        """
+        reader, writer = await self._open()
+        try:
+            writer.write(self._message("subscribe"))
+            await writer.drain()
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                yield _decode(json.loads(line))
+        finally:
+            writer.close()
+
+
+def start_hitl_server() -> bool:
+    """
+    Serve this process's HITL requests to other processes (idempotent).
+
+    Returns:
+        True if the server is running
+    """
+    global _hitl_server
+
+    if _hitl_server is not None:
+        return True
+
+    server = HITLServer()
+    if not server.start():
+        return False
+    _hitl_server = server
+    return True
+
+
+if __name__ == "__main__":
+    # Standalone host: python -m src.tools.hitl_remote
+    import time
+
+    if not start_hitl_server():
+        sys.exit(1)
+    print("HITL server running; press Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        _hitl_server.stop()
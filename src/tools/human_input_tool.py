@@ -1,25 +1,44 @@
 """Human-in-the-loop input tool for CAPTCHA and payment confirmation."""
 import asyncio
+import threading
+import time
 from typing import Optional, Any
 from src.utils.logging_config import logger
+from src.core.event_bus import event_bus, current_thread_id, HITL_REQUIRED
+from src.utils.metrics import metrics
+from src.utils.recorder import recorder
 
 
 class HumanInputTool:
     """
     Manages human-in-the-loop interactions via Streamlit.
+    
+    Each waiting request holds an asyncio future, so a response submitted
+    from any thread wakes its waiter immediately and idle sessions cost
+    nothing while they wait.
     """
     
     def __init__(self):
         """Initialize human input tool."""
-        self.pending_requests = {}
-        self.responses = {}
+        self.pending_requests = {}  # request_id -> request details and future
+        self.responses = {}  # Responses submitted before their request was registered
+        self._lock = threading.Lock()
+        self._stats = {
+            "answered": 0,
+            "timeouts": 0,
+            "cancelled": 0,
+            "total_wait": 0.0,
+            "max_wait": 0.0,
+        }
+        self._listeners = []  # Callbacks notified of pending/resolved requests
     
     async def request_input(
         self,
         request_id: str,
         prompt: str,
         input_type: str = "text",
-        timeout: int = 300
+        timeout: int = 300,
+        record: bool = True
     ) -> Optional[Any]:
         """
         Request input from human user.
@@ -29,9 +48,11 @@ class HumanInputTool:
             prompt: Prompt to display to user
             input_type: Type of input ('text', 'confirmation', 'file')
             timeout: Timeout in seconds
-            
+            record: Apply record/replay here (False when the caller's own
+                process already does, e.g. requests served for a remote client)
+        
         Returns:
-            User's response or None if timeout
+            User's response, or None on timeout or cancellation
         """
         logger.info(
             "human_input_requested",
@@ -40,48 +61,125 @@ class HumanInputTool:
             type=input_type
         )
         
-        # Store pending request
-        self.pending_requests[request_id] = {
-            "prompt": prompt,
-            "type": input_type,
-            "timestamp": asyncio.get_event_loop().time()
-        }
+        # Replay mode answers from the recorded session without waiting
+        if record and recorder.replaying:
+            return recorder.replay_hitl(input_type)
+        
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        started = time.monotonic()
         
-        # Wait for response with timeout
-        start_time = asyncio.get_event_loop().time()
-        while True:
-            # Check if response received
+        with self._lock:
             if request_id in self.responses:
-                response = self.responses.pop(request_id)
-                self.pending_requests.pop(request_id, None)
-                
-                logger.info(
-                    "human_input_received",
-                    request_id=request_id,
-                    response_length=len(str(response))
-                )
-                
-                return response
-            
-            # Check timeout
-            elapsed = asyncio.get_event_loop().time() - start_time
-            if elapsed > timeout:
+                future.set_result(self.responses.pop(request_id))
+            self.pending_requests[request_id] = {
+                "prompt": prompt,
+                "type": input_type,
+                "thread_id": current_thread_id.get(),
+                "timestamp": started,
+                "future": future,
+                "loop": loop,
+            }
+        event_bus.publish(HITL_REQUIRED, request_id=request_id, prompt=prompt, input_type=input_type)
+        self._notify("pending", request_id)
+        
+        outcome = "answered"
+        response = None
+        try:
+            response = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            outcome = "timeout"
+            logger.warning("human_input_timeout", request_id=request_id)
+        except asyncio.CancelledError:
+            # Either cancel_request() resolved this request, or the waiting
+            # task itself was cancelled; only the latter propagates
+            outcome = "cancelled"
+            logger.info("human_input_cancelled", request_id=request_id)
+            if not future.cancelled():
+                raise
+            current = asyncio.current_task()
+            if current is not None and current.cancelling():
+                raise
+        finally:
+            with self._lock:
                 self.pending_requests.pop(request_id, None)
-                logger.warning("human_input_timeout", request_id=request_id)
-                return None
-            
-            # Sleep briefly before checking again
-            await asyncio.sleep(0.5)
+            self._record_wait(outcome, time.monotonic() - started)
+            self._notify("resolved", request_id)
+        
+        if outcome != "answered":
+            return None
+        
+        logger.info(
+            "human_input_received",
+            request_id=request_id,
+            response_length=len(str(response))
+        )
+        
+        if record and recorder.recording:
+            recorder.record_hitl(input_type, response)
+        
+        return response
+    
+    def add_listener(self, callback):
+        """
+        Register a callback for request changes (called from the waiter's thread).
+        
+        Args:
+            callback: Callable taking (event, request_id, details), where event
+                is 'pending' or 'resolved' and details is None once resolved
+        """
+        self._listeners.append(callback)
+    
+    def remove_listener(self, callback):
+        """
+        Unregister a request change callback.
+        
+        Args:
+            callback: Previously registered callback
+        """
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+    
+    def _notify(self, event: str, request_id: str):
+        """Tell listeners a request became pending or was resolved."""
+        details = self.get_pending_request(request_id) if event == "pending" else None
+        for callback in list(self._listeners):
+            try:
+                callback(event, request_id, details)
+            except Exception as e:
+                logger.warning("human_input_listener_failed", error=str(e))
+    
+    def _record_wait(self, outcome: str, waited: float):
+        """Account for a finished request."""
+        key = {"answered": "answered", "timeout": "timeouts", "cancelled": "cancelled"}[outcome]
+        with self._lock:
+            self._stats[key] += 1
+            self._stats["total_wait"] += waited
+            self._stats["max_wait"] = max(self._stats["max_wait"], waited)
+        
+        metrics.observe(
+            "mponline_hitl_wait_seconds",
+            waited,
+            help_text="Time sessions waited for human input",
+            outcome=outcome
+        )
     
     def submit_response(self, request_id: str, response: Any):
         """
-        Submit response for a pending request.
+        Submit response for a pending request (safe to call from any thread).
         
         Args:
             request_id: Request identifier
             response: User's response
         """
-        self.responses[request_id] = response
+        with self._lock:
+            request = self.pending_requests.get(request_id)
+            if request is None:
+                # Request not registered yet; hand it over when it is
+                self.responses[request_id] = response
+        
+        if request is not None:
+            request["loop"].call_soon_threadsafe(_resolve, request["future"], response)
         logger.info("human_response_submitted", request_id=request_id)
     
     def get_pending_request(self, request_id: str) -> Optional[dict]:
@@ -90,11 +188,14 @@ class HumanInputTool:
         
         Args:
             request_id: Request identifier
-            
+        
         Returns:
-            Request details or None
+            Request details (prompt, type, thread_id, timestamp) or None
         """
-        return self.pending_requests.get(request_id)
+        request = self.pending_requests.get(request_id)
+        if request is None:
+            return None
+        return {key: request[key] for key in ("prompt", "type", "thread_id", "timestamp")}
     
     def list_pending_requests(self) -> list[str]:
         """
@@ -107,14 +208,67 @@ class HumanInputTool:
     
     def cancel_request(self, request_id: str):
         """
-        Cancel a pending request.
+        Cancel a pending request; its waiter returns None immediately.
         
         Args:
             request_id: Request identifier
         """
-        self.pending_requests.pop(request_id, None)
-        self.responses.pop(request_id, None)
+        with self._lock:
+            request = self.pending_requests.get(request_id)
+            self.responses.pop(request_id, None)
+        
+        if request is not None:
+            request["loop"].call_soon_threadsafe(request["future"].cancel)
         logger.info("human_request_cancelled", request_id=request_id)
+    
+    def cancel_thread(self, thread_id: str) -> int:
+        """
+        Cancel every pending request of a session (e.g. when it is abandoned).
+        
+        Args:
+            thread_id: Graph thread ID
+        
+        Returns:
+            Number of requests cancelled
+        """
+        request_ids = [
+            request_id for request_id, request in list(self.pending_requests.items())
+            if request["thread_id"] == thread_id
+        ]
+        for request_id in request_ids:
+            self.cancel_request(request_id)
+        return len(request_ids)
+    
+    def get_metrics(self) -> dict[str, Any]:
+        """
+        Get HITL wait statistics.
+        
+        Returns:
+            Dict with pending count, oldest pending wait, answered/timeout/
+            cancelled counts and average/max wait in seconds
+        """
+        now = time.monotonic()
+        with self._lock:
+            oldest = min((request["timestamp"] for request in self.pending_requests.values()), default=None)
+            stats = dict(self._stats)
+            pending = len(self.pending_requests)
+        
+        finished = stats["answered"] + stats["timeouts"] + stats["cancelled"]
+        return {
+            "pending": pending,
+            "oldest_pending_wait": round(now - oldest, 3) if oldest is not None else 0.0,
+            "answered": stats["answered"],
+            "timeouts": stats["timeouts"],
+            "cancelled": stats["cancelled"],
+            "avg_wait": round(stats["total_wait"] / finished, 3) if finished else 0.0,
+            "max_wait": round(stats["max_wait"], 3),
+        }
+
+
+def _resolve(future: asyncio.Future, response: Any):
+    """Set a waiter's result unless it already finished (runs on the waiter's loop)."""
+    if not future.done():
+        future.set_result(response)
 
 
 # Global human input tool instance
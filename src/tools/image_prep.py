@@ -0,0 +1,182 @@
+"""Screenshot preparation for vision calls: crop, downscale and re-encode."""
+import asyncio
+import base64
+import io
+import math
+import os
+import time
+from typing import Optional, TypedDict
+from PIL import Image
+from src import config
+
+
+MEDIA_TYPES = {
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+}
+
+
+class PreparedImage(TypedDict):
+    """Encoded image payload plus before/after size accounting."""
+
+    data: str  # Base64 payload
+    media_type: str
+    original_bytes: int
+    prepared_bytes: int
+    original_size: tuple[int, int]
+    prepared_size: tuple[int, int]
+    original_tokens: int  # Estimated image tokens before preparation
+    prepared_tokens: int  # Estimated image tokens after preparation
+    latency: float  # Seconds spent preparing
+
+
+def estimate_image_tokens(width: int, height: int, provider: str = "openai") -> int:
+    """
+    Estimate the input tokens a provider charges for an image.
+
+    Args:
+        width: Image width in pixels
+        height: Image height in pixels
+        provider: 'openai' or 'anthropic'
+
+    Returns:
+        Estimated token count
+    """
+    if width <= 0 or height <= 0:
+        return 0
+
+    if provider == "anthropic":
+        # Anthropic downsizes to a 1568px long edge; cost is ~pixels / 750
+        scale = min(1.0, 1568 / max(width, height))
+        return math.ceil(width * scale * height * scale / 750)
+
+    # OpenAI high detail: fit in 2048x2048, shortest side to 768, 512px tiles
+    scale = min(1.0, 2048 / max(width, height))
+    width, height = width * scale, height * scale
+    scale = min(1.0, 768 / min(width, height))
+    width, height = width * scale, height * scale
+    return 85 + 170 * math.ceil(width / 512) * math.ceil(height / 512)
+
+
+def prepare_image(
+    image_path: str,
+    region: Optional[dict] = None,
+    max_width: int = config.VISION_MAX_WIDTH,
+    image_format: str = config.VISION_IMAGE_FORMAT,
+    quality: int = config.VISION_IMAGE_QUALITY,
+    provider: str = "openai"
+) -> PreparedImage:
+    """
+    Crop a screenshot to a region, downscale it and encode it compactly.
+
+    Args:
+        image_path: Full-page screenshot path
+        region: Optional crop box from browser_actions.form_region (CSS pixels)
+        max_width: Target width in pixels (no upscaling)
+        image_format: 'jpeg', 'webp' or 'png'
+        quality: Lossy encoder quality
+        provider: LLM provider, for token estimates
+
+    Returns:
+        Prepared image payload and size accounting
+    """
+    started = time.perf_counter()
+    original_bytes = os.path.getsize(image_path)
+
+    with Image.open(image_path) as image:
+        image.load()
+    original_size = image.size
+
+    if region:
+        ratio = region.get("device_pixel_ratio", 1) or 1
+        box = (
+            max(0, int(region["x"] * ratio)),
+            max(0, int(region["y"] * ratio)),
+            min(image.width, int((region["x"] + region["width"]) * ratio)),
+            min(image.height, int((region["y"] + region["height"]) * ratio)),
+        )
+        if box[2] > box[0] and box[3] > box[1]:
+            image = image.crop(box)
+
+    if max_width and image.width > max_width:
+        height = max(1, round(image.height * max_width / image.width))
+        image = image.resize((max_width, height), Image.LANCZOS)
+
+    if image_format not in MEDIA_TYPES:
+        image_format = "png"
+    if image_format != "png" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    buffer = io.BytesIO()
+    save_options = {"optimize": True} if image_format == "png" else {"quality": quality}
+    image.save(buffer, format=image_format.upper(), **save_options)
+    payload = buffer.getvalue()
+
+    return {
+        "data": base64.b64encode(payload).decode("utf-8"),
+        "media_type": MEDIA_TYPES[image_format],
+        "original_bytes": original_bytes,
+        "prepared_bytes": len(payload),
+        "original_size": original_size,
+        "prepared_size": image.size,
+        "original_tokens": estimate_image_tokens(*original_size, provider=provider),
+        "prepared_tokens": estimate_image_tokens(*image.size, provider=provider),
+        "latency": time.perf_counter() - started,
+    }
+
+
+async def prepare_image_async(image_path: str, region: Optional[dict] = None, **kwargs) -> PreparedImage:
+    """
+    Run prepare_image in a worker thread so decoding never blocks the event loop.
+
+    Args:
+        image_path: Full-page screenshot path
+        region: Optional crop box
+        **kwargs: Passed to prepare_image
+
+    Returns:
+        Prepared image payload and size accounting
+    """
+    return await asyncio.to_thread(prepare_image, image_path, region, **kwargs)
+
+
+def fit_image_file(
+    image_path: str,
+    max_bytes: int,
+    output_path: str,
+    min_quality: int = 40,
+    min_width: int = 200
+) -> Optional[str]:
+    """
+    Re-encode an image as JPEG until it fits an upload size limit.
+
+    Quality is lowered first, then the image is downscaled, so photos keep
+    as much detail as the limit allows.
+
+    Args:
+        image_path: Source image path
+        max_bytes: Size limit in bytes
+        output_path: Where to write the fitted JPEG
+        min_quality: Lowest JPEG quality to try
+        min_width: Smallest width to downscale to
+
+    Returns:
+        output_path if the image now fits, else None
+    """
+    with Image.open(image_path) as image:
+        image.load()
+    if image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    while True:
+        for quality in range(85, min_quality - 1, -10):
+            buffer = io.BytesIO()
+            image.save(buffer, format="JPEG", quality=quality, optimize=True)
+            if buffer.tell() <= max_bytes:
+                with open(output_path, "wb") as output:
+                    output.write(buffer.getvalue())
+                return output_path
+        if image.width * 0.8 < min_width:
+            return None
+        image = image.resize((int(image.width * 0.8), max(1, int(image.height * 0.8))), Image.LANCZOS)
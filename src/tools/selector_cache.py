@@ -0,0 +1,178 @@
+"""Persistent cache of vision-identified selectors keyed by page structure."""
+import sqlite3
+import threading
+import time
+from src import config
+from src.utils.logging_config import logger
+
+
+class SelectorCache:
+    """
+    SQLite-backed selector cache.
+
+    Entries are keyed by service, normalized URL, DOM structural hash and
+    field name, so they survive restarts and stay valid exactly as long as the
+    page structure does. Confidence decays with age and the least recently
+    used entries are evicted past ``max_entries``.
+    """
+
+    def __init__(
+        self,
+        db_path: str = config.SELECTOR_CACHE_PATH,
+        max_entries: int = config.SELECTOR_CACHE_MAX_ENTRIES,
+        half_life_days: float = config.SELECTOR_CACHE_HALF_LIFE_DAYS,
+        min_confidence: float = 60.0
+    ):
+        """Initialize selector cache."""
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.half_life = half_life_days * 86400
+        self.min_confidence = min_confidence
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS vision_selectors (
+                service TEXT NOT NULL,
+                url TEXT NOT NULL,
+                dom_hash TEXT NOT NULL,
+                field TEXT NOT NULL,
+                selector TEXT NOT NULL,
+                confidence REAL NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (service, url, dom_hash, field)
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_vision_selectors_last_used ON vision_selectors (last_used)"
+        )
+        self._conn.commit()
+
+    def _decayed(self, confidence: float, created_at: float, now: float) -> float:
+        """Apply exponential confidence decay by entry age."""
+        if self.half_life <= 0:
+            return confidence
+        return confidence * 0.5 ** ((now - created_at) / self.half_life)
+
+    def get_many(self, service: str, url: str, dom_hash: str, fields: list[str]) -> dict[str, dict]:
+        """
+        Look up cached selectors for fields on a page.
+
+        Entries whose decayed confidence fell below the threshold are dropped.
+
+        Args:
+            service: Service type
+            url: Normalized page URL
+            dom_hash: Structural hash of the page controls
+            fields: Field names to look up
+
+        Returns:
+            Field name -> {"selector", "confidence"} for usable entries
+        """
+        if not fields:
+            return {}
+
+        now = time.time()
+        placeholders = ",".join("?" for _ in fields)
+        with self._lock:
+            rows = self._conn.execute(
+                f"""SELECT field, selector, confidence, created_at FROM vision_selectors
+                    WHERE service = ? AND url = ? AND dom_hash = ? AND field IN ({placeholders})""",
+                (service, url, dom_hash, *fields)
+            ).fetchall()
+
+        results, stale = {}, []
+        for field, selector, confidence, created_at in rows:
+            effective = self._decayed(confidence, created_at, now)
+            if effective < self.min_confidence:
+                stale.append(field)
+                continue
+            results[field] = {"selector": selector, "confidence": round(effective, 1)}
+
+        if stale:
+            self.invalidate(service, url, dom_hash, stale)
+
+        return results
+
+    def touch(self, service: str, url: str, dom_hash: str, fields: list[str]):
+        """
+        Mark entries as used (for LRU eviction and hit counts).
+
+        Args:
+            service: Service type
+            url: Normalized page URL
+            dom_hash: Structural hash of the page controls
+            fields: Field names that were served from the cache
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                """UPDATE vision_selectors SET last_used = ?, hits = hits + 1
+                   WHERE service = ? AND url = ? AND dom_hash = ? AND field = ?""",
+                [(now, service, url, dom_hash, field) for field in fields]
+            )
+            self._conn.commit()
+
+    def put_many(self, service: str, url: str, dom_hash: str, selectors: dict[str, dict]):
+        """
+        Store newly identified selectors, then evict least recently used entries.
+
+        Args:
+            service: Service type
+            url: Normalized page URL
+            dom_hash: Structural hash of the page controls
+            selectors: Field name -> {"selector", "confidence"}
+        """
+        if not selectors:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                """INSERT OR REPLACE INTO vision_selectors
+                   (service, url, dom_hash, field, selector, confidence, created_at, last_used, hits)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)""",
+                [
+                    (service, url, dom_hash, field, entry["selector"], float(entry["confidence"]), now, now)
+                    for field, entry in selectors.items()
+                ]
+            )
+            self._conn.execute(
+                """DELETE FROM vision_selectors WHERE rowid IN (
+                       SELECT rowid FROM vision_selectors ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                   )""",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+        logger.info("selector_cache_stored", service=service, fields=list(selectors))
+
+    def invalidate(self, service: str, url: str, dom_hash: str, fields: list[str]):
+        """
+        Remove entries that no longer resolve or have decayed.
+
+        Args:
+            service: Service type
+            url: Normalized page URL
+            dom_hash: Structural hash of the page controls
+            fields: Field names to remove
+        """
+        with self._lock:
+            self._conn.executemany(
+                """DELETE FROM vision_selectors
+                   WHERE service = ? AND url = ? AND dom_hash = ? AND field = ?""",
+                [(service, url, dom_hash, field) for field in fields]
+            )
+            self._conn.commit()
+        logger.info("selector_cache_invalidated", service=service, fields=fields)
+
+    def clear(self):
+        """Remove all cached selectors."""
+        with self._lock:
+            self._conn.execute("DELETE FROM vision_selectors")
+            self._conn.commit()
+
+
+# Global selector cache instance
+selector_cache = SelectorCache()
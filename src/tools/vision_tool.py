@@ -1,9 +1,19 @@
 """Vision tool for element identification using multimodal LLMs."""
+import asyncio
 import base64
+import contextlib
+import json
+import time
 from pathlib import Path
 from typing import Optional
 from src import config
 from src.utils.logging_config import logger
+from src.utils.recorder import recorder
+from src.utils.metrics import metrics
+from src.utils.llm_pool import llm_pool
+from src.utils.llm_cache import llm_cache
+from src.tools.selector_cache import selector_cache
+from src.tools.image_prep import PreparedImage, estimate_image_tokens, prepare_image_async
 
 
 class VisionTool:
@@ -14,139 +24,318 @@ class VisionTool:
     def __init__(self):
         """Initialize vision tool with configured LLM."""
         self.llm_config = config.get_llm_config()
-        self.cache = {}  # Cache results to avoid repeated API calls
-        
-        if self.llm_config["provider"] == "openai":
-            from langchain_openai import ChatOpenAI
-            self.llm = ChatOpenAI(
-                model=self.llm_config["model"],
-                api_key=self.llm_config["api_key"],
-                temperature=self.llm_config["temperature"],
+        self.cache = selector_cache  # Persistent, keyed by page structure
+        
+        # Shared client: pooled connections, concurrency and rate limits
+        self.llm = llm_pool.get(
+            self.llm_config["provider"],
+            self.llm_config["model"],
+            self.llm_config["temperature"],
+            source="vision"
+        )
+        
+        # Same prompt and screenshot -> cached answer
+        self.llm = llm_cache.wrap(self.llm, source="vision")
+        
+        # Record or replay vision calls when RECORD_MODE is enabled
+        self.llm = recorder.wrap_llm(self.llm, source="vision")
+        
+        logger.info("vision_tool_initialized", provider=self.llm_config["provider"])
+    
+    async def _prepare_image(self, image_path: str, region: Optional[dict] = None) -> PreparedImage:
+        """
+        Prepare a screenshot for a vision call off the event loop.
+        
+        With VISION_IMAGE_PREP disabled the full PNG is sent as-is, which is
+        the baseline the prepared payload is compared against.
+        
+        Args:
+            image_path: Screenshot path
+            region: Optional crop box from browser_actions.form_region
+            
+        Returns:
+            Prepared image payload and size accounting
+        """
+        provider = self.llm_config["provider"]
+        if config.VISION_IMAGE_PREP:
+            image = await prepare_image_async(image_path, region, provider=provider)
+        else:
+            started = time.perf_counter()
+            raw = await asyncio.to_thread(Path(image_path).read_bytes)
+            from PIL import Image
+            with Image.open(image_path) as original:
+                size = original.size
+            tokens = estimate_image_tokens(*size, provider=provider)
+            image = {
+                "data": base64.b64encode(raw).decode("utf-8"),
+                "media_type": "image/png",
+                "original_bytes": len(raw),
+                "prepared_bytes": len(raw),
+                "original_size": size,
+                "prepared_size": size,
+                "original_tokens": tokens,
+                "prepared_tokens": tokens,
+                "latency": time.perf_counter() - started,
+            }
+        
+        for stage in ("original", "prepared"):
+            metrics.observe(
+                "mponline_vision_payload_bytes",
+                image[f"{stage}_bytes"],
+                help_text="Vision image payload size before and after preparation",
+                stage=stage
             )
-        elif self.llm_config["provider"] == "anthropic":
-            from langchain_anthropic import ChatAnthropic
-            self.llm = ChatAnthropic(
-                model=self.llm_config["model"],
-                api_key=self.llm_config["api_key"],
-                temperature=self.llm_config["temperature"],
+            metrics.observe(
+                "mponline_vision_image_tokens",
+                image[f"{stage}_tokens"],
+                help_text="Estimated vision image tokens before and after preparation",
+                stage=stage
             )
+        logger.info(
+            "vision_image_prepared",
+            original_bytes=image["original_bytes"],
+            prepared_bytes=image["prepared_bytes"],
+            original_size=image["original_size"],
+            prepared_size=image["prepared_size"],
+            original_tokens=image["original_tokens"],
+            prepared_tokens=image["prepared_tokens"],
+            latency=round(image["latency"], 3)
+        )
+        return image
+    
+    def _build_message(self, prompt: str, image: PreparedImage):
+        """Build a provider-specific multimodal message."""
+        from langchain_core.messages import HumanMessage
         
-        logger.info("vision_tool_initialized", provider=self.llm_config["provider"])
+        if self.llm_config["provider"] == "anthropic":
+            return HumanMessage(
+                content=[
+                    {
+                        "type": "image",
+                        "source": {
+                            "type": "base64",
+                            "media_type": image["media_type"],
+                            "data": image["data"],
+                        },
+                    },
+                    {"type": "text", "text": prompt},
+                ]
+            )
+        
+        return HumanMessage(
+            content=[
+                {"type": "text", "text": prompt},
+                {
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:{image['media_type']};base64,{image['data']}"
+                    }
+                }
+            ]
+        )
     
-    def _encode_image(self, image_path: str) -> str:
-        """Encode image to base64."""
-        with open(image_path, "rb") as image_file:
-            return base64.b64encode(image_file.read()).decode('utf-8')
+    @staticmethod
+    def _parse_json(content: str) -> dict:
+        """Parse a JSON response, tolerating markdown code fences."""
+        text = content.strip()
+        if text.startswith("```"):
+            text = text.split("\n", 1)[1] if "\n" in text else ""
+            text = text.rsplit("```", 1)[0]
+        return json.loads(text)
     
-    async def identify_element(
+    async def identify_elements(
         self,
         screenshot_path: str,
-        field_name: str,
-        field_description: Optional[str] = None
+        fields: dict[str, Optional[str]],
+        region: Optional[dict] = None
     ) -> dict:
         """
-        Identify form element selector from screenshot.
+        Identify selectors for several fields from one screenshot in one LLM call.
         
         Args:
             screenshot_path: Path to screenshot image
-            field_name: Name of the field to find (e.g., "email", "full_name")
-            field_description: Optional description to help LLM
+            fields: Field name -> optional description
+            region: Optional crop box from browser_actions.form_region
             
         Returns:
-            Dictionary with selector and confidence score
+            Dict with ``fields`` (field name -> selector, type, confidence,
+            alternatives, notes)
+            and batch stats: ``field_count``, ``latency``, ``input_tokens``,
+            ``output_tokens`` and ``image`` (payload bytes/tokens before and
+            after preparation)
         """
-        # Check cache
-        cache_key = f"{screenshot_path}:{field_name}"
-        if cache_key in self.cache:
-            logger.info("vision_tool_cache_hit", field=field_name)
-            return self.cache[cache_key]
+        started = time.perf_counter()
+        batch = {
+            "fields": {name: _empty_result("Not identified") for name in fields},
+            "field_count": len(fields),
+            "latency": 0.0,
+            "input_tokens": 0,
+            "output_tokens": 0,
+            "image": {},
+        }
         
-        try:
-            # Encode image
-            image_base64 = self._encode_image(screenshot_path)
-            
-            # Create prompt
-            prompt = f"""You are a web automation expert. Analyze this screenshot of a form and identify the CSS selector or XPath for the following field:
+        if not fields:
+            return batch
+        
+        field_lines = "\n".join(
+            f"- {name}" + (f": {description}" if description else "")
+            for name, description in fields.items()
+        )
+        prompt = f"""You are a web automation expert. Analyze this screenshot of a form and identify the CSS selector or XPath for each of the following fields:
 
-Field Name: {field_name}
-{f'Description: {field_description}' if field_description else ''}
+{field_lines}
 
-Please provide:
-1. The most reliable CSS selector or XPath for this field
-2. A confidence score (0-100)
-3. Any alternatives if the primary selector might fail
+For every field provide the most reliable CSS selector or XPath, a confidence score (0-100) and alternatives if the primary selector might fail.
 
-Respond in JSON format:
+Respond in JSON format, with one entry per field name listed above:
 {{
-    "selector": "css_selector_or_xpath",
-    "type": "css|xpath",
-    "confidence": 85,
-    "alternatives": ["alternative1", "alternative2"],
-    "notes": "any relevant observations"
+    "fields": {{
+        "field_name": {{
+            "selector": "css_selector_or_xpath",
+            "type": "css|xpath",
+            "confidence": 85,
+            "alternatives": ["alternative1", "alternative2"],
+            "notes": "any relevant observations"
+        }}
+    }}
 }}"""
-
-            # Call LLM with vision
-            if self.llm_config["provider"] == "openai":
-                from langchain_core.messages import HumanMessage
-                
-                message = HumanMessage(
-                    content=[
-                        {"type": "text", "text": prompt},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{image_base64}"
-                            }
-                        }
-                    ]
-                )
-                
-                response = await self.llm.ainvoke([message])
-                
-            elif self.llm_config["provider"] == "anthropic":
-                from langchain_core.messages import HumanMessage
-                
-                message = HumanMessage(
-                    content=[
-                        {
-                            "type": "image",
-                            "source": {
-                                "type": "base64",
-                                "media_type": "image/png",
-                                "data": image_base64,
-                            },
-                        },
-                        {"type": "text", "text": prompt},
-                    ]
-                )
-                
-                response = await self.llm.ainvoke([message])
-            
-            # Parse response
-            import json
-            result = json.loads(response.content)
-            
-            # Cache result
-            self.cache[cache_key] = result
+        
+        try:
+            image = await self._prepare_image(screenshot_path, region)
+            batch["image"] = {key: value for key, value in image.items() if key != "data"}
+            response = await self.llm.ainvoke([self._build_message(prompt, image)])
             
-            logger.info(
-                "vision_tool_success",
-                field=field_name,
-                selector=result.get("selector"),
-                confidence=result.get("confidence")
-            )
+            parsed = self._parse_json(response.content).get("fields", {})
+            for name in fields:
+                if isinstance(parsed.get(name), dict):
+                    batch["fields"][name] = {**_empty_result(""), **parsed[name]}
             
-            return result
+            usage = getattr(response, "usage_metadata", None) or {}
+            batch["input_tokens"] = usage.get("input_tokens", 0)
+            batch["output_tokens"] = usage.get("output_tokens", 0)
             
         except Exception as e:
-            logger.error("vision_tool_error", field=field_name, error=str(e))
-            return {
-                "selector": None,
-                "type": "css",
-                "confidence": 0,
-                "alternatives": [],
-                "notes": f"Error: {str(e)}"
-            }
+            logger.error("vision_batch_error", fields=len(fields), error=str(e))
+            for name in fields:
+                batch["fields"][name] = _empty_result(f"Error: {str(e)}")
+        
+        batch["latency"] = time.perf_counter() - started
+        identified = sum(1 for result in batch["fields"].values() if result.get("selector"))
+        
+        metrics.observe(
+            "mponline_vision_batch_latency_seconds",
+            batch["latency"],
+            help_text="Latency of one multi-field vision call",
+            prepared=str(config.VISION_IMAGE_PREP).lower()
+        )
+        metrics.inc(
+            "mponline_vision_tokens_total",
+            amount=batch["input_tokens"] + batch["output_tokens"],
+            help_text="Tokens spent on vision calls"
+        )
+        logger.info(
+            "vision_batch_completed",
+            fields=len(fields),
+            identified=identified,
+            latency=round(batch["latency"], 3),
+            input_tokens=batch["input_tokens"],
+            output_tokens=batch["output_tokens"]
+        )
+        
+        return batch
+    
+    async def locate_fields(
+        self,
+        page,
+        service_type: str,
+        fields: dict[str, Optional[str]],
+        screenshot_path: str
+    ) -> dict:
+        """
+        Resolve selectors for fields, consulting the persistent cache first.
+        
+        Cached selectors are keyed by service, normalized URL and the page's
+        structural hash, and are re-validated against the live DOM in one
+        probe before use. Only fields without a working cached selector are
+        sent to the LLM; the screenshot is taken only in that case.
+        
+        Args:
+            page: Playwright page
+            service_type: Service type
+            fields: Field name -> optional description
+            screenshot_path: Where to save the screenshot if vision is needed
+            
+        Returns:
+            Dict like identify_elements, plus ``cache_hits`` and ``vision_called``
+        """
+        from src.automation import browser_actions
+        
+        fingerprint = await browser_actions.page_fingerprint(page)
+        key = (service_type, fingerprint["url"], fingerprint["controls_hash"]) if fingerprint else None
+        
+        resolved = {}
+        stale = []
+        if key:
+            cached = self.cache.get_many(*key, list(fields))
+            probe = await browser_actions.probe_selectors(
+                page, {name: entry["selector"] for name, entry in cached.items()}
+            )
+            for name, entry in cached.items():
+                if (probe.get(name) or {}).get("present"):
+                    resolved[name] = {**_empty_result("Selector cache hit"), **entry}
+                else:
+                    stale.append(name)
+            if resolved:
+                self.cache.touch(*key, list(resolved))
+            if stale:
+                self.cache.invalidate(*key, stale)
+        
+        metrics.inc(
+            "mponline_selector_cache_lookups_total",
+            amount=len(resolved),
+            help_text="Vision selector cache lookups",
+            outcome="hit"
+        )
+        metrics.inc(
+            "mponline_selector_cache_lookups_total",
+            amount=len(fields) - len(resolved),
+            help_text="Vision selector cache lookups",
+            outcome="miss"
+        )
+        
+        remaining = {name: description for name, description in fields.items() if name not in resolved}
+        if remaining:
+            await browser_actions.take_screenshot(page, screenshot_path)
+            region = await browser_actions.form_region(
+                page, [name.replace("_", " ") for name in remaining]
+            ) if config.VISION_IMAGE_PREP else None
+            # A cached answer produced the selectors that just went stale; ask again
+            with llm_cache.bypass() if stale else contextlib.nullcontext():
+                batch = await self.identify_elements(screenshot_path, remaining, region)
+        else:
+            batch = await self.identify_elements(screenshot_path, {})
+        
+        if key:
+            self.cache.put_many(*key, {
+                name: {"selector": result["selector"], "confidence": result["confidence"]}
+                for name, result in batch["fields"].items()
+                if result.get("selector") and float(result.get("confidence") or 0) > self.cache.min_confidence
+            })
+        
+        logger.info(
+            "vision_fields_located",
+            service=service_type,
+            cache_hits=len(resolved),
+            vision_fields=len(remaining)
+        )
+        
+        return {
+            **batch,
+            "fields": {**resolved, **batch["fields"]},
+            "field_count": len(fields),
+            "cache_hits": len(resolved),
+            "vision_called": bool(remaining),
+        }
     
     def clear_cache(self):
         """Clear the selector cache."""
@@ -154,5 +343,16 @@ Respond in JSON format:
         logger.info("vision_tool_cache_cleared")
 
 
+def _empty_result(notes: str) -> dict:
+    """Result returned when a field could not be identified."""
+    return {
+        "selector": None,
+        "type": "css",
+        "confidence": 0,
+        "alternatives": [],
+        "notes": notes
+    }
+
+
 # Global vision tool instance
 vision_tool = VisionTool()
@@ -1,34 +1,35 @@
 """Helper utilities for browser-use integration."""
-from typing import Dict, Any
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
+from typing import Dict, Any, Optional
 from src import config
 from src.utils.logging_config import logger
+from src.utils.recorder import recorder
+from src.utils.llm_usage import llm_usage
+from src.utils.llm_pool import llm_pool
+from src.utils.llm_cache import llm_cache
+from src.services.service_registry import SERVICE_REGISTRY
 
 
-def get_configured_llm():
+def get_configured_llm(source: str = "browser_use"):
     """
     Get configured LLM instance for browser-use.
     
+    Args:
+        source: Caller name for recording and usage accounting
+    
     Returns:
-        Configured LLM (ChatOpenAI or ChatAnthropic)
+        Shared ChatOpenAI or ChatAnthropic client from the LLM pool
     """
     if config.LLM_PROVIDER == "openai":
-        logger.info("browser_use_llm", provider="openai", model="gpt-4o")
-        return ChatOpenAI(
-            model="gpt-4o",
-            api_key=config.OPENAI_API_KEY,
-            temperature=0.1
-        )
+        model = "gpt-4o"
     elif config.LLM_PROVIDER == "anthropic":
-        logger.info("browser_use_llm", provider="anthropic", model="claude-3-5-sonnet-20241022")
-        return ChatAnthropic(
-            model="claude-3-5-sonnet-20241022",
-            api_key=config.ANTHROPIC_API_KEY,
-            temperature=0.1
-        )
+        model = "claude-3-5-sonnet-20241022"
     else:
         raise ValueError(f"Unsupported LLM provider: {config.LLM_PROVIDER}")
+    
+    logger.info("browser_use_llm", provider=config.LLM_PROVIDER, model=model)
+    # Temperature 0 keeps task prompts deterministic, so repeats hit the cache
+    llm = llm_pool.get(config.LLM_PROVIDER, model, 0.0, source=source)
+    return recorder.wrap_llm(llm_cache.wrap(llm, source=source), source=source)
 
 
 def format_user_data_for_ai(user_data: Dict[str, Any], service_type: str) -> str:
@@ -127,19 +128,28 @@ def create_google_search_task(service_type: str) -> str:
     return task.strip()
 
 
-def create_form_filling_task(user_data: Dict[str, Any], service_type: str) -> str:
+def create_form_filling_task(user_data: Dict[str, Any], service_type: str, start_url: Optional[str] = None) -> str:
     """
     Create a complete task for finding and filling the form.
     
     Args:
         user_data: User-provided data
         service_type: Type of service
+        start_url: Page the browser is already on (skips the Google search)
         
     Returns:
         Complete task description
     """
-    # Combine search and form filling
-    search_task = create_google_search_task(service_type)
+    if start_url:
+        # The shared browser is already on the service page
+        search_task = f"""
+    The browser is already open on the MPOnline {service_type.upper()} page ({start_url}).
+    Do not search the web or open a new tab. If this page is not the application
+    form yet, use the links on it to reach the application or service form.
+    """.strip()
+    else:
+        # Combine search and form filling
+        search_task = create_google_search_task(service_type)
     form_instructions = format_user_data_for_ai(user_data, service_type)
     
     complete_task = f"""
@@ -156,6 +166,104 @@ We will handle CAPTCHA and final submission separately.
     return complete_task.strip()
 
 
+def create_gap_filling_task(
+    user_data: Dict[str, Any],
+    service_type: str,
+    gap_fields: Dict[str, Dict[str, Any]],
+    start_url: Optional[str] = None
+) -> str:
+    """
+    Create a narrowed task for only the fields the template path could not fill.
+    
+    Args:
+        user_data: User-provided data
+        service_type: Type of service
+        gap_fields: Field name -> template field config for the unfilled fields
+        start_url: Page the browser is on (the partly filled form)
+        
+    Returns:
+        Task description
+    """
+    lines = []
+    for field_name, field_config in gap_fields.items():
+        label = field_config.get("description") or field_name.replace("_", " ").title()
+        value = user_data[field_name]
+        if field_config.get("type") == "file":
+            lines.append(f"- {label}: upload the file at {value}")
+        else:
+            lines.append(f"- {label}: {value}")
+    
+    location = f" ({start_url})" if start_url else ""
+    task = f"""
+The browser is already open on a partly filled MPOnline {service_type.upper()} form{location}.
+Do not navigate away, search the web or open a new tab.
+
+Fill ONLY these fields, which are still empty or wrong:
+{chr(10).join(lines)}
+
+Do not change any other field - they are already filled correctly.
+For dropdown menus, select the exact option that matches the value.
+DO NOT submit the form.
+"""
+    return task.strip()
+
+
+def find_gap_fields(state: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    Fields of the current step that have a value but are not filled yet.
+    
+    Args:
+        state: Current agent state
+        
+    Returns:
+        Field name -> template field config
+    """
+    template = SERVICE_REGISTRY.get(state.get("service_type"))
+    if not template:
+        return {}
+    
+    form_progress = state.get("form_progress") or {}
+    user_data = state.get("user_data") or {}
+    return {
+        field_name: field_config
+        for field_name, field_config in template.get_field_mappings(state.get("current_step")).items()
+        if not form_progress.get(field_name) and user_data.get(field_name) is not None
+    }
+
+
+def fill_path_report(state: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Share of filled fields per path, and LLM spend saved against a full AI run
+    (never negative).
+    
+    Args:
+        state: Agent state at the end of a run (or pause)
+        
+    Returns:
+        Report dict; empty if no field was filled
+    """
+    form_progress = state.get("form_progress") or {}
+    paths = [path for field, path in (state.get("field_paths") or {}).items() if form_progress.get(field)]
+    if not paths:
+        return {}
+    
+    template_fields = paths.count("template")
+    ai_fields = paths.count("ai")
+    llm_spend = state.get("llm_spend", 0.0) or 0.0
+    full_ai_cost = estimate_ai_automation_cost(
+        state.get("service_type", "mppsc"), config.LLM_PROVIDER
+    )["estimated_min_cost"]
+    
+    return {
+        "fields_template": template_fields,
+        "fields_ai": ai_fields,
+        "template_share": round(template_fields / len(paths), 3),
+        "ai_share": round(ai_fields / len(paths), 3),
+        # Clamped: retries and escalations can cost more than a full AI run
+        "llm_spend_saved": round(max(0.0, full_ai_cost - llm_spend), 4) if ai_fields < len(paths) else 0.0,
+    }
+
+
 def extract_browser_use_result(result: Any) -> Dict[str, Any]:
     """
     Extract useful information from browser-use agent result.
@@ -198,10 +306,72 @@ def extract_browser_use_result(result: Any) -> Dict[str, Any]:
         }
 
 
+def harvest_selectors(result: Any, user_data: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Recover field selectors from the elements a browser-use agent typed or selected into.
+    
+    An action is attributed to a field when the text it entered equals the
+    field's value in user_data; values shared by several fields are skipped.
+    
+    Args:
+        result: Result from browser-use agent.run()
+        user_data: Values the agent was asked to enter
+        
+    Returns:
+        Field name -> selector (``#id``, ``[name=...]`` or ``xpath=...``)
+    """
+    if not hasattr(result, "model_actions"):
+        return {}
+    
+    values = {}
+    ambiguous = set()
+    for field_name, value in user_data.items():
+        if value is None or not str(value).strip():
+            continue
+        text = str(value).strip()
+        if text in values:
+            ambiguous.add(text)
+        values[text] = field_name
+    for text in ambiguous:
+        # Shared by several fields (e.g. same first and last name): the
+        # element typed into cannot be attributed, so learn nothing from it
+        del values[text]
+    
+    harvested = {}
+    try:
+        for action in result.model_actions():
+            element = action.get("interacted_element")
+            params = next(
+                (value for key, value in action.items() if key != "interacted_element" and isinstance(value, dict)),
+                {}
+            )
+            text = str(params.get("text", "")).strip()
+            field_name = values.get(text)
+            if not element or not field_name:
+                continue
+            
+            attributes = getattr(element, "attributes", None) or {}
+            if attributes.get("id"):
+                harvested[field_name] = f"#{attributes['id']}"
+            elif attributes.get("name"):
+                harvested[field_name] = f"[name=\"{attributes['name']}\"]"
+            elif getattr(element, "x_path", None):
+                harvested[field_name] = f"xpath=/{element.x_path.lstrip('/')}"
+    except Exception as e:
+        logger.warning("browser_use_selector_harvest_failed", error=str(e))
+    
+    logger.info("browser_use_selectors_harvested", fields=list(harvested))
+    return harvested
+
+
 def estimate_ai_automation_cost(service_type: str, llm_provider: str) -> Dict[str, float]:
     """
     Estimate the cost of AI-driven automation.
     
+    Once enough browser-use runs of the service have been measured, the
+    estimate is their median (min) and 90th percentile (max) cost;
+    until then static ranges are used.
+    
     Args:
         service_type: Type of service
         llm_provider: LLM provider (openai/anthropic)
@@ -209,6 +379,19 @@ def estimate_ai_automation_cost(service_type: str, llm_provider: str) -> Dict[st
     Returns:
         Cost estimates
     """
+    measured = llm_usage.service_stats(service_type, source="browser_use")
+    if measured["runs"] >= config.LLM_USAGE_MIN_RUNS:
+        return {
+            "estimated_min_cost": measured["cost_p50"],
+            "estimated_max_cost": measured["cost_p90"],
+            "currency": "USD",
+            "basis": "measured",
+            "runs": measured["runs"],
+            "tokens_p50": measured["tokens_p50"],
+            "latency_p50": measured["latency_p50"],
+            "note": f"Median and 90th percentile of {measured['runs']} measured runs"
+        }
+    
     # Rough estimates based on typical usage
     estimates = {
         "mppsc": {
@@ -228,5 +411,45 @@ def estimate_ai_automation_cost(service_type: str, llm_provider: str) -> Dict[st
         "estimated_min_cost": provider_estimate["min"],
         "estimated_max_cost": provider_estimate["max"],
         "currency": "USD",
+        "basis": "static",
         "note": "Actual cost depends on form complexity and LLM API pricing"
     }
+
+
+def record_agent_usage(result: Any, source: str, model: str, latency: float, mark: tuple) -> float:
+    """
+    Account for a browser-use agent run and return what it cost.
+    
+    Calls already seen by the LangChain usage callback are not counted
+    again; otherwise the run's own usage summary (``Agent(calculate_cost=True)``)
+    is recorded as one entry.
+    
+    Args:
+        result: Result from browser-use agent.run()
+        source: Caller name used for the run's LLM
+        model: Model name, used when the summary does not report one
+        latency: Seconds the run took
+        mark: ``llm_usage.mark(source)`` taken before the run
+        
+    Returns:
+        Measured cost of the run in USD
+    """
+    measured = llm_usage.since(mark)
+    if measured["calls"]:
+        return measured["cost"]
+    
+    usage = getattr(result, "usage", None)
+    if not usage:
+        logger.warning("browser_use_usage_missing", source=source)
+        return 0.0
+    
+    entry = llm_usage.record(
+        source,
+        next(iter(usage.by_model), model) if getattr(usage, "by_model", None) else model,
+        input_tokens=usage.total_prompt_tokens,
+        output_tokens=usage.total_completion_tokens,
+        latency=latency,
+        cost=usage.total_cost or None,  # Priced from tokens if browser-use has no price
+        calls=usage.entry_count or 1
+    )
+    return entry["cost"]
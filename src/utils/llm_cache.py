@@ -0,0 +1,286 @@
+"""Persistent exact-match cache of deterministic LLM responses."""
+import contextlib
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Optional
+from src import config
+from src.utils.logging_config import logger
+from src.utils.metrics import metrics
+
+
+# Set inside llm_cache.bypass(): skip lookups for calls made in this context
+_bypass: ContextVar[bool] = ContextVar("llm_cache_bypass", default=False)
+
+
+def _normalize(value: Any) -> Any:
+    """
+    Reduce a prompt to a stable, JSON-serializable form.
+
+    Whitespace runs are collapsed, message objects become role/content
+    pairs and inline images (data URLs, base64 ``data`` fields) are
+    replaced by their SHA-256 so the key stays small.
+    """
+    if isinstance(value, str):
+        if value.startswith("data:"):
+            return "sha256:" + hashlib.sha256(value.encode()).hexdigest()
+        return " ".join(value.split())
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    if isinstance(value, dict):
+        return {
+            key: "sha256:" + hashlib.sha256(item.encode()).hexdigest()
+            if key == "data" and isinstance(item, str) else _normalize(item)
+            for key, item in sorted(value.items())
+        }
+    if hasattr(value, "content"):
+        role = getattr(value, "type", None) or getattr(value, "role", None)
+        return {"role": role, "content": _normalize(value.content)}
+    if isinstance(value, type) and hasattr(value, "model_json_schema"):
+        return {"schema": _normalize(value.model_json_schema())}
+    if hasattr(value, "model_dump"):
+        return _normalize(value.model_dump(mode="json"))
+    if value is None or isinstance(value, (int, float, bool)):
+        return value
+    return repr(value)
+
+
+def serialize_response(response: Any) -> Optional[str]:
+    """Response -> JSON, or None if the response type is not cacheable."""
+    from langchain_core.messages import BaseMessage, message_to_dict
+
+    if isinstance(response, BaseMessage):
+        data = message_to_dict(response)
+        data["data"].get("response_metadata", {}).pop("headers", None)
+        return json.dumps({"kind": "message", "message": data})
+
+    completion = getattr(response, "completion", None)
+    if completion is not None and hasattr(response, "usage"):
+        # browser_use ChatInvokeCompletion
+        return json.dumps({
+            "kind": "completion",
+            "completion": completion.model_dump(mode="json") if hasattr(completion, "model_dump") else completion,
+            "thinking": getattr(response, "thinking", None),
+            "stop_reason": getattr(response, "stop_reason", None),
+        })
+    return None
+
+
+def deserialize_response(payload: str, output_format: Any = None) -> Any:
+    """JSON from :func:`serialize_response` -> response object."""
+    data = json.loads(payload)
+    if data["kind"] == "message":
+        from langchain_core.messages import messages_from_dict
+        return messages_from_dict([data["message"]])[0]
+
+    from browser_use.llm.views import ChatInvokeCompletion
+    completion = data["completion"]
+    if output_format is not None:
+        completion = output_format.model_validate(completion)
+    return ChatInvokeCompletion(
+        completion=completion,
+        thinking=data.get("thinking"),
+        usage=None,  # Nothing was spent
+        stop_reason=data.get("stop_reason"),
+    )
+
+
+class CachedLLM:
+    """
+    LLM proxy that answers repeated deterministic prompts from the cache.
+
+    Only models running at temperature 0 are cached. Everything other
+    than ``ainvoke`` is delegated to the wrapped model.
+    """
+
+    def __init__(self, llm: Any, cache: "LLMCache", source: str):
+        """Initialize caching proxy."""
+        self._llm = llm
+        self._cache = cache
+        self._source = source
+
+    async def ainvoke(self, messages: Any, *args, **kwargs):
+        """
+        Return the cached response for this exact prompt, or call the model.
+
+        Args:
+            messages: Prompt messages
+
+        Returns:
+            Model response message
+        """
+        if not self._cache.enabled or getattr(self._llm, "temperature", None) != 0:
+            return await self._llm.ainvoke(messages, *args, **kwargs)
+
+        model = getattr(self._llm, "model_name", None) or getattr(self._llm, "model", "")
+        options = {name: value for name, value in kwargs.items() if name != "config"}
+        key = self._cache.key(model, messages, [*args, options])
+
+        if config.LLM_CACHE_BYPASS or _bypass.get():
+            outcome = "bypass"
+        else:
+            payload = self._cache.get(key)
+            if payload is not None:
+                try:
+                    response = deserialize_response(payload, kwargs.get("output_format"))
+                except Exception as e:
+                    logger.warning("llm_cache_entry_unreadable", source=self._source, error=str(e))
+                else:
+                    metrics.inc("mponline_llm_cache_total", help_text="LLM response cache lookups", source=self._source, outcome="hit")
+                    return response
+            outcome = "miss"
+
+        metrics.inc("mponline_llm_cache_total", help_text="LLM response cache lookups", source=self._source, outcome=outcome)
+        response = await self._llm.ainvoke(messages, *args, **kwargs)
+
+        payload = serialize_response(response)
+        if payload is not None:
+            self._cache.put(key, self._source, model, payload)
+        return response
+
+    def __getattr__(self, name: str) -> Any:
+        """Delegate everything else to the wrapped model."""
+        return getattr(self._llm, name)
+
+
+class LLMCache:
+    """
+    SQLite-backed exact-match response cache.
+
+    Entries are keyed by model plus a hash of the normalized prompt (inline
+    images hashed) and call options. They expire after ``ttl`` seconds and
+    the least recently used are evicted past ``max_entries``.
+    """
+
+    def __init__(
+        self,
+        db_path: str = config.LLM_CACHE_PATH,
+        ttl: float = config.LLM_CACHE_TTL_SECONDS,
+        max_entries: int = config.LLM_CACHE_MAX_ENTRIES
+    ):
+        """Initialize response cache."""
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.enabled = config.LLM_CACHE_ENABLED
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS llm_responses (
+                key TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                model TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_llm_responses_last_used ON llm_responses (last_used)"
+        )
+        self._conn.commit()
+
+    def wrap(self, llm: Any, source: str = "llm") -> CachedLLM:
+        """
+        Wrap an LLM so deterministic calls are served from the cache.
+
+        Args:
+            llm: Chat model (or pooled handle)
+            source: Caller name for metrics
+
+        Returns:
+            Caching proxy
+        """
+        return CachedLLM(llm, self, source)
+
+    @staticmethod
+    def key(model: str, messages: Any, options: Any = None) -> str:
+        """Cache key for a model, prompt and call options."""
+        normalized = json.dumps(
+            {"model": model, "messages": _normalize(messages), "options": _normalize(options)},
+            sort_keys=True
+        )
+        return hashlib.sha256(normalized.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up an unexpired response and mark it used.
+
+        Args:
+            key: Key from :meth:`key`
+
+        Returns:
+            Serialized response, or None
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute(
+                "UPDATE llm_responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key)
+            )
+            self._conn.commit()
+        return row[0]
+
+    def put(self, key: str, source: str, model: str, response: str):
+        """
+        Store a response, then drop expired and least recently used entries.
+
+        Args:
+            key: Key from :meth:`key`
+            source: Caller name
+            model: Model name
+            response: Serialized response
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                """INSERT OR REPLACE INTO llm_responses
+                   (key, source, model, response, created_at, last_used, hits)
+                   VALUES (?, ?, ?, ?, ?, ?, 0)""",
+                (key, source, model, response, now, now)
+            )
+            self._conn.execute("DELETE FROM llm_responses WHERE created_at < ?", (now - self.ttl,))
+            self._conn.execute(
+                """DELETE FROM llm_responses WHERE rowid IN (
+                       SELECT rowid FROM llm_responses ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                   )""",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+        logger.info("llm_cache_stored", source=source, model=model)
+
+    @contextlib.contextmanager
+    def bypass(self):
+        """
+        Skip cache lookups for calls made inside this block (responses are
+        still stored, refreshing the entry).
+        """
+        token = _bypass.set(True)
+        try:
+            yield
+        finally:
+            _bypass.reset(token)
+
+    def clear(self):
+        """Remove all cached responses."""
+        with self._lock:
+            self._conn.execute("DELETE FROM llm_responses")
+            self._conn.commit()
+        logger.info("llm_cache_cleared")
+
+
+# Global LLM response cache instance
+llm_cache = LLMCache()
@@ -0,0 +1,310 @@
+"""Process-wide LLM client registry with concurrency and rate-limit control."""
+import asyncio
+import random
+import threading
+import time
+import weakref
+from datetime import datetime
+from typing import Any, Optional
+from src import config
+from src.utils.llm_usage import LLMUsageCallback
+from src.utils.logging_config import logger
+from src.utils.metrics import metrics
+
+
+# Response headers carrying request rate-limit state, per provider
+RATE_LIMIT_HEADERS = {
+    "openai": {
+        "limit": "x-ratelimit-limit-requests",
+        "remaining": "x-ratelimit-remaining-requests",
+        "reset": "x-ratelimit-reset-requests",
+    },
+    "anthropic": {
+        "limit": "anthropic-ratelimit-requests-limit",
+        "remaining": "anthropic-ratelimit-requests-remaining",
+        "reset": "anthropic-ratelimit-requests-reset",
+    },
+}
+
+
+def _parse_reset(value: Optional[str]) -> Optional[float]:
+    """
+    Seconds until a rate-limit window resets.
+
+    Accepts OpenAI durations (``"1s"``, ``"6m0s"``, ``"250ms"``), plain
+    seconds (``retry-after``) and Anthropic RFC 3339 timestamps.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    if "T" in value:
+        try:
+            reset_at = datetime.fromisoformat(value.replace("Z", "+00:00"))
+            return max(0.0, reset_at.timestamp() - time.time())
+        except ValueError:
+            return None
+
+    seconds, number = 0.0, ""
+    index = 0
+    while index < len(value):
+        char = value[index]
+        if char.isdigit() or char == ".":
+            number += char
+        elif value.startswith("ms", index):
+            seconds += float(number or 0) / 1000
+            number = ""
+            index += 1
+        elif char in "hms":
+            seconds += float(number or 0) * {"h": 3600, "m": 60, "s": 1}[char]
+            number = ""
+        else:
+            return None
+        index += 1
+    return seconds
+
+
+def _error_headers(error: BaseException) -> dict[str, str]:
+    """Response headers of a provider SDK error, if any."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    return {key.lower(): value for key, value in headers.items()} if headers else {}
+
+
+def _is_rate_limited(error: BaseException) -> bool:
+    """Whether an error is a provider rate limit (HTTP 429) or overload (529)."""
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    return status in (429, 529) or type(error).__name__ in ("RateLimitError", "OverloadedError")
+
+
+class TokenBucket:
+    """
+    Request-rate limiter shared by every caller of one provider/model.
+
+    Starts from the configured requests per minute and adapts to the
+    limits the provider reports in response headers. A 429 pauses the
+    whole bucket until the provider's reset time, so queued callers back
+    off together instead of retrying into the limit.
+    """
+
+    def __init__(self, requests_per_minute: float):
+        """Initialize bucket."""
+        self.capacity = max(1.0, requests_per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token if available; otherwise return seconds to wait."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if now < self.paused_until:
+                return self.paused_until - now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+    async def acquire(self) -> float:
+        """
+        Wait for permission to send one request.
+
+        Returns:
+            Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            delay = self._reserve()
+            if delay <= 0:
+                return waited
+            await asyncio.sleep(delay)
+            waited += delay
+
+    def update(self, headers: dict[str, str], provider: str):
+        """
+        Adopt the provider's view of the rate limit.
+
+        Args:
+            headers: Lower-cased response headers
+            provider: 'openai' or 'anthropic'
+        """
+        names = RATE_LIMIT_HEADERS.get(provider, {})
+        with self._lock:
+            limit = headers.get(names.get("limit", ""))
+            if limit:
+                try:
+                    self.capacity = max(1.0, float(limit))
+                    self.rate = self.capacity / 60.0
+                except ValueError:
+                    pass
+            remaining = headers.get(names.get("remaining", ""))
+            if remaining is not None:
+                try:
+                    self.tokens = min(self.tokens, float(remaining))
+                except ValueError:
+                    pass
+            if remaining is not None and self.tokens < 1:
+                reset = _parse_reset(headers.get(names.get("reset", "")))
+                if reset:
+                    self.paused_until = max(self.paused_until, time.monotonic() + reset)
+
+    def pause(self, seconds: float):
+        """
+        Hold every caller back for a while (after a 429).
+
+        Args:
+            seconds: Pause length
+        """
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+
+
+class PooledLLM:
+    """
+    A caller's handle on a shared chat model client.
+
+    ``ainvoke`` waits for a concurrency slot and the rate limiter, attaches
+    the caller's usage callback and retries rate-limited calls with
+    backoff. Everything else is delegated to the shared client.
+    """
+
+    def __init__(self, pool: "LLMPool", key: tuple, llm: Any, source: str):
+        """Initialize handle."""
+        self._pool = pool
+        self._key = key
+        self._llm = llm
+        self._source = source
+
+    async def ainvoke(self, messages: Any, *args, **kwargs):
+        """
+        Invoke the shared model under the pool's limits.
+
+        Args:
+            messages: Prompt messages
+
+        Returns:
+            Model response message
+        """
+        provider = self._key[0]
+        bucket = self._pool.bucket(self._key)
+        run_config = dict(kwargs.pop("config", None) or {})
+        run_config["callbacks"] = list(run_config.get("callbacks") or []) + [LLMUsageCallback(self._source)]
+        labels = {"provider": provider, "model": self._key[1]}
+
+        for attempt in range(config.LLM_MAX_RETRIES + 1):
+            queued = time.perf_counter()
+            async with self._pool.semaphore(self._key):
+                await bucket.acquire()
+                metrics.observe(
+                    "mponline_llm_queue_wait_seconds",
+                    time.perf_counter() - queued,
+                    help_text="Time LLM calls waited for a concurrency slot and rate limit",
+                    **labels
+                )
+                try:
+                    response = await self._llm.ainvoke(messages, *args, config=run_config, **kwargs)
+                except Exception as e:
+                    if not _is_rate_limited(e) or attempt == config.LLM_MAX_RETRIES:
+                        raise
+                    headers = _error_headers(e)
+                    delay = _parse_reset(headers.get("retry-after")) or min(60.0, 2 ** attempt) + random.random()
+                    bucket.pause(delay)
+                    metrics.inc("mponline_llm_rate_limited_total", help_text="LLM calls rejected by provider rate limits", **labels)
+                    logger.warning("llm_rate_limited", source=self._source, attempt=attempt + 1, retry_in=round(delay, 2), **labels)
+                    continue
+
+            headers = (getattr(response, "response_metadata", None) or {}).get("headers")
+            if headers:
+                bucket.update({key.lower(): value for key, value in headers.items()}, provider)
+            return response
+
+    def __getattr__(self, name: str) -> Any:
+        """Delegate everything else to the shared client."""
+        return getattr(self._llm, name)
+
+
+class LLMPool:
+    """
+    One chat model client per provider/model/temperature for the whole
+    process, so HTTP connections are reused across nodes and runs, plus a
+    concurrency semaphore and a token-bucket rate limiter per provider/model.
+
+    The provider SDKs' own retries are disabled; rate-limited calls are
+    retried here so every caller sees the same backoff.
+    """
+
+    def __init__(self):
+        """Initialize pool."""
+        self._clients: dict[tuple, Any] = {}
+        self._buckets: dict[tuple, TokenBucket] = {}
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict]" = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get(self, provider: str, model: str, temperature: float = 0.0, source: str = "llm") -> PooledLLM:
+        """
+        Get a handle on the shared client for a model.
+
+        Args:
+            provider: 'openai' or 'anthropic'
+            model: Model name
+            temperature: Sampling temperature
+            source: Caller name for usage accounting
+
+        Returns:
+            Pooled model handle
+        """
+        key = (provider, model, temperature)
+        with self._lock:
+            llm = self._clients.get(key)
+            if llm is None:
+                llm = self._clients[key] = self._create(provider, model, temperature)
+                logger.info("llm_client_created", provider=provider, model=model, temperature=temperature)
+        return PooledLLM(self, key, llm, source)
+
+    @staticmethod
+    def _create(provider: str, model: str, temperature: float) -> Any:
+        """Build a chat model client."""
+        if provider == "openai":
+            from langchain_openai import ChatOpenAI
+            return ChatOpenAI(
+                model=model,
+                api_key=config.OPENAI_API_KEY,
+                temperature=temperature,
+                max_retries=0,
+                include_response_headers=True,
+            )
+        if provider == "anthropic":
+            from langchain_anthropic import ChatAnthropic
+            return ChatAnthropic(
+                model=model,
+                api_key=config.ANTHROPIC_API_KEY,
+                temperature=temperature,
+                max_retries=0,
+            )
+        raise ValueError(f"Unsupported LLM provider: {provider}")
+
+    def bucket(self, key: tuple) -> TokenBucket:
+        """Rate limiter shared by every temperature of a provider/model."""
+        with self._lock:
+            return self._buckets.setdefault(key[:2], TokenBucket(config.LLM_REQUESTS_PER_MINUTE))
+
+    def semaphore(self, key: tuple) -> asyncio.Semaphore:
+        """Concurrency limiter for a provider/model on the running event loop."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphores = self._semaphores.setdefault(loop, {})
+            if key[:2] not in semaphores:
+                semaphores[key[:2]] = asyncio.Semaphore(config.LLM_MAX_CONCURRENCY)
+            return semaphores[key[:2]]
+
+
+# Global LLM client pool instance
+llm_pool = LLMPool()
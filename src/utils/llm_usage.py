@@ -0,0 +1,423 @@
+"""Measured LLM token, latency and cost accounting per run, node and service."""
+import functools
+import json
+import threading
+import time
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Optional
+from uuid import UUID
+from langchain_core.callbacks import BaseCallbackHandler
+from src import config
+from src.core.event_bus import current_thread_id
+from src.utils.logging_config import logger
+from src.utils.metrics import metrics
+
+
+# USD per million (input, output) tokens; dated model names match by prefix
+MODEL_PRICING = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "claude-3-5-sonnet": (3.00, 15.00),
+    "claude-3-5-haiku": (0.80, 4.00),
+}
+
+# Graph node and service the current task is running for (set by track_node)
+current_node: ContextVar[Optional[str]] = ContextVar("current_node", default=None)
+current_service: ContextVar[Optional[str]] = ContextVar("current_service", default=None)
+
+
+def estimate_cost(model: str, input_tokens: int, output_tokens: int) -> float:
+    """
+    Price a call from its token counts.
+
+    Args:
+        model: Model name as reported by the provider
+        input_tokens: Prompt tokens
+        output_tokens: Completion tokens
+
+    Returns:
+        Cost in USD (0.0 for unknown models)
+    """
+    for prefix, (input_price, output_price) in MODEL_PRICING.items():
+        if model and model.startswith(prefix):
+            return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+    return 0.0
+
+
+def _empty_totals() -> dict[str, float]:
+    """Zeroed usage totals."""
+    return {"calls": 0, "input_tokens": 0, "output_tokens": 0, "cost": 0.0, "latency": 0.0, "retries": 0, "errors": 0}
+
+
+def _add(totals: dict[str, float], entry: dict[str, Any]):
+    """Accumulate one usage entry into totals."""
+    totals["calls"] += entry.get("calls", 1)
+    for key in ("input_tokens", "output_tokens", "cost", "latency", "retries"):
+        totals[key] += entry.get(key, 0)
+    totals["errors"] += 1 if entry.get("error") else 0
+
+
+def _percentile(sorted_values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of sorted values (0.0 if empty)."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+class LLMUsageTracker:
+    """
+    Records every LLM call (or agent run summary) with tokens, latency,
+    retries and cost, attributed to the thread, node and service it ran for.
+
+    Entries are appended to a JSONL file so per-service cost percentiles
+    survive restarts and can replace static estimates.
+    """
+
+    def __init__(self, path: str = config.LLM_USAGE_PATH):
+        """Initialize tracker."""
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._threads: dict[str, dict[str, dict[str, float]]] = {}  # thread_id -> node -> totals
+        self._service_runs: Optional[dict[tuple, dict[str, dict[str, float]]]] = None  # (service, source) -> thread_id -> totals
+        self._sources: dict[tuple, dict[str, float]] = {}  # (thread_id, source) -> totals
+
+    def record(
+        self,
+        source: str,
+        model: str,
+        input_tokens: int = 0,
+        output_tokens: int = 0,
+        latency: float = 0.0,
+        retries: int = 0,
+        error: Optional[str] = None,
+        cost: Optional[float] = None,
+        calls: int = 1,
+        thread_id: Optional[str] = None,
+        node: Optional[str] = None,
+        service_type: Optional[str] = None
+    ) -> dict[str, Any]:
+        """
+        Record LLM usage.
+
+        Args:
+            source: Caller ('vision', 'browser_use', 'agentic', ...)
+            model: Model name
+            input_tokens: Prompt tokens
+            output_tokens: Completion tokens
+            latency: Seconds spent
+            retries: Retries before the final attempt
+            error: Error message if the call failed
+            cost: Cost in USD (priced from MODEL_PRICING when None)
+            calls: Number of LLM calls this entry covers (agent run summaries)
+            thread_id: Graph thread (defaults to the current one)
+            node: Graph node (defaults to the current one)
+            service_type: Service (defaults to the current one)
+
+        Returns:
+            The stored entry
+        """
+        entry = {
+            "timestamp": time.time(),
+            "thread_id": thread_id or current_thread_id.get() or "default",
+            "node": node or current_node.get() or "none",
+            "service_type": service_type or current_service.get() or "unknown",
+            "source": source,
+            "model": model or "unknown",
+            "calls": calls,
+            "input_tokens": int(input_tokens or 0),
+            "output_tokens": int(output_tokens or 0),
+            "cost": estimate_cost(model, input_tokens or 0, output_tokens or 0) if cost is None else float(cost),
+            "latency": round(latency, 4),
+            "retries": retries,
+            "error": error,
+        }
+
+        with self._lock:
+            nodes = self._threads.setdefault(entry["thread_id"], {})
+            _add(nodes.setdefault(entry["node"], _empty_totals()), entry)
+            _add(self._sources.setdefault((entry["thread_id"], source), _empty_totals()), entry)
+            if self._service_runs is not None:
+                self._add_service_run(entry)
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as handle:
+                    handle.write(json.dumps(entry) + "\n")
+            except OSError as e:
+                logger.warning("llm_usage_write_failed", error=str(e))
+
+        labels = {"source": source, "model": entry["model"]}
+        metrics.inc("mponline_llm_tokens_total", amount=entry["input_tokens"], help_text="LLM tokens used", kind="input", **labels)
+        metrics.inc("mponline_llm_tokens_total", amount=entry["output_tokens"], help_text="LLM tokens used", kind="output", **labels)
+        metrics.inc("mponline_llm_cost_usd_total", amount=entry["cost"], help_text="Measured LLM cost in USD", **labels)
+        metrics.observe("mponline_llm_call_latency_seconds", latency, help_text="LLM call latency", **labels)
+        if retries:
+            metrics.inc("mponline_llm_retries_total", amount=retries, help_text="LLM call retries", **labels)
+        if error:
+            metrics.inc("mponline_llm_errors_total", help_text="Failed LLM calls", **labels)
+        return entry
+
+    def run_usage(self, thread_id: str) -> dict[str, Any]:
+        """
+        Usage of one run so far.
+
+        Args:
+            thread_id: Graph thread ID
+
+        Returns:
+            Dict with ``total`` and ``by_node`` totals (calls, tokens, cost,
+            latency, retries, errors)
+        """
+        with self._lock:
+            nodes = {node: dict(totals) for node, totals in self._threads.get(thread_id, {}).items()}
+        total = _empty_totals()
+        for totals in nodes.values():
+            for key in total:
+                total[key] += totals[key]
+        return {"total": total, "by_node": nodes}
+
+    def spend(self, thread_id: Optional[str] = None, node: Optional[str] = None) -> float:
+        """
+        Measured spend of a run, optionally for one node.
+
+        Args:
+            thread_id: Graph thread ID (defaults to the current one)
+            node: Graph node, or None for the whole run
+
+        Returns:
+            Cost in USD
+        """
+        thread_id = thread_id or current_thread_id.get() or "default"
+        with self._lock:
+            nodes = self._threads.get(thread_id, {})
+            if node is not None:
+                return nodes.get(node, {}).get("cost", 0.0)
+            return sum(totals["cost"] for totals in nodes.values())
+
+    def mark(self, source: str, thread_id: Optional[str] = None) -> tuple:
+        """
+        Remember a source's usage so far, to measure what a block of work adds.
+
+        Args:
+            source: Caller name
+            thread_id: Graph thread ID (defaults to the current one)
+
+        Returns:
+            Opaque mark for :meth:`since`
+        """
+        thread_id = thread_id or current_thread_id.get() or "default"
+        with self._lock:
+            totals = dict(self._sources.get((thread_id, source), _empty_totals()))
+        return thread_id, source, totals
+
+    def since(self, mark: tuple) -> dict[str, float]:
+        """
+        Usage a source added since a mark.
+
+        Args:
+            mark: Result of :meth:`mark`
+
+        Returns:
+            Totals (calls, tokens, cost, ...) added since the mark
+        """
+        thread_id, source, before = mark
+        with self._lock:
+            now = self._sources.get((thread_id, source), _empty_totals())
+            return {key: now[key] - before[key] for key in before}
+
+    def run_report(self, thread_id: str) -> dict[str, Any]:
+        """
+        Compact usage summary for run-completed events.
+
+        Args:
+            thread_id: Graph thread ID
+
+        Returns:
+            Dict with llm_calls, llm_tokens and llm_cost
+        """
+        total = self.run_usage(thread_id)["total"]
+        return {
+            "llm_calls": int(total["calls"]),
+            "llm_tokens": int(total["input_tokens"] + total["output_tokens"]),
+            "llm_cost": round(total["cost"], 4),
+        }
+
+    def service_stats(self, service_type: str, source: Optional[str] = None) -> dict[str, Any]:
+        """
+        Per-run cost, token and latency percentiles for a service.
+
+        Args:
+            service_type: Service type
+            source: Restrict to one caller (e.g. 'browser_use'), or None for all
+
+        Returns:
+            Dict with runs and p50/p90/max of cost, tokens, calls and latency per run
+        """
+        with self._lock:
+            if self._service_runs is None:
+                self._load()
+            runs: dict[str, dict[str, float]] = {}
+            for (service, run_source), threads in self._service_runs.items():
+                if service != service_type or (source is not None and run_source != source):
+                    continue
+                for thread_id, totals in threads.items():
+                    merged = runs.setdefault(thread_id, _empty_totals())
+                    for key in merged:
+                        merged[key] += totals[key]
+
+        stats: dict[str, Any] = {"runs": len(runs)}
+        columns = {
+            "cost": [totals["cost"] for totals in runs.values()],
+            "tokens": [totals["input_tokens"] + totals["output_tokens"] for totals in runs.values()],
+            "calls": [totals["calls"] for totals in runs.values()],
+            "latency": [totals["latency"] for totals in runs.values()],
+        }
+        for name, values in columns.items():
+            values.sort()
+            stats[f"{name}_p50"] = round(_percentile(values, 0.5), 4)
+            stats[f"{name}_p90"] = round(_percentile(values, 0.9), 4)
+            stats[f"{name}_max"] = round(values[-1], 4) if values else 0.0
+        return stats
+
+    def _load(self):
+        """Index the usage log by service, source and run (caller holds the lock)."""
+        self._service_runs = {}
+        if not self.path.exists():
+            return
+        with open(self.path, encoding="utf-8") as handle:
+            for line in handle:
+                try:
+                    self._add_service_run(json.loads(line))
+                except (json.JSONDecodeError, KeyError):
+                    continue
+
+    def _add_service_run(self, entry: dict[str, Any]):
+        """Add an entry to the per-service run index (caller holds the lock)."""
+        threads = self._service_runs.setdefault((entry["service_type"], entry["source"]), {})
+        _add(threads.setdefault(entry["thread_id"], _empty_totals()), entry)
+
+
+class LLMUsageCallback(BaseCallbackHandler):
+    """
+    LangChain callback that records each chat model call with the tracker.
+
+    Attach with ``callbacks=[LLMUsageCallback(source)]`` when building a
+    model. Thread, node and service are captured when the call starts.
+    """
+
+    run_inline = True  # Run in the caller's context so context variables are visible
+
+    def __init__(self, source: str, tracker: Optional[LLMUsageTracker] = None):
+        """Initialize callback."""
+        self.source = source
+        self.tracker = tracker or llm_usage
+        self._calls: dict[UUID, dict[str, Any]] = {}
+
+    def on_chat_model_start(self, serialized: dict, messages: list, *, run_id: UUID, **kwargs: Any):
+        """Remember when and for whom a call started."""
+        self._start(serialized, run_id, kwargs)
+
+    def on_llm_start(self, serialized: dict, prompts: list, *, run_id: UUID, **kwargs: Any):
+        """Remember when and for whom a call started (non-chat models)."""
+        self._start(serialized, run_id, kwargs)
+
+    def _start(self, serialized: Optional[dict], run_id: UUID, kwargs: dict):
+        """Capture start time, model and attribution for a call."""
+        invocation = kwargs.get("invocation_params") or {}
+        self._calls[run_id] = {
+            "started": time.perf_counter(),
+            "model": invocation.get("model") or invocation.get("model_name")
+            or ((serialized or {}).get("kwargs") or {}).get("model", ""),
+            "retries": 0,
+            "thread_id": current_thread_id.get(),
+            "node": current_node.get(),
+            "service_type": current_service.get(),
+        }
+
+    def on_retry(self, retry_state: Any, *, run_id: UUID, **kwargs: Any):
+        """Count a retry of a call."""
+        if run_id in self._calls:
+            self._calls[run_id]["retries"] += 1
+
+    def on_llm_end(self, response: Any, *, run_id: UUID, **kwargs: Any):
+        """Record a finished call with its token usage."""
+        call = self._calls.pop(run_id, None)
+        if call is None:
+            return
+        input_tokens, output_tokens, model = _response_usage(response)
+        self._finish(call, model or call["model"], input_tokens, output_tokens)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any):
+        """Record a failed call."""
+        call = self._calls.pop(run_id, None)
+        if call is not None:
+            self._finish(call, call["model"], 0, 0, error=str(error))
+
+    def _finish(self, call: dict[str, Any], model: str, input_tokens: int, output_tokens: int, error: Optional[str] = None):
+        """Hand a finished call to the tracker."""
+        self.tracker.record(
+            self.source,
+            model,
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            latency=time.perf_counter() - call["started"],
+            retries=call["retries"],
+            error=error,
+            thread_id=call["thread_id"],
+            node=call["node"],
+            service_type=call["service_type"],
+        )
+
+
+def _response_usage(response: Any) -> tuple[int, int, str]:
+    """Extract (input tokens, output tokens, model) from an LLMResult."""
+    llm_output = getattr(response, "llm_output", None) or {}
+    model = llm_output.get("model_name") or llm_output.get("model") or ""
+
+    for generations in getattr(response, "generations", None) or []:
+        for generation in generations:
+            message = getattr(generation, "message", None)
+            usage = getattr(message, "usage_metadata", None)
+            if usage:
+                metadata = getattr(message, "response_metadata", None) or {}
+                return (
+                    usage.get("input_tokens", 0),
+                    usage.get("output_tokens", 0),
+                    model or metadata.get("model_name") or metadata.get("model", ""),
+                )
+
+    usage = llm_output.get("token_usage") or llm_output.get("usage") or {}
+    return (
+        usage.get("prompt_tokens", usage.get("input_tokens", 0)),
+        usage.get("completion_tokens", usage.get("output_tokens", 0)),
+        model,
+    )
+
+
+def track_node(node_name: str) -> Callable:
+    """
+    Decorator attributing LLM usage inside a graph node to that node and
+    the run's service.
+
+    Args:
+        node_name: Node name as registered in the graph
+
+    Returns:
+        Decorator for async node functions
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(state, *args, **kwargs):
+            node_token = current_node.set(node_name)
+            service_token = current_service.set(state.get("service_type"))
+            try:
+                return await func(state, *args, **kwargs)
+            finally:
+                current_node.reset(node_token)
+                current_service.reset(service_token)
+        return wrapper
+    return decorator
+
+
+# Global LLM usage tracker instance
+llm_usage = LLMUsageTracker()
@@ -0,0 +1,317 @@
+"""Latency histograms and counters with Prometheus text-format export."""
+import functools
+import threading
+import time
+from contextvars import ContextVar
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Optional
+from src import config
+from src.utils.logging_config import logger
+
+
+# Service of the graph node running in this context (labels browser actions)
+current_service_type: ContextVar[str] = ContextVar("current_service_type", default="unknown")
+
+# Latency buckets in seconds, from fast DOM probes up to long AI runs
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _label_key(labels: dict[str, Any]) -> tuple:
+    """Convert a label dict to a hashable, ordered key."""
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: tuple, extra: Optional[tuple] = None) -> str:
+    """Render a label key in Prometheus format."""
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = [
+        name + '="' + value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for name, value in pairs
+    ]
+    return "{" + ",".join(escaped) + "}"
+
+
+class MetricsRegistry:
+    """
+    Thread-safe registry of histograms and counters.
+
+    Values are kept in memory and rendered on demand, so recording a sample is
+    a dict update and never touches disk or the network.
+    """
+
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        """Initialize metrics registry."""
+        self.buckets = buckets
+        self.histograms: dict[str, dict[tuple, dict]] = {}
+        self.counters: dict[str, dict[tuple, float]] = {}
+        self.help: dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name: str, value: float, help_text: str = "", **labels: Any):
+        """
+        Record a histogram sample.
+
+        Args:
+            name: Metric name
+            value: Observed value (seconds for latencies)
+            help_text: Metric description for export
+            **labels: Label values
+        """
+        key = _label_key(labels)
+        with self._lock:
+            if help_text:
+                self.help.setdefault(name, help_text)
+            series = self.histograms.setdefault(name, {})
+            hist = series.get(key)
+            if hist is None:
+                hist = {"buckets": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                series[key] = hist
+            for idx, bound in enumerate(self.buckets):
+                if value <= bound:
+                    hist["buckets"][idx] += 1
+            hist["sum"] += value
+            hist["count"] += 1
+
+    def inc(self, name: str, amount: float = 1.0, help_text: str = "", **labels: Any):
+        """
+        Increment a counter.
+
+        Args:
+            name: Metric name
+            amount: Increment
+            help_text: Metric description for export
+            **labels: Label values
+        """
+        key = _label_key(labels)
+        with self._lock:
+            if help_text:
+                self.help.setdefault(name, help_text)
+            series = self.counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + amount
+
+    def get_counter(self, name: str, **labels: Any) -> float:
+        """
+        Get current counter value.
+
+        Args:
+            name: Metric name
+            **labels: Label values
+
+        Returns:
+            Counter value (0 if never incremented)
+        """
+        with self._lock:
+            return self.counters.get(name, {}).get(_label_key(labels), 0.0)
+
+    def summary(self, name: str) -> list[dict[str, Any]]:
+        """
+        Summarize a histogram by label set, sorted by total time descending.
+
+        Args:
+            name: Histogram name
+
+        Returns:
+            List of dicts with labels, count, total and mean
+        """
+        with self._lock:
+            series = dict(self.histograms.get(name, {}))
+        rows = [
+            {
+                "labels": dict(key),
+                "count": hist["count"],
+                "total": hist["sum"],
+                "mean": hist["sum"] / hist["count"] if hist["count"] else 0.0,
+            }
+            for key, hist in series.items()
+        ]
+        return sorted(rows, key=lambda row: row["total"], reverse=True)
+
+    def render_prometheus(self) -> str:
+        """
+        Render all metrics in Prometheus text exposition format.
+
+        Returns:
+            Exposition text
+        """
+        lines = []
+        with self._lock:
+            for name, series in sorted(self.histograms.items()):
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, hist in series.items():
+                    for bound, count in zip(self.buckets, hist["buckets"]):
+                        lines.append(f"{name}_bucket{_format_labels(key, ('le', str(bound)))} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(key, ('le', '+Inf'))} {hist['count']}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {hist['sum']:.6f}")
+                    lines.append(f"{name}_count{_format_labels(key)} {hist['count']}")
+
+            for name, series in sorted(self.counters.items()):
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in series.items():
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus_file(self, path: Optional[str] = None) -> Optional[str]:
+        """
+        Write metrics to a Prometheus text file (node_exporter textfile format).
+
+        Args:
+            path: Output path (defaults to METRICS_FILE_PATH)
+
+        Returns:
+            Path written, or None if export is disabled or failed
+        """
+        path = path or config.METRICS_FILE_PATH
+        if not path:
+            return None
+
+        try:
+            target = Path(path)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            # Write atomically so scrapers never read a partial file
+            tmp = target.with_suffix(target.suffix + ".tmp")
+            tmp.write_text(self.render_prometheus())
+            tmp.replace(target)
+            return str(target)
+        except Exception as e:
+            logger.error("metrics_write_error", path=path, error=str(e))
+            return None
+
+    def reset(self):
+        """Clear all recorded metrics."""
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+
+# Global metrics registry instance
+metrics = MetricsRegistry()
+
+_metrics_server: Optional[ThreadingHTTPServer] = None
+
+
+def start_metrics_server(port: int = config.METRICS_PORT, host: str = "127.0.0.1") -> bool:
+    """
+    Serve metrics on a local HTTP endpoint (``/metrics``) in a daemon thread.
+
+    Args:
+        port: Port to listen on
+        host: Interface to bind
+
+    Returns:
+        True if the server is running, False otherwise
+    """
+    global _metrics_server
+
+    if _metrics_server is not None:
+        return True
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") not in ("", "/metrics"):
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = metrics.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    try:
+        _metrics_server = ThreadingHTTPServer((host, port), MetricsHandler)
+        thread = threading.Thread(target=_metrics_server.serve_forever, daemon=True)
+        thread.start()
+        logger.info("metrics_server_started", host=host, port=port)
+        return True
+    except OSError as e:
+        logger.error("metrics_server_error", port=port, error=str(e))
+        _metrics_server = None
+        return False
+
+
+def _node_outcome(result: Any) -> str:
+    """Classify a node's partial state update."""
+    if not isinstance(result, dict):
+        return "success"
+    if result.get("next_action") == "error" or result.get("current_step") == "error":
+        return "error"
+    return "success"
+
+
+def profile_node(node_name: str) -> Callable:
+    """
+    Decorator recording latency of a graph node by node, service_type and outcome.
+
+    Args:
+        node_name: Node name as registered in the graph
+
+    Returns:
+        Decorator for async node functions
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(state, *args, **kwargs):
+            start = time.perf_counter()
+            outcome = "exception"
+            token = current_service_type.set(state.get("service_type", "unknown"))
+            try:
+                result = await func(state, *args, **kwargs)
+                outcome = _node_outcome(result)
+                return result
+            finally:
+                current_service_type.reset(token)
+                metrics.observe(
+                    "mponline_node_latency_seconds",
+                    time.perf_counter() - start,
+                    help_text="Graph node execution latency",
+                    node=node_name,
+                    service_type=state.get("service_type", "unknown"),
+                    outcome=outcome
+                )
+        return wrapper
+    return decorator
+
+
+def profile_action(func: Callable) -> Callable:
+    """
+    Decorator recording latency of a browser action helper by action,
+    service_type (of the node calling it) and outcome.
+
+    A falsy return value (False, empty snapshot) counts as a failure.
+
+    Args:
+        func: Async browser action helper
+
+    Returns:
+        Wrapped helper
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        outcome = "exception"
+        try:
+            result = await func(*args, **kwargs)
+            outcome = "success" if result else "failure"
+            return result
+        finally:
+            metrics.observe(
+                "mponline_browser_action_latency_seconds",
+                time.perf_counter() - start,
+                help_text="Browser action helper latency",
+                action=func.__name__,
+                service_type=current_service_type.get(),
+                outcome=outcome
+            )
+    return wrapper
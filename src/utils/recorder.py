@@ -0,0 +1,361 @@
+"""Record-and-replay of page traffic, LLM calls and HITL inputs for offline runs."""
+import hashlib
+import json
+from pathlib import Path
+from typing import Any, Optional
+from src import config
+from src.core.event_bus import current_thread_id
+from src.utils.encryption import encryptor
+from src.utils.logging_config import logger
+
+
+RECORD_MODES = ("off", "record", "replay")
+
+
+def _message_key(messages: Any, model: str = "", output_format: Any = None) -> str:
+    """
+    Build a stable hash for an LLM request.
+
+    Args:
+        messages: LangChain messages (or a plain prompt string)
+        model: Model name, so different models do not share responses
+        output_format: Structured output schema requested (browser_use), if any
+
+    Returns:
+        SHA-256 hex digest of the serialized request
+    """
+    if isinstance(messages, str):
+        payload = messages
+    else:
+        payload = [
+            {
+                "type": getattr(message, "type", message.__class__.__name__),
+                "content": getattr(message, "content", message),
+            }
+            for message in messages
+        ]
+    if output_format is not None and hasattr(output_format, "model_json_schema"):
+        output_format = output_format.model_json_schema()
+    serialized = json.dumps(
+        {"model": model, "messages": payload, "output_format": output_format},
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+class RecordingLLM:
+    """
+    Transparent LLM proxy that records or replays ``ainvoke`` responses.
+
+    All other attributes are delegated to the wrapped model.
+    """
+
+    def __init__(self, llm: Any, recorder: "SessionRecorder", source: str):
+        """Initialize recording proxy."""
+        self._llm = llm
+        self._recorder = recorder
+        self._source = source
+
+    async def ainvoke(self, messages: Any, *args, **kwargs):
+        """
+        Invoke the model, or return the recorded response in replay mode.
+
+        Args:
+            messages: Prompt messages
+
+        Returns:
+            Model response message
+        """
+        from src.utils.llm_cache import serialize_response, deserialize_response
+
+        model = getattr(self._llm, "model_name", None) or getattr(self._llm, "model", "")
+        key = _message_key(messages, model, kwargs.get("output_format"))
+
+        if self._recorder.replaying:
+            recorded = self._recorder.replay_llm(key)
+            return deserialize_response(recorded["response"], kwargs.get("output_format"))
+
+        response = await self._llm.ainvoke(messages, *args, **kwargs)
+        if self._recorder.recording:
+            self._recorder.record_llm(key, self._source, serialize_response(response))
+        return response
+
+    def __getattr__(self, name: str) -> Any:
+        """Delegate everything else to the wrapped model."""
+        return getattr(self._llm, name)
+
+
+class SessionRecorder:
+    """
+    Captures page responses (HAR), LLM request/response pairs and HITL inputs
+    per thread_id, and serves them back in replay mode with no network access.
+
+    Layout on disk::
+
+        RECORDINGS_DIR/<thread_id>/session.har
+        RECORDINGS_DIR/<thread_id>/llm.jsonl
+        RECORDINGS_DIR/<thread_id>/hitl.jsonl
+        RECORDINGS_DIR/<thread_id>/initial_state.json
+
+    The HAR is flushed by Playwright when the browser context closes.
+    """
+
+    def __init__(self, mode: str = config.RECORD_MODE, root: str = config.RECORDINGS_DIR):
+        """Initialize recorder."""
+        self.root = Path(root)
+        self.mode = "off"
+        self._llm_responses: dict[str, dict] = {}
+        self._hitl_responses: dict[str, list] = {}
+        self._hitl_cursor: dict[str, int] = {}
+        self.set_mode(mode)
+
+    @property
+    def recording(self) -> bool:
+        """Whether record mode is active."""
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        """Whether replay mode is active."""
+        return self.mode == "replay"
+
+    def set_mode(self, mode: str):
+        """
+        Switch recorder mode.
+
+        Args:
+            mode: 'off', 'record' or 'replay'
+        """
+        if mode not in RECORD_MODES:
+            raise ValueError(f"Invalid RECORD_MODE: {mode}. Must be one of {RECORD_MODES}")
+
+        self.mode = mode
+        self._llm_responses.clear()
+        self._hitl_responses.clear()
+        self._hitl_cursor.clear()
+
+        if self.replaying:
+            self._load_llm_recordings()
+
+        logger.info("recorder_mode_set", mode=mode, root=str(self.root))
+
+    def session_dir(self, thread_id: Optional[str] = None) -> Path:
+        """
+        Get the recording directory for a thread.
+
+        Args:
+            thread_id: Thread ID (defaults to the run executing in this context)
+
+        Returns:
+            Directory path
+        """
+        thread_id = thread_id or current_thread_id.get() or "default"
+        return self.root / thread_id
+
+    def list_sessions(self) -> list[str]:
+        """
+        List recorded thread IDs that can be replayed.
+
+        Returns:
+            Thread IDs with a saved initial state
+        """
+        if not self.root.exists():
+            return []
+        return sorted(
+            path.parent.name for path in self.root.glob("*/initial_state.json")
+        )
+
+    # Browser traffic
+
+    def context_options(self, thread_id: Optional[str] = None) -> dict[str, Any]:
+        """
+        Extra ``new_context`` options for the current mode.
+
+        Args:
+            thread_id: Thread ID
+
+        Returns:
+            Options dict (HAR capture settings in record mode)
+        """
+        if not self.recording:
+            return {}
+
+        session_dir = self.session_dir(thread_id)
+        session_dir.mkdir(parents=True, exist_ok=True)
+        return {
+            "record_har_path": str(session_dir / "session.har"),
+            "record_har_content": "embed",
+        }
+
+    async def configure_context(self, context, thread_id: Optional[str] = None):
+        """
+        Serve page traffic from the recorded HAR in replay mode.
+
+        Args:
+            context: Playwright browser context
+            thread_id: Thread ID
+        """
+        if not self.replaying:
+            return
+
+        har_path = self.session_dir(thread_id) / "session.har"
+        if not har_path.exists():
+            raise FileNotFoundError(f"No HAR recording at {har_path}")
+
+        await context.route_from_har(str(har_path), not_found="abort")
+        logger.info("recorder_har_replay", path=str(har_path))
+
+    # LLM calls
+
+    def wrap_llm(self, llm: Any, source: str) -> Any:
+        """
+        Wrap an LLM so its calls are recorded or replayed.
+
+        Args:
+            llm: LangChain chat model
+            source: Caller name stored with each recording (e.g. 'vision')
+
+        Returns:
+            The model itself when recording is off, otherwise a proxy
+        """
+        if self.mode == "off":
+            return llm
+        return RecordingLLM(llm, self, source)
+
+    def record_llm(self, key: str, source: str, response: Optional[str]):
+        """
+        Append an LLM request/response pair.
+
+        Args:
+            key: Request hash
+            source: Caller name
+            response: Serialized response (LangChain message or browser_use
+                completion), or None if the response type cannot be stored
+        """
+        if response is None:
+            logger.warning("recorder_llm_unserializable", source=source)
+            return
+        self._append(self.session_dir() / "llm.jsonl", {
+            "key": key,
+            "source": source,
+            "response": response,
+        })
+
+    def replay_llm(self, key: str) -> dict:
+        """
+        Look up a recorded LLM response.
+
+        Args:
+            key: Request hash
+
+        Returns:
+            Recorded entry
+        """
+        if key not in self._llm_responses:
+            raise LookupError(f"No recorded LLM response for request {key[:12]}")
+        logger.info("recorder_llm_replayed", key=key[:12])
+        return self._llm_responses[key]
+
+    def _load_llm_recordings(self):
+        """Index every recorded LLM response by request hash."""
+        for path in self.root.glob("*/llm.jsonl"):
+            for entry in self._read_jsonl(path):
+                self._llm_responses[entry["key"]] = entry
+
+    # HITL inputs
+
+    def record_hitl(self, input_type: str, response: Any):
+        """
+        Append a human response for the current thread.
+
+        Args:
+            input_type: HITL input type ('text', 'confirmation', ...)
+            response: Human response
+        """
+        self._append(self.session_dir() / "hitl.jsonl", {
+            "input_type": input_type,
+            "response": encryptor.encrypt_data({"value": response}),
+        })
+
+    def replay_hitl(self, input_type: str) -> Optional[Any]:
+        """
+        Return the next recorded human response of this type for the current thread.
+
+        Args:
+            input_type: HITL input type
+
+        Returns:
+            Recorded response or None if none remain
+        """
+        session_dir = self.session_dir()
+        thread_key = str(session_dir)
+
+        if thread_key not in self._hitl_responses:
+            self._hitl_responses[thread_key] = self._read_jsonl(session_dir / "hitl.jsonl")
+
+        cursor_key = f"{thread_key}:{input_type}"
+        matching = [
+            entry for entry in self._hitl_responses[thread_key]
+            if entry["input_type"] == input_type
+        ]
+        index = self._hitl_cursor.get(cursor_key, 0)
+        if index >= len(matching):
+            logger.warning("recorder_hitl_exhausted", input_type=input_type)
+            return None
+
+        self._hitl_cursor[cursor_key] = index + 1
+        return encryptor.decrypt_data(matching[index]["response"])["value"]
+
+    # Run inputs
+
+    def save_initial_state(self, thread_id: str, state: dict):
+        """
+        Save the initial state of a recorded run (encrypted).
+
+        Args:
+            thread_id: Thread ID
+            state: Initial agent state
+        """
+        session_dir = self.session_dir(thread_id)
+        session_dir.mkdir(parents=True, exist_ok=True)
+        serializable = {key: value for key, value in state.items() if key != "messages"}
+        (session_dir / "initial_state.json").write_text(
+            encryptor.encrypt_data(json.loads(json.dumps(serializable, default=str)))
+        )
+
+    def load_initial_state(self, thread_id: str) -> dict:
+        """
+        Load the initial state of a recorded run.
+
+        Args:
+            thread_id: Thread ID
+
+        Returns:
+            Initial agent state
+        """
+        path = self.session_dir(thread_id) / "initial_state.json"
+        state = encryptor.decrypt_data(path.read_text())
+        state.setdefault("messages", [])
+        return state
+
+    # Storage helpers
+
+    @staticmethod
+    def _append(path: Path, entry: dict):
+        """Append a JSON line to a recording file."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, default=str) + "\n")
+
+    @staticmethod
+    def _read_jsonl(path: Path) -> list[dict]:
+        """Read a JSON-lines recording file."""
+        if not path.exists():
+            return []
+        with open(path, encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+
+# Global recorder instance
+recorder = SessionRecorder()
@@ -8,15 +8,18 @@ from pathlib import Path
 # Add src to path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from src.core.graph import create_graph, run_graph, resume_graph
+from src.core.graph import create_graph, open_graph, run_graph, resume_graph
 from src.core.agent_state import AgentState
 from src.services.service_registry import get_service_list
-from src.tools.human_input_tool import human_input_tool
+from src.services.validation import validate_record, format_issue
+from src.tools.hitl_broker import hitl_broker
+from src.core.event_bus import event_bus
 from src import config
 from src.utils.logging_config import logger
 from streamlit_app.ui_components import (
     render_chat_message,
     render_progress_tracker,
+    render_progress_event,
     render_captcha_input,
     render_form_preview,
     render_error_banner
@@ -135,9 +138,11 @@ async def start_automation():
         "user_data": st.session_state.user_data,
         "service_type": st.session_state.service_type,
         "use_ai_automation": st.session_state.get("use_ai_automation", True),
+        "automation_mode": st.session_state.get("automation_mode", config.AUTOMATION_MODE),
         "use_real_browser": st.session_state.get("use_real_browser", False),
         "current_step": "start",
         "form_progress": {},
+        "field_paths": {},
         "dom_snapshot": None,
         "screenshot_path": None,
         "current_url": None,
@@ -156,13 +161,25 @@ async def start_automation():
     if not st.session_state.graph:
         st.session_state.graph = create_graph()
     
+    # Stream progress events into the page while the graph runs
+    subscription = event_bus.subscribe("streamlit", thread_id=st.session_state.thread_id)
+    progress_container = st.container()
+    
+    async def render_events():
+        async for event in subscription:
+            with progress_container:
+                render_progress_event(event)
+    
+    renderer = asyncio.create_task(render_events())
+    
     # Run graph
     try:
-        final_state = await run_graph(
-            st.session_state.graph,
-            initial_state,
-            st.session_state.thread_id
-        )
+        async with open_graph(st.session_state.graph) as graph:
+            final_state = await run_graph(
+                graph,
+                initial_state,
+                st.session_state.thread_id
+            )
         
         st.session_state.agent_state = final_state
         
@@ -176,6 +193,20 @@ async def start_automation():
         logger.error("streamlit_automation_error", error=str(e))
         st.error(f"Error during automation: {str(e)}")
         st.session_state.workflow_state = "idle"
+    
+    finally:
+        await asyncio.sleep(0)  # Let the renderer flush queued events
+        for event in subscription.drain():
+            with progress_container:
+                render_progress_event(event)
+        renderer.cancel()
+        subscription.close()
+
+
+async def _resume(session_graph, thread_id: str):
+    """Resume a paused run with the checkpointer open."""
+    async with open_graph(session_graph) as graph:
+        await resume_graph(graph, thread_id)
 
 
 def main():
@@ -226,8 +257,11 @@ def main():
             
             automation_mode = st.radio(
                 "Choose automation approach",
-                options=["🤖 AI-Powered (Recommended)", "📋 Template-Based (Legacy)"],
+                options=["🔀 Hybrid (Recommended)", "🤖 AI-Powered", "📋 Template-Based (Legacy)"],
                 help="""
+                **Hybrid**: Fills with pre-defined selectors first, then uses the AI agent
+                only for the fields they could not fill. Fast and cheap, still adapts.
+                
                 **AI-Powered**: Uses natural language to intelligently navigate and fill forms. 
                 Adapts to any website changes automatically.
                 
@@ -235,7 +269,8 @@ def main():
                 """
             )
             
-            use_ai = "AI-Powered" in automation_mode
+            use_ai = "Template-Based" not in automation_mode
+            mode_key = "hybrid" if "Hybrid" in automation_mode else "ai" if use_ai else "template"
             
             # Show mode comparison
             with st.expander("📊 Mode Comparison"):
@@ -271,10 +306,11 @@ def main():
             if st.button("🚀 Start New Session"):
                 st.session_state.service_type = service_keys[selected_idx]
                 st.session_state.use_ai_automation = use_ai
+                st.session_state.automation_mode = mode_key
                 st.session_state.use_real_browser = use_real_browser
                 st.session_state.workflow_state = "collecting"
                 
-                mode_text = "AI-powered" if use_ai else "template-based"
+                mode_text = {"hybrid": "hybrid", "ai": "AI-powered", "template": "template-based"}[mode_key]
                 st.session_state.conversation.append({
                     "role": "agent",
                     "content": f"Great! Let's fill your {services[selected_idx]['name']} form using {mode_text} automation. I'll ask you a few questions."
@@ -288,6 +324,8 @@ def main():
         
         # Reset button
         if st.button("🔄 Reset Session"):
+            # Wake any HITL waiter of the abandoned session
+            hitl_broker.cancel_thread(st.session_state.thread_id)
             for key in list(st.session_state.keys()):
                 del st.session_state[key]
             st.rerun()
@@ -350,6 +388,18 @@ def main():
                     else:
                         st.session_state.user_data[current_q["field"]] = answer
                     
+                    # Reject invalid answers before moving on
+                    issues = validate_record(
+                        st.session_state.service_type,
+                        st.session_state.user_data,
+                        fields=[current_q["field"]]
+                    )
+                    if issues:
+                        st.session_state.user_data.pop(current_q["field"], None)
+                        for issue in issues:
+                            st.error(issue["message"])
+                        st.stop()
+                    
                     # Add to conversation
                     st.session_state.conversation.append({
                         "role": "user",
@@ -374,6 +424,10 @@ def main():
             # Show preview
             render_form_preview(st.session_state.user_data)
             
+            issues = validate_record(st.session_state.service_type, st.session_state.user_data)
+            if issues:
+                render_error_banner([format_issue(issue) for issue in issues])
+            
             col1, col2 = st.columns(2)
             with col1:
                 if st.button("✏️ Edit Details"):
@@ -381,7 +435,7 @@ def main():
                     st.rerun()
             
             with col2:
-                if st.button("🚀 Start Automation"):
+                if st.button("🚀 Start Automation", disabled=bool(issues)):
                     asyncio.run(start_automation())
                     st.rerun()
     
@@ -404,26 +458,30 @@ def main():
             if screenshot and Path(screenshot).exists():
                 st.image(str(screenshot), caption="Current Page")
             
-            # Check for pending requests
-            pending = human_input_tool.list_pending_requests()
+            # Work assigned to this operator (CAPTCHAs arrive as a batch)
+            operator_id = f"streamlit_{st.session_state.thread_id}"
+            claimed = hitl_broker.claimed_by(operator_id) or hitl_broker.claim(operator_id)
             
-            if pending:
-                request_id = pending[0]
-                request = human_input_tool.get_pending_request(request_id)
-                
-                st.info(request["prompt"])
-                
-                user_input = st.text_input("Your response:")
+            if claimed:
+                answers = {}
+                for request in claimed:
+                    st.info(request["prompt"])
+                    attachment = request.get("attachment")
+                    if isinstance(attachment, bytes) or (
+                        isinstance(attachment, str) and Path(attachment).exists()
+                    ):
+                        st.image(attachment, caption=request["kind"].title())
+                    answers[request["request_id"]] = st.text_input(
+                        "Your response:", key=f"hitl_{request['request_id']}"
+                    )
                 
                 if st.button("Submit"):
-                    # Submit response
-                    human_input_tool.submit_response(request_id, user_input)
+                    # Submit responses
+                    for request_id, user_input in answers.items():
+                        hitl_broker.answer(operator_id, request_id, user_input)
                     
                     # Resume graph
-                    asyncio.run(resume_graph(
-                        st.session_state.graph,
-                        st.session_state.thread_id
-                    ))
+                    asyncio.run(_resume(st.session_state.graph, st.session_state.thread_id))
                     
                     st.session_state.workflow_state = "running"
                     st.rerun()
@@ -78,6 +78,28 @@ def render_progress_tracker(agent_state: Dict[str, Any]):
                     st.markdown(f"⏳ {field}")
 
 
+def render_progress_event(event: Dict[str, Any]):
+    """
+    Render a single live progress event from the event bus.
+    
+    Args:
+        event: Progress event published during a graph run
+    """
+    event_type = event.get("type")
+    data = event.get("data", {})
+    
+    if event_type == "node_start":
+        st.markdown(f"▶️ Running **{data.get('node')}**")
+    elif event_type == "node_end":
+        st.markdown(f"✔️ Finished **{data.get('node')}** → {data.get('next_action') or '-'}")
+    elif event_type == "field_filled":
+        st.caption(f"✅ Filled {data.get('field')}")
+    elif event_type == "hitl_required":
+        st.warning("⏸️ Human input required")
+    elif event_type == "error":
+        st.error(f"❌ {data.get('errors') or data.get('action') or 'Error'}")
+
+
 def render_captcha_input(screenshot_path: str):
     """
     Render CAPTCHA input interface.